@@ -114,6 +114,7 @@ setup(
         'console_scripts': [
             'addzope2user=Zope2.utilities.adduser:main',
             'runwsgi=Zope2.Startup.serve:main',
+            'precompiletemplates=Zope2.utilities.precompile:main',
             'mkwsgiinstance=Zope2.utilities.mkwsgiinstance:main',
         ],
     },
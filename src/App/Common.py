@@ -12,7 +12,9 @@
 ##############################################################################
 """Commonly used utility functions."""
 
+import errno
 import os
+import stat
 import sys
 import time
 
@@ -126,5 +128,32 @@ def package_home(globals_dict):
     return os.path.abspath(r)
 
 
+def checkPrivateDirectory(directory):
+    """Create `directory` with mode 0700 if it does not exist, and raise
+    ValueError unless it is owned by the user of the process and not
+    writable by other users.
+
+    For directories whose files are unpickled or executed, which no
+    other user may put there.
+    """
+    if not directory:
+        raise ValueError('No directory given.')
+    try:
+        os.makedirs(directory, 0o700)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+    st = os.stat(directory)
+    if not stat.S_ISDIR(st.st_mode):
+        raise ValueError('%s is not a directory.' % directory)
+    if hasattr(os, 'getuid') and st.st_uid != os.getuid():
+        raise ValueError(
+            'The directory %s is not owned by the user of the process.'
+            % directory)
+    if st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise ValueError(
+            'The directory %s is writable by other users.' % directory)
+
+
 def Dictionary(**kw):
     return kw  # Sorry Guido
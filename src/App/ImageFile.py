@@ -24,8 +24,9 @@ from App import bbb
 from App.Common import package_home
 from App.Common import rfc1123_date
 from App.config import getConfiguration
-from DateTime.DateTime import DateTime
 from zope.contenttype import guess_content_type
+from ZPublisher.conditional import contentETag
+from ZPublisher.conditional import isNotModified
 from ZPublisher.Iterators import filestream_iterator
 
 import Zope2
@@ -87,36 +88,28 @@ class ImageFile(Explicit):
         self.lmt = float(stat_info[stat.ST_MTIME]) or time.time()
         self.lmh = rfc1123_date(self.lmt)
 
+    # Entity tag derived from the file, computed on first use
+    _content_etag = None
+
+    def _etag(self):
+        etag = self._content_etag
+        if etag is None:
+            with open(self.path, 'rb') as f:
+                etag = contentETag(iter(lambda: f.read(1 << 16), b''))
+            self._content_etag = etag
+        return etag
+
     def index_html(self, REQUEST, RESPONSE):
         """Default document"""
-        # HTTP If-Modified-Since header handling. This is duplicated
-        # from OFS.Image.Image - it really should be consolidated
-        # somewhere...
+        etag = self._etag()
         RESPONSE.setHeader('Content-Type', self.content_type)
         RESPONSE.setHeader('Last-Modified', self.lmh)
         RESPONSE.setHeader('Cache-Control', self.cch)
         RESPONSE.setHeader('Content-Length', str(self.size).replace('L', ''))
-        header = REQUEST.get_header('If-Modified-Since', None)
-        if header is not None:
-            header = header.split(';')[0]
-            # Some proxies seem to send invalid date strings for this
-            # header. If the date string is not valid, we ignore it
-            # rather than raise an error to be generally consistent
-            # with common servers such as Apache (which can usually
-            # understand the screwy date string as a lucky side effect
-            # of the way they parse it).
-            try:
-                mod_since = int(DateTime(header).timeTime())
-            except Exception:
-                mod_since = None
-            if mod_since is not None:
-                if getattr(self, 'lmt', None):
-                    last_mod = int(self.lmt)
-                else:
-                    last_mod = int(0)
-                if last_mod > 0 and last_mod <= mod_since:
-                    RESPONSE.setStatus(304)
-                    return ''
+        RESPONSE.setHeader('ETag', '"%s"' % etag)
+        if isNotModified(REQUEST, etag, getattr(self, 'lmt', None)):
+            RESPONSE.setStatus(304)
+            return ''
 
         return filestream_iterator(self.path, mode='rb')
 
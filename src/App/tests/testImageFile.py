@@ -67,3 +67,33 @@ class TestImageFileFunctional(unittest.TestCase):
         self.assertTrue(isinstance(result, io.FileIO))
         self.assertTrue(b''.join(result).startswith(b'\x89PNG\r\n'))
         self.assertEqual(len(result), image.size)
+
+    def test_index_html_not_modified(self):
+        env = {
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REQUEST_METHOD': 'GET',
+        }
+        path = os.path.join(os.path.dirname(App.__file__),
+                            'www', 'zopelogo.png')
+        image = App.ImageFile.ImageFile(path)
+        response = WSGIResponse(BytesIO())
+        request = WSGIRequest(BytesIO(), env, response)
+        result = image.index_html(request, response)
+        result.close()
+        etag = response.getHeader('ETag')
+        self.assertTrue(etag.startswith('"md5-'))
+
+        env['HTTP_IF_NONE_MATCH'] = etag
+        response = WSGIResponse(BytesIO())
+        request = WSGIRequest(BytesIO(), env, response)
+        self.assertEqual(image.index_html(request, response), '')
+        self.assertEqual(response.getStatus(), 304)
+
+        del env['HTTP_IF_NONE_MATCH']
+        env['HTTP_IF_MODIFIED_SINCE'] = image.lmh
+        response = WSGIResponse(BytesIO())
+        request = WSGIRequest(BytesIO(), env, response)
+        self.assertEqual(image.index_html(request, response), '')
+        self.assertEqual(response.getStatus(), 304)
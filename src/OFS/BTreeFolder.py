@@ -0,0 +1,46 @@
+##############################################################################
+#
+# Copyright (c) 2017 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+""" 'Folder' storing its subobjects in BTrees.
+"""
+
+from AccessControl.class_init import InitializeClass
+from App.special_dtml import DTMLFile
+
+from OFS.BTreeSupport import BTreeSupport
+from OFS.Folder import Folder
+
+manage_addBTreeFolderForm = DTMLFile('dtml/addBTreeFolder', globals())
+
+
+def manage_addBTreeFolder(self, id, title='', REQUEST=None):
+    """Add a new BTree Folder object with id *id*.
+    """
+    ob = BTreeFolder(id)
+    ob.title = title
+    self._setObject(id, ob)
+    ob = self._getOb(id)
+    if REQUEST is not None:
+        return self.manage_main(self, REQUEST)
+
+
+class BTreeFolder(BTreeSupport, Folder):
+
+    """ Extends the default Folder by storing the subobjects in BTrees.
+    """
+    meta_type = 'Folder (BTree)'
+
+    def __init__(self, id=None):
+        super(BTreeFolder, self).__init__(id)
+        self._initBTrees()
+
+InitializeClass(BTreeFolder)
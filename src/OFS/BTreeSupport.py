@@ -0,0 +1,232 @@
+##############################################################################
+#
+# Copyright (c) 2017 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+""" BTree storage support for 'Object Manager'.
+"""
+
+import heapq
+import warnings
+
+from AccessControl.class_init import InitializeClass
+from AccessControl.SecurityInfo import ClassSecurityInfo
+from BTrees.Length import Length
+from BTrees.OOBTree import OOBTree
+from BTrees.OOBTree import OOTreeSet
+
+_marker = []
+
+
+class BTreeSupport(object):
+
+    """ BTree storage mixin class.
+
+    This is an extension to the regular ObjectManager for folders with
+    many subobjects. Instead of attributes of the folder and entries of
+    the `_objects` tuple, the subobjects and their meta types are kept
+    in BTrees, so adding, deleting and looking up a subobject only
+    changes a few small database records. The subobjects are ordered by
+    id.
+
+    The BTrees are created when the first subobject is added.
+    """
+    security = ClassSecurityInfo()
+
+    _tree = None  # id -> subobject
+    _mt_index = None  # meta type -> OOTreeSet of ids
+    _count = None  # BTrees.Length.Length, number of subobjects
+
+    def _initBTrees(self):
+        self._tree = OOBTree()
+        self._mt_index = OOBTree()
+        self._count = Length()
+
+    def __getattr__(self, name):
+        # Subobjects are no attributes anymore, but a lot of code (and
+        # implicit acquisition) still expects to find them as such.
+        if not name.startswith('_'):
+            tree = self._tree
+            if tree is not None:
+                ob = tree.get(name, _marker)
+                if ob is not _marker:
+                    return ob
+        raise AttributeError(name)
+
+    def _getMetaTypeKey(self, ob):
+        # None cannot be stored as a BTree key
+        return getattr(ob, 'meta_type', None) or ''
+
+    def _indexMetaType(self, id, meta_type):
+        ids = self._mt_index.get(meta_type)
+        if ids is None:
+            ids = self._mt_index[meta_type] = OOTreeSet()
+        ids.insert(id)
+
+    def _unindexMetaType(self, id, meta_type):
+        ids = self._mt_index.get(meta_type)
+        if ids is None or id not in ids:
+            # The meta type of the object changed since it was added.
+            for meta_type, ids in self._mt_index.items():
+                if id in ids:
+                    break
+            else:
+                return
+        ids.remove(id)
+        if not ids:
+            del self._mt_index[meta_type]
+
+    def _setOb(self, id, object):
+        if self._tree is None:
+            self._initBTrees()
+        tree = self._tree
+        old = tree.get(id, _marker)
+        if old is not _marker:
+            self._unindexMetaType(id, self._getMetaTypeKey(old))
+        else:
+            self._count.change(1)
+        tree[id] = object
+        self._indexMetaType(id, self._getMetaTypeKey(object))
+
+    def _delOb(self, id):
+        ob = self._tree[id]
+        self._unindexMetaType(id, self._getMetaTypeKey(ob))
+        del self._tree[id]
+        self._count.change(-1)
+
+    def _getOb(self, id, default=_marker):
+        ob = _marker
+        if self._tree is not None:
+            ob = self._tree.get(id, _marker)
+        if ob is _marker:
+            if default is _marker:
+                raise AttributeError(id)
+            return default
+        if hasattr(ob, '__of__'):
+            return ob.__of__(self)
+        return ob
+
+    def _addObjectInfos(self, infos):
+        # _setOb maintains the meta type index
+        pass
+
+    def _removeObjectInfos(self, ids):
+        # _delOb maintains the meta type index
+        pass
+
+    def _get_objects(self):
+        # Compatibility with code reading the _objects tuple.
+        if self._tree is None:
+            return ()
+        return _ObjectInfos(self)
+
+    def _set_objects(self, objects):
+        # Code maintaining _objects itself goes on to call _setOb or
+        # _delOb, which keep the BTrees up to date.
+        warnings.warn(
+            'Assigning _objects of %s has no effect, the subobjects are '
+            'kept in BTrees.' % self.__class__.__name__,
+            DeprecationWarning, stacklevel=2)
+
+    _objects = property(_get_objects, _set_objects)
+
+    def _ids(self):
+        if self._tree is None:
+            return ()
+        return self._tree.keys()
+
+    def hasObject(self, id):
+        return self._tree is not None and id in self._tree
+
+    def _objectIdsSequence(self, spec=None):
+        # The keys of the BTrees are loaded bucket by bucket when
+        # accessed.
+        if spec is None:
+            return self._ids()
+        if self._mt_index is None:
+            return ()
+        if isinstance(spec, str):
+            spec = [spec]
+        if len(spec) == 1:
+            return self._mt_index.get(spec[0] or '', OOTreeSet()).keys()
+        ids = OOTreeSet()
+        for meta_type in spec:
+            ids.update(self._mt_index.get(meta_type or '', ()))
+        return ids.keys()
+
+    def objectIds(self, spec=None):
+        return list(self._objectIdsSequence(spec))
+
+    def objectValues(self, spec=None):
+        return [self._getOb(id) for id in self.objectIds(spec)]
+
+    def objectItems(self, spec=None):
+        return [(id, self._getOb(id)) for id in self.objectIds(spec)]
+
+    def objectMap(self):
+        return tuple(self._get_objects())
+
+    def __contains__(self, name):
+        return self._tree is not None and name in self._tree
+
+    def __iter__(self):
+        return iter(self._ids())
+
+    def __len__(self):
+        if self._count is None:
+            return 0
+        return self._count()
+
+
+InitializeClass(BTreeSupport)
+
+
+def _metaTypeInfos(meta_type, ids):
+    for id in ids:
+        yield id, meta_type
+
+
+class _ObjectInfos(object):
+    """The subobjects of a BTreeSupport object as the dictionaries of an
+    `_objects` tuple.
+
+    The dictionaries are made while iterating, in the order of the ids,
+    from the meta type index, so neither the subobjects nor all ids are
+    loaded up front.
+    """
+
+    def __init__(self, container):
+        self._container = container
+
+    def __len__(self):
+        return len(self._container)
+
+    def __iter__(self):
+        iterators = [_metaTypeInfos(meta_type, ids) for meta_type, ids
+                     in self._container._mt_index.items()]
+        for id, meta_type in heapq.merge(*iterators):
+            yield {'id': id, 'meta_type': meta_type or None}
+
+    def __getitem__(self, index):
+        return tuple(self)[index]
+
+    def __add__(self, other):
+        return tuple(self) + tuple(other)
+
+    def __radd__(self, other):
+        return tuple(other) + tuple(self)
+
+    def __eq__(self, other):
+        return tuple(self) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
@@ -28,6 +28,9 @@ from Acquisition import aq_get
 from Acquisition import aq_inner
 from Acquisition import aq_parent
 from App.special_dtml import DTMLFile
+from BTrees.OOBTree import OOTreeSet
+
+from OFS.interfaces import IObjectWillBeMovedEvent
 
 ZCM_MANAGERS = '__ZCacheManager_ids__'
 
@@ -80,6 +83,70 @@ def getVerifiedManagerIds(container):
 # that.
 manager_timestamp = 0
 
+# The same by manager id, only the objects associated with a manager of
+# that id need to look up their manager again.
+manager_timestamps = {}
+
+# The caches found for cacheable objects in persistent containers, by
+# (database name, physical path of the container, manager id). The
+# values are (cache, manager timestamp, manager serials) tuples, see
+# _getManagerSerials.
+cache_registry = {}
+cache_registry_size = 10000
+
+
+def _bumpManagerTimestamp(manager_id):
+    global manager_timestamp
+    manager_timestamp = time.time()
+    manager_timestamps[manager_id] = manager_timestamp
+
+
+def _getRegistryKey(ob, manager_id):
+    # Objects in the same container find the same cache manager.
+    container = aq_parent(aq_inner(ob))
+    jar = getattr(aq_base(container), '_p_jar', None)
+    if jar is None:
+        return None
+    return (jar.db().database_name, container.getPhysicalPath(), manager_id)
+
+
+def _getManagerSerials(manager):
+    # The database name, oid and serial of the manager and its container.
+    # They change when the manager is changed, replaced or removed, also
+    # in other processes, which manager_timestamps doesn't notice.
+    serials = []
+    for ob in (manager, aq_parent(aq_inner(manager))):
+        ob = aq_base(ob)
+        jar = getattr(ob, '_p_jar', None)
+        if jar is None or ob._p_oid is None:
+            continue
+        serials.append((jar.db().database_name, ob._p_oid, ob._p_serial))
+    return tuple(serials)
+
+
+def _checkManagerSerials(ob, serials):
+    # Whether the serials of the manager and its container as seen by the
+    # connection of ob are still those of the registry entry.
+    jar = getattr(aq_base(aq_parent(aq_inner(ob))), '_p_jar', None)
+    if jar is None:
+        return not serials
+    for database_name, oid, serial in serials:
+        try:
+            current = jar.get_connection(database_name).get(oid)
+            current._p_activate()
+        except Exception:
+            # Removed, or in a database which isn't open.
+            return False
+        if current._p_serial != serial:
+            return False
+    return True
+
+
+def _getRelativePath(ob, container):
+    # The path of ob relative to container, as used by findCacheables
+    path = ob.getPhysicalPath()
+    return '/'.join(path[len(container.getPhysicalPath()):])
+
 
 class Cacheable(object):
     '''Mix-in for cacheable objects.
@@ -120,21 +187,35 @@ class Cacheable(object):
     def ZCacheable_getCache(self):
         '''Gets the cache associated with this object.
         '''
-        if self.__manager_id is None:
+        manager_id = self.__manager_id
+        if manager_id is None:
             return None
+        timestamp = manager_timestamps.get(manager_id, 0)
         c = self._v_ZCacheable_cache
         if c is not None:
             # We have a volatile reference to the cache.
-            if self._v_ZCacheable_manager_timestamp == manager_timestamp:
+            if self._v_ZCacheable_manager_timestamp == timestamp:
                 return aq_base(c)
-        manager = self.ZCacheable_getManager()
-        if manager is not None:
-            c = aq_base(manager.ZCacheManager_getCache())
+        # Other objects in the same container may have looked it up.
+        key = _getRegistryKey(self, manager_id)
+        entry = cache_registry.get(key) if key is not None else None
+        if (entry is not None and entry[1] == timestamp and
+                _checkManagerSerials(self, entry[2])):
+            c = entry[0]
         else:
-            return None
+            manager = self.ZCacheable_getManager()
+            if manager is not None:
+                c = aq_base(manager.ZCacheManager_getCache())
+            else:
+                return None
+            if key is not None:
+                if len(cache_registry) >= cache_registry_size:
+                    cache_registry.clear()
+                cache_registry[key] = (c, timestamp,
+                                       _getManagerSerials(manager))
         # Set a volatile reference to the cache then return it.
         self._v_ZCacheable_cache = c
-        self._v_ZCacheable_manager_timestamp = manager_timestamp
+        self._v_ZCacheable_manager_timestamp = timestamp
         return c
 
     security.declarePrivate('ZCacheable_isCachingEnabled')
@@ -226,10 +307,12 @@ class Cacheable(object):
             # Allow mtime_func to influence the mod time.
             mtime = mtime_func()
         base = aq_base(self)
-        mtime = max(getattr(base, '_p_mtime', mtime), mtime)
-        klass = getattr(base, '__class__', None)
-        if klass:
-            mtime = max(getattr(klass, '_p_mtime', mtime), mtime)
+        # _p_mtime is None for new objects and a descriptor on classes
+        # which are not persistent themselves.
+        for ob in (base, getattr(base, '__class__', None)):
+            ob_mtime = getattr(ob, '_p_mtime', None)
+            if isinstance(ob_mtime, (int, float)):
+                mtime = max(ob_mtime, mtime)
         return mtime
 
     security.declareProtected(ViewManagementScreensPermission,
@@ -274,6 +357,7 @@ class Cacheable(object):
     def ZCacheable_setManagerId(self, manager_id, REQUEST=None):
         '''Changes the manager_id for this object.'''
         self.ZCacheable_invalidate()
+        self._ZCacheable_unindex()
         if not manager_id:
             # User requested disassociation
             # from the cache manager.
@@ -282,12 +366,25 @@ class Cacheable(object):
             manager_id = str(manager_id)
         self.__manager_id = manager_id
         self._v_ZCacheable_cache = None
+        self._ZCacheable_index()
 
         if REQUEST is not None:
             return self.ZCacheable_manage(
                 self, REQUEST, management_view='Cache',
                 manage_tabs_message='Cache settings changed.')
 
+    def _ZCacheable_index(self):
+        # Adds self to the index of its cache manager.
+        manager = self.ZCacheable_getManager()
+        if manager is not None:
+            manager.ZCacheManager_indexCacheable(self)
+
+    def _ZCacheable_unindex(self):
+        # Removes self from the index of its cache manager.
+        manager = self.ZCacheable_getManager()
+        if manager is not None:
+            manager.ZCacheManager_unindexCacheable(self)
+
     security.declareProtected(ViewManagementScreensPermission,
                               'ZCacheable_enabled')
     def ZCacheable_enabled(self):
@@ -317,6 +414,20 @@ class Cacheable(object):
 InitializeClass(Cacheable)
 
 
+def indexMovedCacheable(ob, event):
+    '''
+    Subscriber keeping the index of the cacheable objects associated
+    with a cache manager up to date when objects are moved.
+    '''
+    if not isCacheable(ob) or ob.ZCacheable_getManagerId() is None:
+        return
+    if IObjectWillBeMovedEvent.providedBy(event):
+        if event.oldParent is not None:
+            ob._ZCacheable_unindex()
+    elif event.newParent is not None:
+        ob._ZCacheable_index()
+
+
 def findCacheables(ob, manager_id, require_assoc, subfolders,
                    meta_types, rval, path):
     '''
@@ -415,6 +526,10 @@ class CacheManager(object):
 
     _isCacheManager = 1
 
+    # The paths of the associated objects relative to the container of
+    # the manager, None until they were looked up once.
+    _cacheables = None
+
     manage_options = (
         {'label': 'Associate', 'action': 'ZCacheManager_associate'},
     )
@@ -426,8 +541,9 @@ class CacheManager(object):
             id = self.getId()
             if id not in ids:
                 setattr(container, ZCM_MANAGERS, ids + (id,))
-                global manager_timestamp
-                manager_timestamp = time.time()
+                _bumpManagerTimestamp(id)
+            # The index is relative to the container.
+            self._cacheables = None
 
     def manage_beforeDelete(self, item, container):
         # Removes self from the list of cache managers.
@@ -440,8 +556,7 @@ class CacheManager(object):
                     setattr(container, ZCM_MANAGERS, manager_ids)
                 elif getattr(aq_base(self), ZCM_MANAGERS, None) is not None:
                     delattr(self, ZCM_MANAGERS)
-                global manager_timestamp
-                manager_timestamp = time.time()
+                _bumpManagerTimestamp(id)
 
     security.declareProtected(ChangeCacheSettingsPermission,
                               'ZCacheManager_associate')
@@ -459,8 +574,11 @@ class CacheManager(object):
         if '' in meta_types:
             # User selected "All".
             meta_types = []
-        findCacheables(ob, manager_id, require_assoc, subfolders,
-                       meta_types, rval, ())
+        if require_assoc:
+            rval = self._locateIndexed(subfolders, meta_types)
+        else:
+            findCacheables(ob, manager_id, require_assoc, subfolders,
+                           meta_types, rval, ())
 
         if REQUEST is not None:
             return self.ZCacheManager_associate(
@@ -468,6 +586,68 @@ class CacheManager(object):
                 management_view="Associate")
         return rval
 
+    security.declarePrivate('ZCacheManager_indexCacheable')
+    def ZCacheManager_indexCacheable(self, ob):
+        '''Adds an object to the index of associated objects.'''
+        if self._cacheables is not None:
+            self._cacheables.insert(
+                _getRelativePath(ob, aq_parent(aq_inner(self))))
+
+    security.declarePrivate('ZCacheManager_unindexCacheable')
+    def ZCacheManager_unindexCacheable(self, ob):
+        '''Removes an object from the index of associated objects.'''
+        if self._cacheables is not None:
+            path = _getRelativePath(ob, aq_parent(aq_inner(self)))
+            if path in self._cacheables:
+                self._cacheables.remove(path)
+
+    security.declarePrivate('ZCacheManager_reindex')
+    def ZCacheManager_reindex(self):
+        '''Rebuilds the index of associated objects.'''
+        container = aq_parent(aq_inner(self))
+        paths = OOTreeSet()
+        manager_id = self.getId()
+        obs = [container]
+        while obs:
+            ob = obs.pop()
+            for subob in ob.objectValues():
+                if (isCacheable(subob) and
+                        subob.ZCacheable_getManagerId() == manager_id):
+                    paths.insert(_getRelativePath(subob, container))
+                if hasattr(aq_base(subob), 'objectValues'):
+                    obs.append(subob)
+        self._cacheables = paths
+
+    def _locateIndexed(self, subfolders, meta_types):
+        # Like findCacheables for associated objects, using the index.
+        if self._cacheables is None:
+            self.ZCacheManager_reindex()
+        container = aq_parent(aq_inner(self))
+        manager_id = self.getId()
+        sm = getSecurityManager()
+        rval = []
+        for path in self._cacheables.keys():
+            if not subfolders and '/' in path:
+                continue
+            ob = container.unrestrictedTraverse(path, None)
+            if ob is None or not isCacheable(ob):
+                continue
+            if ob.ZCacheable_getManagerId() != manager_id:
+                continue
+            if meta_types and getattr(ob, 'meta_type', None) not in meta_types:
+                continue
+            if not sm.checkPermission('Change cache settings', ob):
+                continue
+            subpath = tuple(path.split('/'))
+            rval.append({
+                'sortkey': subpath,
+                'path': path,
+                'title': getattr(aq_base(ob), 'title', ''),
+                'icon': None,
+                'associated': True,
+            })
+        return rval
+
     security.declareProtected(ChangeCacheSettingsPermission,
                               'ZCacheManager_setAssociations')
     def ZCacheManager_setAssociations(self, props=None, REQUEST=None):
@@ -17,7 +17,6 @@ from json import dumps
 from json import loads
 import logging
 import re
-import tempfile
 import warnings
 from zlib import compress
 from zlib import decompressobj
@@ -50,6 +49,7 @@ from OFS.interfaces import ICopySource
 from OFS.Moniker import loadMoniker
 from OFS.Moniker import Moniker
 from OFS.subscribers import compatibilityCall
+from OFS.zexp import cloneObject
 import collections
 
 
@@ -526,47 +526,47 @@ class CopySource(Base):
             raise CopyError(
                 'Container "%r" needs to be in the database' % container)
 
-        # Ask an object for a new copy of itself.
-        f = tempfile.TemporaryFile()
-        self._p_jar.exportFile(self._p_oid, f)
-        f.seek(0)
-        ob = container._p_jar.importFile(f)
-        f.close()
-        # Cleanup the copy.  It may contain private objects that the current
-        # user is not allowed to see.
+        # The copy must not contain private objects that the current user
+        # is not allowed to see. They are found while the object is
+        # exported and copied without their state, then removed.
         sm = getSecurityManager()
-        if not sm.checkPermission('View', self):
+        if sm.checkPermission('View', self):
+            private = _PrivateSubobjects(self, container)
+        else:
             # The user is not allowed to view the object that is currently
             # being copied, so it makes no sense to check any of its sub
             # objects.  It probably means we are in a test.
-            return ob
-        return self._cleanupCopy(ob, container)
+            private = _PrivateSubobjects(None, container)
+
+        # Ask an object for a new copy of itself.
+        ob = cloneObject(self, container._p_jar, exclude=private)
+        return self._pruneCopy(ob, private.paths)
 
     def _cleanupCopy(self, cp, container):
-        sm = getSecurityManager()
-        ob = aq_base(self)
-        if hasattr(ob, 'objectIds'):
-            for k in self.objectIds():
-                v = self._getOb(k)
-                if not sm.checkPermission('View', v):
-                    # We do not use cp._delObject, because this would fire
-                    # events that are needless for objects that are not even in
-                    # an Acquisition chain yet.
-                    logger.warn(
-                        'While copying %s to %s, removed %s from copy '
-                        'because user is not allowed to view the original.',
-                        '/'.join(self.getPhysicalPath()),
-                        '/'.join(container.getPhysicalPath()),
-                        '/'.join(v.getPhysicalPath())
-                    )
-                    cp._delOb(k)
-                    # We need to cleanup the internal objects list, even when
-                    # in some implementations this is always an empty tuple.
-                    cp._objects = tuple([
-                        i for i in cp._objects if i['id'] != k])
-                else:
-                    # recursively check
-                    v._cleanupCopy(cp._getOb(k), container)
+        # Remove the subobjects the current user is not allowed to view
+        # from the copy `cp` made without checking them.
+        private = _PrivateSubobjects(self, container)
+        private.checkAll()
+        return self._pruneCopy(cp, private.paths)
+
+    def _pruneCopy(self, cp, paths):
+        # Remove the subobjects at the given paths from the copy.
+        for path in paths:
+            ob = cp
+            for k in path[:-1]:
+                ob = ob._getOb(k)
+            k = path[-1]
+            # We do not use ob._delObject, because this would fire
+            # events that are needless for objects that are not even in
+            # an Acquisition chain yet.
+            if hasattr(ob, '_removeObjectInfo'):
+                ob._removeObjectInfo(k)
+            else:
+                # We need to cleanup the internal objects list, even when
+                # in some implementations this is always an empty tuple.
+                ob._objects = tuple([
+                    i for i in ob._objects if i['id'] != k])
+            ob._delOb(k)
         return cp
 
     def _postCopy(self, container, op=0):
@@ -609,6 +609,62 @@ class CopySource(Base):
 InitializeClass(CopySource)
 
 
+class _PrivateSubobjects(object):
+    """The oids of the subobjects of a copied object which the current
+    user is not allowed to view, for OFS.zexp.exportRecords.
+
+    The subobjects of an object are checked when the record of the
+    object is about to be exported, so the subtrees of private objects
+    are neither visited nor exported. `paths` lists the paths (tuples of
+    ids) of the private subobjects found.
+    """
+
+    def __init__(self, ob, container):
+        self.container = container
+        self.paths = []
+        self._private = set()
+        self._pending = {}  # oid -> (path, visible object to check)
+        if ob is not None:
+            self._pending[ob._p_oid] = ((), ob)
+
+    def __contains__(self, oid):
+        if oid in self._private:
+            return True
+        pending = self._pending.pop(oid, None)
+        if pending is not None:
+            self._check(*pending)
+        return False
+
+    def checkAll(self):
+        # Check all subobjects without exporting them.
+        while self._pending:
+            self._check(*self._pending.popitem()[1])
+
+    def _check(self, path, ob):
+        if not hasattr(aq_base(ob), 'objectIds'):
+            return
+        sm = getSecurityManager()
+        for k in ob.objectIds():
+            v = ob._getOb(k)
+            oid = getattr(aq_base(v), '_p_oid', None)
+            if not sm.checkPermission('View', v):
+                logger.warn(
+                    'While copying %s to %s, removed %s from copy '
+                    'because user is not allowed to view the original.',
+                    '/'.join(ob.getPhysicalPath()),
+                    '/'.join(self.container.getPhysicalPath()),
+                    '/'.join(v.getPhysicalPath())
+                )
+                self.paths.append(path + (k,))
+                if oid is not None:
+                    self._private.add(oid)
+            elif oid is None:
+                # Stored in the record of its container
+                self._check(path + (k,), v)
+            else:
+                self._pending[oid] = (path + (k,), v)
+
+
 def sanity_check(c, ob):
     # This is called on cut/paste operations to make sure that
     # an object is not cut and pasted into itself or one of its
@@ -0,0 +1,386 @@
+##############################################################################
+#
+# Copyright (c) 2017 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Cache and cache manager sharing the cached data between the processes
+of a host through a directory.
+"""
+
+from binascii import hexlify
+from hashlib import sha1
+from logging import getLogger
+from threading import Lock
+import errno
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+
+from AccessControl.class_init import InitializeClass
+from Acquisition import aq_base
+from App.Common import checkPrivateDirectory
+from App.special_dtml import DTMLFile
+from six.moves.cPickle import dump
+from six.moves.cPickle import HIGHEST_PROTOCOL
+from six.moves.cPickle import load
+
+from OFS.Cache import Cache
+from OFS.RAMCache import _keyValue
+from OFS.RAMCache import RAMCacheManager
+
+LOG = getLogger('OFS.FileCache')
+
+# The subdirectory of the cache directory holding the entries, and the
+# file marking it as made by a FileCache.
+ENTRIES_DIRECTORY = 'zope-file-cache'
+MARKER = '.zope-file-cache'
+
+# The directory of the File Cache Managers, see configure.
+_directory = None
+
+
+def configure(directory):
+    """Keep the entries of File Cache Managers in subdirectories of
+    `directory`. Passing an empty directory disables them.
+    """
+    global _directory
+    if directory:
+        checkPrivateDirectory(directory)
+        _directory = directory
+    else:
+        _directory = None
+
+
+def _hash(value):
+    return sha1(repr(value).encode('utf-8')).hexdigest()
+
+
+# Only files and directories named like this are entries.
+_isHash = re.compile('[0-9a-f]{40}$').match
+
+
+def _makeEntriesDirectory(directory):
+    # Create the marked subdirectory of `directory` for the entries, or
+    # make sure that an existing one was made by a FileCache.
+    path = os.path.join(directory, ENTRIES_DIRECTORY)
+    if not os.path.isdir(path):
+        tmp = tempfile.mkdtemp(prefix='.', dir=directory)
+        open(os.path.join(tmp, MARKER), 'w').close()
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            # Made by another process in the meantime, or not a
+            # directory.
+            shutil.rmtree(tmp, ignore_errors=True)
+    if not os.path.exists(os.path.join(path, MARKER)):
+        raise ValueError(
+            '%s was not made by a file cache, it is left alone.' % path)
+    checkPrivateDirectory(path)
+    return path
+
+
+class FileCache(Cache):
+    """A cache keeping every entry in a file below `directory`.
+
+    All processes using the same directory share the entries, and
+    invalidating an object removes its entries for all of them. Using a
+    directory on a memory file system (e.g. /dev/shm) keeps the entries
+    in shared memory. The directory is created if it does not exist
+    and must be owned by the user of the process and not be writable by
+    other users, as the entries are unpickled.
+
+    The entries are kept in the `zope-file-cache` subdirectory, which is
+    marked as made by the cache, and only names of entries are listed
+    or removed in it, so no other files are ever removed. The entries of
+    an object are kept in a subdirectory named after a hash of its
+    physical path. Files are written to a temporary name first and
+    renamed, and subdirectories are renamed before they are removed, so
+    no process reads a partial entry.
+
+    `max_entries`, `max_bytes` and `max_age` are as for RAMCache. Using
+    an entry updates the modification time of its file, the least
+    recently used files are removed when the limits are checked, which
+    happens at most every `check_interval` seconds per process. The
+    statistics are those of the current process.
+    """
+
+    settings = ('directory', 'max_entries', 'max_bytes', 'max_age',
+                'check_interval')
+
+    def __init__(self, directory, max_entries=1000, max_bytes=0,
+                 max_age=3600, check_interval=60):
+        self._lock = Lock()
+        self._last_check = 0
+        self.clearStatistics()
+        self.configure(directory, max_entries, max_bytes, max_age,
+                       check_interval)
+
+    def configure(self, directory, max_entries=1000, max_bytes=0,
+                  max_age=3600, check_interval=60):
+        checkPrivateDirectory(directory)
+        path = _makeEntriesDirectory(directory)
+        with self._lock:
+            self.directory = directory
+            self._path = path
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self.max_age = max_age
+            self.check_interval = check_interval
+        self.checkLimits()
+
+    def getSettings(self):
+        return dict((name, getattr(self, name)) for name in self.settings)
+
+    def clearStatistics(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+            self.invalidations = 0
+
+    def _count(self, name, value=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def _files(self):
+        # (modification time, size, file name) of all entries.
+        files = []
+        for name in os.listdir(self._path):
+            path = os.path.join(self._path, name)
+            if not _isHash(name) or not os.path.isdir(path):
+                continue
+            for entry in os.listdir(path):
+                if not _isHash(entry):
+                    continue
+                filename = os.path.join(path, entry)
+                try:
+                    st = os.stat(filename)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, filename))
+        return files
+
+    def getStatistics(self):
+        """Return a mapping with the statistics of the cache.
+        """
+        files = self._files()
+        with self._lock:
+            return {
+                'entries': len(files),
+                'size': sum(size for mtime, size, name in files),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+    def checkLimits(self):
+        """Remove the least recently used entries beyond the limits."""
+        self._last_check = time.time()
+        if not (self.max_entries or self.max_bytes):
+            return
+        files = self._files()
+        files.sort()
+        size = sum(file_size for mtime, file_size, name in files)
+        count = len(files)
+        evicted = 0
+        for mtime, file_size, filename in files:
+            if not ((self.max_entries and count > self.max_entries) or
+                    (self.max_bytes and size > self.max_bytes)):
+                break
+            self._unlink(filename)
+            count -= 1
+            size -= file_size
+            evicted += 1
+        self._count('evictions', evicted)
+
+    def _unlink(self, filename):
+        try:
+            os.unlink(filename)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+    def _removeDirectory(self, path):
+        # Rename the directory first, so no other process adds entries
+        # while it is being removed. Returns the number of entries.
+        removed = os.path.join(
+            self._path, '.removed-%s' % uuid.uuid4().hex)
+        try:
+            os.rename(path, removed)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return 0
+        count = len([name for name in os.listdir(removed)
+                     if _isHash(name)])
+        shutil.rmtree(removed, ignore_errors=True)
+        return count
+
+    def _getPath(self, ob):
+        path = tuple(ob.getPhysicalPath())
+        return os.path.join(self._path, _hash(path))
+
+    def _getKey(self, ob, view_name, keywords):
+        if keywords:
+            keywords = tuple(sorted((k, _keyValue(v))
+                                    for k, v in keywords.items()))
+        else:
+            keywords = ()
+        return (tuple(ob.getPhysicalPath()), view_name, keywords)
+
+    def ZCache_get(self, ob, view_name='', keywords=None,
+                   mtime_func=None, default=None):
+        key = self._getKey(ob, view_name, keywords)
+        filename = os.path.join(self._getPath(ob), _hash(key))
+        try:
+            with open(filename, 'rb') as f:
+                stored_key, expires, mtime, data = load(f)
+        except (IOError, OSError):
+            self._count('misses')
+            return default
+        except Exception:
+            LOG.warning('Cannot read cache entry %s', filename,
+                        exc_info=True)
+            self._unlink(filename)
+            self._count('misses')
+            return default
+        if stored_key != repr(key):
+            self._count('misses')
+            return default
+        if expires is not None and expires < time.time():
+            self._unlink(filename)
+            self._count('expirations')
+            self._count('misses')
+            return default
+        if ob.ZCacheable_getModTime(mtime_func) > mtime:
+            self._unlink(filename)
+            self._count('invalidations')
+            self._count('misses')
+            return default
+        try:
+            # Mark it as the most recently used one.
+            os.utime(filename, None)
+        except OSError:
+            pass
+        self._count('hits')
+        return data
+
+    def ZCache_set(self, ob, data, view_name='', keywords=None,
+                   mtime_func=None):
+        key = self._getKey(ob, view_name, keywords)
+        path = self._getPath(ob)
+        expires = None
+        if self.max_age:
+            expires = time.time() + self.max_age
+        mtime = ob.ZCacheable_getModTime(mtime_func)
+        fd, tmp = tempfile.mkstemp(prefix='.', dir=self._path)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                dump((repr(key), expires, mtime, data), f, HIGHEST_PROTOCOL)
+                size = f.tell()
+            if self.max_bytes and size > self.max_bytes:
+                return
+            try:
+                os.mkdir(path)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+            os.rename(tmp, os.path.join(path, _hash(key)))
+        except Exception:
+            # Unpicklable data, or the directory of the object was
+            # removed by an invalidation in the meantime.
+            LOG.debug('Not caching data for %r', ob, exc_info=True)
+        finally:
+            self._unlink(tmp)
+        if time.time() - self._last_check >= self.check_interval:
+            self.checkLimits()
+
+    def ZCache_invalidate(self, ob):
+        count = self._removeDirectory(self._getPath(ob))
+        self._count('invalidations', count)
+        return 'Invalidated %d cache entries.' % count
+
+    def invalidateAll(self):
+        """Remove all entries."""
+        count = 0
+        for name in os.listdir(self._path):
+            path = os.path.join(self._path, name)
+            if _isHash(name) and os.path.isdir(path):
+                count += self._removeDirectory(path)
+        self._count('invalidations', count)
+
+manage_addFileCacheManagerForm = DTMLFile('dtml/addFileCacheManager',
+                                          globals())
+
+
+def manage_addFileCacheManager(self, id, title='', REQUEST=None):
+    """Add a new File Cache Manager object with id *id*.
+    """
+    ob = FileCacheManager(id)
+    ob.title = title
+    self._setObject(id, ob)
+    if REQUEST is not None:
+        return self.manage_main(self, REQUEST)
+
+
+class FileCacheManager(RAMCacheManager):
+
+    """ Cache manager sharing the cached data between the processes of
+    a host, see FileCache.
+
+    The entries are kept in a subdirectory of the file-cache-directory
+    of zope.conf named after the database and oid of the manager, so
+    it is the same in all processes. Nothing is cached without a
+    file-cache-directory.
+    """
+    meta_type = 'File Cache Manager'
+
+    _cache_class = FileCache
+
+    check_interval = 60
+
+    _properties = RAMCacheManager._properties + (
+        {'id': 'check_interval', 'type': 'int', 'mode': 'w'},
+    )
+
+    def _getDirectory(self):
+        cache_id = self._getCacheId()
+        if isinstance(cache_id, tuple):
+            name = '%s-%s' % (cache_id[0],
+                              hexlify(cache_id[1]).decode('ascii'))
+        else:
+            name = 'process-%d-%s' % (os.getpid(), cache_id)
+        return os.path.join(_directory, name)
+
+    def _settings(self):
+        settings = dict((name, getattr(self, name))
+                        for name in self._cache_class.settings
+                        if name != 'directory')
+        settings['directory'] = self._getDirectory()
+        return settings
+
+    def ZCacheManager_getCache(self):
+        if _directory is None:
+            # Nothing is cached until a directory is configured.
+            return None
+        return super(FileCacheManager, self).ZCacheManager_getCache()
+
+    def manage_beforeDelete(self, item, container):
+        if aq_base(self) is aq_base(item) and _directory is not None:
+            self.ZCacheManager_getCache().invalidateAll()
+        super(FileCacheManager, self).manage_beforeDelete(item, container)
+
+InitializeClass(FileCacheManager)
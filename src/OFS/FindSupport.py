@@ -12,6 +12,8 @@
 ##############################################################################
 """Find support
 """
+from itertools import islice
+
 from AccessControl import ClassSecurityInfo
 from AccessControl.class_init import InitializeClass
 from AccessControl.Permission import getPermissionIdentifier
@@ -59,7 +61,8 @@ class FindSupport(Base):
                  obj_mtime=None, obj_mspec=None,
                  obj_permission=None, obj_roles=None,
                  search_sub=0,
-                 REQUEST=None, result=None, pre=''):
+                 REQUEST=None, result=None, pre='',
+                 limit=None, max_depth=None):
         """Zope Find interface"""
         return self.ZopeFindAndApply(
             obj, obj_ids=obj_ids,
@@ -67,7 +70,8 @@ class FindSupport(Base):
             obj_expr=obj_expr, obj_mtime=obj_mtime, obj_mspec=obj_mspec,
             obj_permission=obj_permission, obj_roles=obj_roles,
             search_sub=search_sub, REQUEST=REQUEST, result=result,
-            pre=pre, apply_func=None, apply_path='')
+            pre=pre, apply_func=None, apply_path='',
+            limit=limit, max_depth=max_depth)
 
     security.declareProtected(view_management_screens, 'ZopeFindAndApply')
     def ZopeFindAndApply(self, obj, obj_ids=None, obj_metatypes=None,
@@ -76,88 +80,181 @@ class FindSupport(Base):
                          obj_permission=None, obj_roles=None,
                          search_sub=0,
                          REQUEST=None, result=None, pre='',
-                         apply_func=None, apply_path=''):
+                         apply_func=None, apply_path='',
+                         limit=None, max_depth=None):
         """Zope Find interface and apply"""
 
         if result is None:
             result = []
-
-            if obj_metatypes and 'all' in obj_metatypes:
-                obj_metatypes = None
-
-            if obj_mtime and isinstance(obj_mtime, str):
-                obj_mtime = DateTime(obj_mtime).timeTime()
-
-            if obj_permission:
-                obj_permission = getPermissionIdentifier(obj_permission)
-
-            if obj_roles and isinstance(obj_roles, str):
-                obj_roles = [obj_roles]
-
-            if obj_expr:
-                # Setup expr machinations
-                md = td()
-                obj_expr = (Eval(obj_expr), md, md._push, md._pop)
-
-        base = aq_base(obj)
-
-        if not hasattr(base, 'objectItems'):
-            return result
-        try:
-            items = obj.objectItems()
-        except Exception:
-            return result
+            found = self.ZopeFindIter(
+                obj, obj_ids, obj_metatypes, obj_searchterm, obj_expr,
+                obj_mtime, obj_mspec, obj_permission, obj_roles,
+                search_sub, REQUEST, pre, limit, max_depth,
+                _deactivate=apply_func is not None)
+        else:
+            # Called with the criteria already prepared.
+            found = _find(obj, _Criteria(
+                obj_ids, obj_metatypes, obj_searchterm, obj_expr,
+                obj_mtime, obj_mspec, obj_permission, obj_roles),
+                search_sub, pre, max_depth, apply_func is not None)
+            if limit:
+                found = islice(found, limit)
 
         try:
             add_result = result.append
         except Exception:
             raise AttributeError(repr(result))
 
-        for id, ob in items:
-            if pre:
-                p = "%s/%s" % (pre, id)
+        for p, ob in found:
+            if apply_func:
+                apply_func(ob, (apply_path + '/' + p))
             else:
-                p = id
+                add_result((p, ob))
+
+        return result
 
-            dflag = 0
-            if hasattr(ob, '_p_changed') and (ob._p_changed is None):
-                dflag = 1
+    security.declareProtected(view_management_screens, 'ZopeFindIter')
+    def ZopeFindIter(self, obj, obj_ids=None, obj_metatypes=None,
+                     obj_searchterm=None, obj_expr=None,
+                     obj_mtime=None, obj_mspec=None,
+                     obj_permission=None, obj_roles=None,
+                     search_sub=0,
+                     REQUEST=None, pre='',
+                     limit=None, max_depth=None, _deactivate=False):
+        """Iterate over the (path, object) tuples found by ZopeFind
+
+        At most `limit` objects are found, and subobjects are searched
+        `max_depth` levels deep at most (1 is the subobjects of obj).
+        The search stops as soon as the iteration is not continued.
+        """
+        if obj_metatypes and 'all' in obj_metatypes:
+            obj_metatypes = None
+
+        if obj_mtime and isinstance(obj_mtime, str):
+            obj_mtime = DateTime(obj_mtime).timeTime()
+
+        if obj_permission:
+            obj_permission = getPermissionIdentifier(obj_permission)
+
+        if obj_roles and isinstance(obj_roles, str):
+            obj_roles = [obj_roles]
+
+        if obj_expr:
+            # Setup expr machinations
+            md = td()
+            obj_expr = (Eval(obj_expr), md, md._push, md._pop)
+
+        criteria = _Criteria(
+            obj_ids, obj_metatypes, obj_searchterm, obj_expr, obj_mtime,
+            obj_mspec, obj_permission, obj_roles)
+        found = _find(obj, criteria, search_sub, pre, max_depth, _deactivate)
+        if limit:
+            found = islice(found, limit)
+        return found
 
-            bs = aq_base(ob)
-            if ((not obj_ids or absattr(bs.getId()) in obj_ids) and
-                (not obj_metatypes or (hasattr(bs, 'meta_type') and
-                 bs.meta_type in obj_metatypes)) and
-                (not obj_searchterm or
+InitializeClass(FindSupport)
+
+
+class _Criteria(object):
+    # The prepared criteria of a search.
+
+    def __init__(self, ids, meta_types, searchterm, expr, mtime, mspec,
+                 permission, roles):
+        self.ids = ids
+        self.meta_types = meta_types
+        self.searchterm = searchterm
+        self.expr = expr
+        self.mtime = mtime
+        self.mspec = mspec
+        self.permission = permission
+        self.roles = roles
+
+    def matchMetadata(self, id, bs):
+        # The criteria which do not need the state of the object.
+        return ((not self.ids or id in self.ids) and
+                (not self.meta_types or (hasattr(bs, 'meta_type') and
+                 bs.meta_type in self.meta_types)))
+
+    def matchObject(self, ob):
+        # The remaining criteria, the cheaper ones first.
+        searchterm = self.searchterm
+        return ((not self.mtime or
+                 mtime_match(ob, self.mtime, self.mspec)) and
+                ((not self.permission or not self.roles) or
+                 role_match(ob, self.permission, self.roles)) and
+                (not self.expr or expr_match(ob, self.expr)) and
+                (not searchterm or
                  (hasattr(ob, 'PrincipiaSearchSource') and
-                  obj_searchterm in ob.PrincipiaSearchSource()) or
+                  searchterm in ob.PrincipiaSearchSource()) or
                  (hasattr(ob, 'SearchableText') and
-                  obj_searchterm in ob.SearchableText())
-                 ) and
-                (not obj_expr or expr_match(ob, obj_expr)) and
-                (not obj_mtime or mtime_match(ob, obj_mtime, obj_mspec)) and
-                ((not obj_permission or not obj_roles) or
-                 role_match(ob, obj_permission, obj_roles))):
-
-                if apply_func:
-                    apply_func(ob, (apply_path + '/' + p))
-                else:
-                    add_result((p, ob))
-                    dflag = 0
-
-            if search_sub and hasattr(bs, 'objectItems'):
-                self.ZopeFindAndApply(ob, obj_ids, obj_metatypes,
-                                      obj_searchterm, obj_expr,
-                                      obj_mtime, obj_mspec,
-                                      obj_permission, obj_roles,
-                                      search_sub,
-                                      REQUEST, result, p,
-                                      apply_func, apply_path)
-            if dflag:
-                ob._p_deactivate()
+                  searchterm in ob.SearchableText())))
+
+
+def _candidates(obj, criteria):
+    # Return an iterator of (id, subobject, metadata matched) tuples of
+    # obj. ObjectManagers tell the ids and meta types of their subobjects
+    # without loading them, and _getOb returns ghosts, so subobjects which
+    # don't match are only loaded if they are searched themselves.
+    base = aq_base(obj)
+    if not (hasattr(base, '_getOb') and hasattr(base, 'objectIds')):
+        return ((id, ob, criteria.matchMetadata(absattr(aq_base(ob).getId()),
+                                                aq_base(ob)))
+                for id, ob in obj.objectItems())
+
+    ids = obj.objectIds()
+    if criteria.meta_types:
+        matching = set(obj.objectIds(criteria.meta_types))
+    else:
+        matching = None
+
+    def candidates():
+        for id in ids:
+            ob = obj._getOb(id, None)
+            if ob is None:
+                continue
+            yield id, ob, ((not criteria.ids or id in criteria.ids) and
+                           (matching is None or id in matching))
+    return candidates()
+
+
+def _find(obj, criteria, search_sub, pre, max_depth, deactivate, depth=1):
+    # Iterate over the (path, object) tuples matching the criteria.
+    base = aq_base(obj)
+
+    if not hasattr(base, 'objectItems'):
+        return
+    try:
+        items = _candidates(obj, criteria)
+    except Exception:
+        return
 
-        return result
+    descend = search_sub and (max_depth is None or depth < max_depth)
 
-InitializeClass(FindSupport)
+    for id, ob, matched in items:
+        bs = aq_base(ob)
+        # Ask the class, a ghost is loaded by any attribute lookup.
+        folderish = descend and hasattr(bs.__class__, 'objectItems')
+        if not matched and not folderish:
+            continue
+
+        if pre:
+            p = "%s/%s" % (pre, id)
+        else:
+            p = id
+
+        dflag = getattr(bs, '_p_changed', 0) is None
+
+        if matched and criteria.matchObject(ob):
+            yield p, ob
+            if not deactivate:
+                dflag = 0
+
+        if folderish:
+            for found in _find(ob, criteria, search_sub, p, max_depth,
+                               deactivate, depth + 1):
+                yield found
+        if dflag:
+            ob._p_deactivate()
 
 
 class td(RestrictedDTML, TemplateDict):
@@ -14,6 +14,7 @@
 """
 
 from cgi import escape
+from hashlib import md5
 from io import BytesIO
 from mimetools import choose_boundary
 import struct
@@ -25,9 +26,11 @@ from AccessControl.Permissions import view_management_screens
 from AccessControl.Permissions import view as View  # NOQA
 from AccessControl.Permissions import ftp_access
 from AccessControl.SecurityInfo import ClassSecurityInfo
+from Acquisition import aq_base
 from Acquisition import Implicit
-from DateTime.DateTime import DateTime
+from BTrees.LOBTree import LOBTree
 from Persistence import Persistent
+import transaction
 from zExceptions import Redirect, ResourceLockedError
 from zope.contenttype import guess_content_type
 from zope.event import notify
@@ -44,7 +47,12 @@ from OFS.PropertyManager import PropertyManager
 from OFS.role import RoleManager
 from OFS.SimpleItem import Item_w__name__
 from ZPublisher import HTTPRangeSupport
+from ZPublisher.conditional import contentETag
+from ZPublisher.conditional import isETag
+from ZPublisher.conditional import isNotModified
+from ZPublisher.conditional import parseHTTPDate
 from ZPublisher.HTTPRequest import FileUpload
+from ZPublisher.Iterators import IStreamIterator
 
 if sys.version_info >= (3, ):
     unicode = str
@@ -100,6 +108,10 @@ class File(Persistent, Implicit, PropertyManager,
     precondition = ''
     size = None
 
+    # Maps the start offset of each link in a chain of Pdata objects
+    # to that link, so range requests can seek into the chain.
+    _pdata_index = None
+
     manage_editForm = DTMLFile('dtml/fileEdit', globals(),
                                Kind='File', kind='file')
     manage_editForm._setName('manage_editForm')
@@ -127,44 +139,50 @@ class File(Persistent, Implicit, PropertyManager,
         self.title = title
         self.precondition = precondition
 
-        data, size = self._read_data(file)
+        digest = md5()
+        data, size = self._read_data(file, digest)
         content_type = self._get_content_type(file, data, id, content_type)
-        self.update_data(data, content_type, size)
+        self.update_data(data, content_type, size,
+                         etag=contentETag((), digest))
+
+    # Entity tag derived from the data, see ZPublisher.conditional
+    _content_etag = None
+
+    def http__etag(self, readonly=0):
+        if self._content_etag is not None:
+            return self._content_etag
+        return super(File, self).http__etag(readonly)
+
+    def http__refreshEtag(self, etag=None):
+        if etag is not None:
+            # Computed while the data was read, see _read_data.
+            self._content_etag = etag
+            return
+        data = self.data
+        if isinstance(data, str):
+            self._content_etag = contentETag((data,))
+        else:
+            self._content_etag = contentETag(_pdata_chunks(data))
 
     def _if_modified_since_request_handler(self, REQUEST, RESPONSE):
-        # HTTP If-Modified-Since header handling: return True if
-        # we can handle this request by returning a 304 response
-        header = REQUEST.get_header('If-Modified-Since', None)
-        if header is not None:
-            header = header.split(';')[0]
-            # Some proxies seem to send invalid date strings for this
-            # header. If the date string is not valid, we ignore it
-            # rather than raise an error to be generally consistent
-            # with common servers such as Apache (which can usually
-            # understand the screwy date string as a lucky side effect
-            # of the way they parse it).
-            # This happens to be what RFC2616 tells us to do in the face of an
-            # invalid date.
-            try:
-                mod_since = int(DateTime(header).timeTime())
-            except Exception:
-                mod_since = None
-            if mod_since is not None:
-                if self._p_mtime:
-                    last_mod = int(self._p_mtime)
-                else:
-                    last_mod = 0
-                if last_mod > 0 and last_mod <= mod_since:
-                    RESPONSE.setHeader('Last-Modified',
-                                       rfc1123_date(self._p_mtime))
-                    RESPONSE.setHeader('Content-Type', self.content_type)
-                    RESPONSE.setHeader('Accept-Ranges', 'bytes')
-                    RESPONSE.setStatus(304)
-                    return True
+        # HTTP If-None-Match and If-Modified-Since header handling: return
+        # True if we can handle this request by returning a 304 response.
+        # Neither needs the data to be loaded.
+        etag = self._content_etag
+        if isNotModified(REQUEST, etag, self._p_mtime):
+            if self._p_mtime:
+                RESPONSE.setHeader('Last-Modified',
+                                   rfc1123_date(self._p_mtime))
+            if etag is not None:
+                RESPONSE.setHeader('ETag', '"%s"' % etag)
+            RESPONSE.setHeader('Content-Type', self.content_type)
+            RESPONSE.setHeader('Accept-Ranges', 'bytes')
+            RESPONSE.setStatus(304)
+            return True
 
     def _range_request_handler(self, REQUEST, RESPONSE):
         # HTTP Range header handling: return True if we've served a range
-        # chunk out of our data.
+        # chunk out of our data, or a stream iterator that will serve it.
         range = REQUEST.get_header('Range', None)
         request_range = REQUEST.get_header('Request-Range', None)
         if request_range is not None:
@@ -178,20 +196,16 @@ class File(Persistent, Implicit, PropertyManager,
             if if_range is not None:
                 # Only send ranges if the data isn't modified, otherwise send
                 # the whole object. Support both ETags and Last-Modified dates!
-                if len(if_range) > 1 and if_range[:2] == 'ts':
-                    # ETag:
-                    if if_range != self.http__etag():
+                if len(if_range) > 1 and isETag(if_range):
+                    # ETag, If-Range requires a strong match
+                    if if_range.strip('"') != self.http__etag():
                         # Modified, so send a normal response. We delete
                         # the ranges, which causes us to skip to the 200
                         # response.
                         ranges = None
                 else:
                     # Date
-                    date = if_range.split(';')[0]
-                    try:
-                        mod_since = int(DateTime(date).timeTime())
-                    except Exception:
-                        mod_since = None
+                    mod_since = parseHTTPDate(if_range)
                     if mod_since is not None:
                         if self._p_mtime:
                             last_mod = int(self._p_mtime)
@@ -244,8 +258,11 @@ class File(Persistent, Implicit, PropertyManager,
                         RESPONSE.write(data[start:end])
                         return True
 
+                    if self._p_jar is not None:
+                        return PdataStreamIterator(self, [(start, end)])
+
                     # Linked Pdata objects. Urgh.
-                    pos = 0
+                    pos, data = self._seek_pdata(start)
                     while data is not None:
                         l = len(data.data)
                         pos = pos + l
@@ -299,6 +316,19 @@ class File(Persistent, Implicit, PropertyManager,
                     RESPONSE.setStatus(206)  # Partial content
 
                     data = self.data
+                    if not isinstance(data, str) and self._p_jar is not None:
+                        parts = []
+                        for start, end in ranges:
+                            parts.append(
+                                '\r\n--%s\r\n'
+                                'Content-Type: %s\r\n'
+                                'Content-Range: bytes %d-%d/%d\r\n\r\n' % (
+                                    boundary, self.content_type,
+                                    start, end - 1, self.size))
+                            parts.append((start, end))
+                        parts.append('\r\n--%s--\r\n' % boundary)
+                        return PdataStreamIterator(self, parts)
+
                     # The Pdata map allows us to jump into the Pdata chain
                     # arbitrarily during out-of-order range searching.
                     pdata_map = {}
@@ -316,19 +346,24 @@ class File(Persistent, Implicit, PropertyManager,
                             RESPONSE.write(data[start:end])
 
                         else:
-                            # Yippee. Linked Pdata objects. The following
-                            # calculations allow us to fast-forward through the
-                            # Pdata chain without a lot of dereferencing if we
-                            # did the work already.
-                            first_size = len(pdata_map[0].data)
-                            if start < first_size:
-                                closest_pos = 0
+                            # Yippee. Linked Pdata objects. Seek straight to
+                            # the link containing start if we have an index.
+                            # Otherwise, the following calculations allow us
+                            # to fast-forward through the Pdata chain without
+                            # a lot of dereferencing if we did the work
+                            # already.
+                            if self._pdata_index is not None:
+                                pos, data = self._seek_pdata(start)
                             else:
-                                closest_pos = (
-                                    ((start - first_size) >> 16 << 16) +
-                                    first_size)
-                            pos = min(closest_pos, max(pdata_map.keys()))
-                            data = pdata_map[pos]
+                                first_size = len(pdata_map[0].data)
+                                if start < first_size:
+                                    closest_pos = 0
+                                else:
+                                    closest_pos = (
+                                        ((start - first_size) >> 16 << 16) +
+                                        first_size)
+                                pos = min(closest_pos, max(pdata_map.keys()))
+                                data = pdata_map[pos]
 
                             while data is not None:
                                 l = len(data.data)
@@ -364,6 +399,21 @@ class File(Persistent, Implicit, PropertyManager,
                     RESPONSE.write('\r\n--%s--\r\n' % boundary)
                     return True
 
+    def _seek_pdata(self, offset):
+        # Return the link of our Pdata chain containing `offset`, together
+        # with its start offset. Without an index, start at the head.
+        index = self._pdata_index
+        if index is None:
+            return 0, self.data
+        pos = index.maxKey(offset)
+        return pos, index[pos]
+
+    def _check_pdata_index(self, data):
+        # Drop the Pdata index unless it was built for `data`.
+        index = self._pdata_index
+        if index is not None and index.get(0) is not aq_base(data):
+            self._pdata_index = None
+
     security.declareProtected(View, 'index_html')
     def index_html(self, REQUEST, RESPONSE):
         """
@@ -393,14 +443,19 @@ class File(Persistent, Implicit, PropertyManager,
             else:
                 c()
 
-        if self._range_request_handler(REQUEST, RESPONSE):
+        result = self._range_request_handler(REQUEST, RESPONSE)
+        if result:
             # we served a chunk of content in response to a range request.
+            if IStreamIterator.providedBy(result):
+                return result
             return ''
 
         RESPONSE.setHeader('Last-Modified', rfc1123_date(self._p_mtime))
         RESPONSE.setHeader('Content-Type', self.content_type)
         RESPONSE.setHeader('Content-Length', self.size)
         RESPONSE.setHeader('Accept-Ranges', 'bytes')
+        if self._content_etag is not None:
+            RESPONSE.setHeader('ETag', '"%s"' % self._content_etag)
 
         if self.ZCacheable_isCachingEnabled():
             result = self.ZCacheable_get(default=None)
@@ -418,6 +473,9 @@ class File(Persistent, Implicit, PropertyManager,
             RESPONSE.setBase(None)
             return data
 
+        if self._p_jar is not None:
+            return PdataStreamIterator(self, [(0, self.size)])
+
         while data is not None:
             RESPONSE.write(data.data)
             data = data.next
@@ -439,7 +497,7 @@ class File(Persistent, Implicit, PropertyManager,
         return ''
 
     security.declarePrivate('update_data')
-    def update_data(self, data, content_type=None, size=None):
+    def update_data(self, data, content_type=None, size=None, etag=None):
         if isinstance(data, unicode):
             raise TypeError('Data can only be str or file-like.  '
                             'Unicode objects are expressly forbidden.')
@@ -450,9 +508,10 @@ class File(Persistent, Implicit, PropertyManager,
             size = len(data)
         self.size = size
         self.data = data
+        self._check_pdata_index(data)
         self.ZCacheable_invalidate()
         self.ZCacheable_set(None)
-        self.http__refreshEtag()
+        self.http__refreshEtag(etag)
 
     security.declareProtected(change_images_and_files, 'manage_edit')
     def manage_edit(self, title, content_type, precondition='',
@@ -491,10 +550,12 @@ class File(Persistent, Implicit, PropertyManager,
         if self.wl_isLocked():
             raise ResourceLockedError("File is locked.")
 
-        data, size = self._read_data(file)
+        digest = md5()
+        data, size = self._read_data(file, digest)
         content_type = self._get_content_type(file, data, self.__name__,
                                               'application/octet-stream')
-        self.update_data(data, content_type, size)
+        self.update_data(data, content_type, size,
+                         etag=contentETag((), digest))
 
         notify(ObjectModifiedEvent(self))
 
@@ -514,14 +575,22 @@ class File(Persistent, Implicit, PropertyManager,
                 getattr(file, 'filename', id), body, content_type)
         return content_type
 
-    def _read_data(self, file):
+    def _read_data(self, file, digest=None):
+        # Returns the data, as a string or a Pdata chain, and its size.
+        # The data is added to the md5 hash object `digest` if given, so
+        # the entity tag needn't be computed from the chain again.
         import transaction
 
         n = 1 << 16
 
+        wants_digest = digest is not None
+        if digest is None:
+            digest = md5()
+
         if isinstance(file, str):
             size = len(file)
             if size < n:
+                digest.update(file)
                 return (file, size)
             # Big string: cut it into smaller chunks
             file = BytesIO(file)
@@ -531,6 +600,8 @@ class File(Persistent, Implicit, PropertyManager,
 
         if hasattr(file, '__class__') and file.__class__ is Pdata:
             size = len(file)
+            for chunk in _pdata_chunks(file):
+                digest.update(chunk)
             return (file, size)
 
         seek = file.seek
@@ -541,9 +612,11 @@ class File(Persistent, Implicit, PropertyManager,
 
         if size <= 2 * n:
             seek(0)
+            data = read(size)
+            digest.update(data)
             if size < n:
-                return read(size), size
-            return Pdata(read(size)), size
+                return data, size
+            return Pdata(data), size
 
         # Make sure we have an _p_jar, even if we are a new object, by
         # doing a sub-transaction commit.
@@ -552,13 +625,26 @@ class File(Persistent, Implicit, PropertyManager,
         if self._p_jar is None:
             # Ugh
             seek(0)
-            return Pdata(read(size)), size
+            data = read(size)
+            digest.update(data)
+            return Pdata(data), size
+
+        if wants_digest:
+            # The chain is built from back to front below, the digest
+            # needs the data from front to back.
+            seek(0)
+            while True:
+                chunk = read(n)
+                if not chunk:
+                    break
+                digest.update(chunk)
 
         # Now we're going to build a linked list from back
         # to front to minimize the number of database updates
         # and to allow us to get things out of memory as soon as
         # possible.
         _next = None
+        index = LOBTree()
         while end > 0:
             pos = end - n
             if pos < n:
@@ -579,9 +665,11 @@ class File(Persistent, Implicit, PropertyManager,
             assert data._p_oid is not None
             assert data._p_state == -1
 
+            index[pos] = data
             _next = data
             end = pos
 
+        self._pdata_index = index
         return (_next, size)
 
     security.declareProtected(View, 'get_size')
@@ -618,10 +706,12 @@ class File(Persistent, Implicit, PropertyManager,
 
             file = REQUEST['BODYFILE']
 
-            data, size = self._read_data(file)
+            digest = md5()
+            data, size = self._read_data(file, digest)
             content_type = self._get_content_type(file, data, self.__name__,
                                                   type or self.content_type)
-            self.update_data(data, content_type, size)
+            self.update_data(data, content_type, size,
+                             etag=contentETag((), digest))
 
             RESPONSE.setStatus(204)
             return RESPONSE
@@ -818,7 +908,7 @@ class Image(File):
     manage_uploadForm = manage_editForm
 
     security.declarePrivate('update_data')
-    def update_data(self, data, content_type=None, size=None):
+    def update_data(self, data, content_type=None, size=None, etag=None):
         if isinstance(data, unicode):
             raise TypeError('Data can only be str or file-like.  '
                             'Unicode objects are expressly forbidden.')
@@ -828,6 +918,7 @@ class Image(File):
 
         self.size = size
         self.data = data
+        self._check_pdata_index(data)
 
         ct, width, height = getImageInfo(data)
         if ct:
@@ -842,7 +933,7 @@ class Image(File):
 
         self.ZCacheable_invalidate()
         self.ZCacheable_set(None)
-        self.http__refreshEtag()
+        self.http__refreshEtag(etag)
 
     def __str__(self):
         return self.tag()
@@ -929,8 +1020,11 @@ class Pdata(Persistent, Implicit):
         return self.data[i:j]
 
     def __len__(self):
-        data = str(self)
-        return len(data)
+        size = 0
+        while self is not None:
+            size = size + len(self.data)
+            self = self.next
+        return size
 
     def __str__(self):
         _next = self.next
@@ -944,3 +1038,85 @@ class Pdata(Persistent, Implicit):
             _next = self.next
 
         return ''.join(r)
+
+
+def _pdata_chunks(data):
+    # The strings of a Pdata chain
+    while data is not None:
+        yield data.data
+        data = data.next
+
+
+@implementer(IStreamIterator)
+class PdataStreamIterator(object):
+    """Stream ranges of the Pdata chain of a File.
+
+    The links of the chain are loaded one at a time from a database
+    connection of our own and released once they have been sent, so
+    memory use does not grow with the size of the file, and the request's
+    connection may be closed before streaming starts.
+
+    'parts' is a sequence of (start, end) byte ranges of the file's data
+    and of strings, which are sent as they are.
+    """
+
+    def __init__(self, file, parts):
+        self._db = file._p_jar.db()
+        self._parts = []
+        self._size = 0
+        for part in parts:
+            if isinstance(part, str):
+                self._parts.append(part)
+                self._size = self._size + len(part)
+            else:
+                start, end = part
+                pos, link = file._seek_pdata(start)
+                self._parts.append((start, end, pos, aq_base(link)))
+                self._size = self._size + end - start
+        self._chunks = self._read()
+
+    def _read(self):
+        connection = None
+        try:
+            for part in self._parts:
+                if isinstance(part, str):
+                    yield part
+                    continue
+
+                start, end, pos, link = part
+                while link is not None and pos < end:
+                    if link._p_oid is not None:
+                        # Load the link into our own connection.
+                        if connection is None:
+                            connection = self._db.open(
+                                transaction_manager=(
+                                    transaction.TransactionManager()))
+                        link = connection.get(link._p_oid)
+                        data, _next = link.data, link.next
+                        link._p_deactivate()
+                    else:
+                        # Not stored yet, so it only exists in memory.
+                        data, _next = link.data, link.next
+
+                    l = len(data)
+                    if pos + l > start:
+                        yield data[max(start - pos, 0):end - pos]
+                    pos = pos + l
+                    link = _next
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._chunks)
+
+    next = __next__
+
+    def __len__(self):
+        return self._size
+
+    def close(self):
+        self._chunks.close()
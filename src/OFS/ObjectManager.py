@@ -14,7 +14,7 @@
 """
 
 from cgi import escape
-from io import BytesIO
+from hashlib import md5
 from logging import getLogger
 import copy
 import fnmatch
@@ -52,6 +52,7 @@ from zope.interface import implementer
 from zope.interface.interfaces import ComponentLookupError
 from zope.lifecycleevent import ObjectAddedEvent
 from zope.lifecycleevent import ObjectRemovedEvent
+from ZTUtils.Lazy import LazyMap
 
 from OFS import bbb
 from OFS.CopySupport import CopyContainer
@@ -61,6 +62,9 @@ from OFS.event import ObjectWillBeAddedEvent
 from OFS.event import ObjectWillBeRemovedEvent
 from OFS.Lockable import LockableItem
 from OFS.subscribers import compatibilityCall
+from OFS.zexp import BatchImporter
+from OFS.zexp import exportChunks
+from OFS.zexp import ExportStreamIterator
 
 import collections
 
@@ -289,6 +293,24 @@ class ObjectManager(CopyContainer,
     def _delOb(self, id):
         delattr(self, id)
 
+    def _addObjectInfo(self, id, meta_type):
+        self._addObjectInfos([(id, meta_type)])
+
+    def _addObjectInfos(self, infos):
+        # Record new subobjects, a sequence of (id, meta_type) tuples,
+        # in the _objects list.
+        self._objects = self._objects + tuple(
+            {'id': id, 'meta_type': meta_type} for id, meta_type in infos)
+
+    def _removeObjectInfo(self, id):
+        self._removeObjectInfos([id])
+
+    def _removeObjectInfos(self, ids):
+        # Remove subobjects from the _objects list.
+        ids = set(ids)
+        self._objects = tuple([i for i in self._objects
+                               if i['id'] not in ids])
+
     def _getOb(self, id, default=_marker):
         # FIXME: what we really need to do here is ensure that only
         # sub-items are returned. That could have a measurable hit
@@ -327,31 +349,18 @@ class ObjectManager(CopyContainer,
         t = getattr(ob, 'meta_type', None)
 
         # If an object by the given id already exists, remove it.
-        for object_info in self._objects:
-            if object_info['id'] == id:
-                self._delObject(id)
-                break
+        if id in self:
+            self._delObject(id)
 
         if not suppress_events:
             notify(ObjectWillBeAddedEvent(ob, self, id))
 
-        self._objects = self._objects + ({'id': id, 'meta_type': t},)
+        self._addObjectInfo(id, t)
         self._setOb(id, ob)
         ob = self._getOb(id)
 
         if set_owner:
-            # TODO: eventify manage_fixupOwnershipAfterAdd
-            # This will be called for a copy/clone, or a normal _setObject.
-            ob.manage_fixupOwnershipAfterAdd()
-
-            # Try to give user the local role "Owner", but only if
-            # no local roles have been set on the object yet.
-            if getattr(ob, '__ac_local_roles__', _marker) is None:
-                user = getSecurityManager().getUser()
-                if user is not None:
-                    userid = user.getId()
-                    if userid is not None:
-                        ob.manage_setLocalRoles(userid, ['Owner'])
+            self._setOwnerAfterAdd(ob)
 
         if not suppress_events:
             notify(ObjectAddedEvent(ob, self, id))
@@ -361,6 +370,72 @@ class ObjectManager(CopyContainer,
 
         return id
 
+    def _setOwnerAfterAdd(self, ob):
+        # TODO: eventify manage_fixupOwnershipAfterAdd
+        # This will be called for a copy/clone, or a normal _setObject.
+        ob.manage_fixupOwnershipAfterAdd()
+
+        # Try to give user the local role "Owner", but only if
+        # no local roles have been set on the object yet.
+        if getattr(ob, '__ac_local_roles__', _marker) is None:
+            user = getSecurityManager().getUser()
+            if user is not None:
+                userid = user.getId()
+                if userid is not None:
+                    ob.manage_setLocalRoles(userid, ['Owner'])
+
+    def _setObjects(self, items, set_owner=1, suppress_events=False):
+        """Set many objects into this container at once.
+
+        'items' is a sequence of (id, object) tuples. The subobject list
+        of the container is only updated once. Sends
+        IObjectWillBeAddedEvent and IObjectAddedEvent for every object
+        but only one IContainerModifiedEvent. Returns the list of ids.
+        """
+        checked = []
+        seen = set()
+        for id, ob in items:
+            v = self._checkId(id)
+            if v is not None:
+                id = v
+            if id in seen:
+                raise BadRequest(
+                    'The id "%s" is invalid - it is already in use.' % id)
+            seen.add(id)
+            checked.append((id, ob))
+        if not checked:
+            return []
+
+        # If objects by the given ids already exist, remove them.
+        existing = [id for id, ob in checked if id in self]
+        if existing and self._overridesDelObject():
+            for id in existing:
+                self._delObject(id)
+        elif existing:
+            self._removeObjects(existing, suppress_events=suppress_events)
+
+        if not suppress_events:
+            for id, ob in checked:
+                notify(ObjectWillBeAddedEvent(ob, self, id))
+
+        self._addObjectInfos(
+            [(id, getattr(ob, 'meta_type', None)) for id, ob in checked])
+        for id, ob in checked:
+            self._setOb(id, ob)
+
+        for id, ob in checked:
+            ob = self._getOb(id)
+            if set_owner:
+                self._setOwnerAfterAdd(ob)
+            if not suppress_events:
+                notify(ObjectAddedEvent(ob, self, id))
+            compatibilityCall('manage_afterAdd', ob, ob, self)
+
+        if not suppress_events:
+            notifyContainerModified(self)
+
+        return [id for id, ob in checked]
+
     def manage_afterAdd(self, item, container):
         # Don't do recursion anymore, a subscriber does that.
         pass
@@ -388,8 +463,7 @@ class ObjectManager(CopyContainer,
         if not suppress_events:
             notify(ObjectWillBeRemovedEvent(ob, self, id))
 
-        self._objects = tuple([i for i in self._objects
-                               if i['id'] != id])
+        self._removeObjectInfo(id)
         self._delOb(id)
 
         # Indicate to the object that it has been deleted. This is
@@ -406,20 +480,90 @@ class ObjectManager(CopyContainer,
             notify(ObjectRemovedEvent(ob, self, id))
             notifyContainerModified(self)
 
+    def _delObjects(self, ids, suppress_events=False):
+        """Delete many objects from this container at once.
+
+        The subobject list of the container is only updated once. Sends
+        IObjectWillBeRemovedEvent and IObjectRemovedEvent for every
+        object but only one IContainerModifiedEvent.
+
+        If a subclass overrides _delObject, it is called for every
+        object instead.
+        """
+        if self._overridesDelObject():
+            for id in ids:
+                if suppress_events:
+                    self._delObject(id, suppress_events=True)
+                else:
+                    self._delObject(id)
+            return
+        if self._removeObjects(ids, suppress_events) and not suppress_events:
+            notifyContainerModified(self)
+
+    def _overridesDelObject(self):
+        # Whether the class has its own _delObject, which must not be
+        # bypassed when deleting many objects.
+        method = self.__class__._delObject
+        return (getattr(method, '__func__', method) is not
+                _delObjectFunction)
+
+    def _removeObjects(self, ids, suppress_events=False):
+        obs = [(id, self._getOb(id)) for id in ids]
+
+        for id, ob in obs:
+            compatibilityCall('manage_beforeDelete', ob, ob, self)
+            if not suppress_events:
+                notify(ObjectWillBeRemovedEvent(ob, self, id))
+
+        self._removeObjectInfos([id for id, ob in obs])
+        for id, ob in obs:
+            self._delOb(id)
+            # See _delObject
+            try:
+                ob._v__object_deleted__ = 1
+            except Exception:
+                pass
+
+        if not suppress_events:
+            for id, ob in obs:
+                notify(ObjectRemovedEvent(ob, self, id))
+        return obs
+
+    def _getObjectsIndex(self):
+        # Return the ids of all subobjects, a mapping of meta types to
+        # ids and the set of ids, computed once for every new _objects
+        # tuple.
+        objects = self._objects
+        index = getattr(self, '_v_objects_index', None)
+        if index is None or index[0] is not objects:
+            ids = []
+            meta_types = {}
+            for o in objects:
+                ids.append(o['id'])
+                meta_types.setdefault(o['meta_type'], []).append(o['id'])
+            index = self._v_objects_index = (
+                objects, ids, meta_types, frozenset(ids))
+        return index
+
+    def _objectIdsSequence(self, spec=None):
+        # Return a sequence of subobject ids in order, which must not be
+        # modified. If 'spec' is specified, only the ids of objects whose
+        # meta_type matches 'spec'.
+        objects, ids, meta_types, id_set = self._getObjectsIndex()
+        if spec is None:
+            return ids
+        if isinstance(spec, str):
+            spec = [spec]
+        if len(spec) == 1:
+            return meta_types.get(spec[0], ())
+        return [o['id'] for o in objects if o['meta_type'] in spec]
+
     security.declareProtected(access_contents_information, 'objectIds')
     def objectIds(self, spec=None):
         # Returns a list of subobject ids of the current object.
         # If 'spec' is specified, returns objects whose meta_type
         # matches 'spec'.
-        if spec is not None:
-            if isinstance(spec, str):
-                spec = [spec]
-            set = []
-            for ob in self._objects:
-                if ob['meta_type'] in spec:
-                    set.append(ob['id'])
-            return set
-        return [o['id'] for o in self._objects]
+        return list(self._objectIdsSequence(spec))
 
     security.declareProtected(access_contents_information, 'objectValues')
     def objectValues(self, spec=None):
@@ -435,6 +579,26 @@ class ObjectManager(CopyContainer,
         # 'spec'
         return [(id, self._getOb(id)) for id in self.objectIds(spec)]
 
+    security.declareProtected(access_contents_information, 'lazyObjectIds')
+    def lazyObjectIds(self, spec=None):
+        # Returns a lazy sequence of subobject ids of the current object,
+        # see objectIds.
+        return LazyMap(str, self._objectIdsSequence(spec))
+
+    security.declareProtected(access_contents_information, 'lazyObjectValues')
+    def lazyObjectValues(self, spec=None):
+        # Returns a lazy sequence of the subobjects of the current object,
+        # see objectValues. Subobjects are only loaded when accessed, so
+        # a slice of the sequence only loads the subobjects in it.
+        return LazyMap(self._getOb, self._objectIdsSequence(spec))
+
+    security.declareProtected(access_contents_information, 'lazyObjectItems')
+    def lazyObjectItems(self, spec=None):
+        # Returns a lazy sequence of (id, subobject) tuples of the current
+        # object, see objectItems and lazyObjectValues.
+        return LazyMap(lambda id: (id, self._getOb(id)),
+                       self._objectIdsSequence(spec))
+
     def objectMap(self):
         # Return a tuple of mappings containing subobject meta-data
         return tuple(d.copy() for d in self._objects)
@@ -532,18 +696,20 @@ class ObjectManager(CopyContainer,
         for n in ids:
             if n in p:
                 raise BadRequest('Not Deletable')
-        while ids:
-            id = ids[-1]
+        # Delete in reverse order, as we always did.
+        ids = list(reversed(ids))
+        seen = set()
+        for id in ids:
             v = self._getOb(id, self)
 
             if v.wl_isLocked():
                 raise ResourceLockedError(
                     'Object "%s" is locked.' % v.getId())
 
-            if v is self:
-                raise BadRequest('%s does not exist' % escape(ids[-1]))
-            self._delObject(id)
-            del ids[-1]
+            if v is self or id in seen:
+                raise BadRequest('%s does not exist' % escape(id))
+            seen.add(id)
+        self._delObjects(ids)
         if REQUEST is not None:
             return self.manage_main(self, REQUEST)
 
@@ -588,13 +754,13 @@ class ObjectManager(CopyContainer,
         suffix = 'zexp'
 
         if download:
-            f = BytesIO()
-            ob._p_jar.exportFile(ob._p_oid, f)
-            if RESPONSE is not None:
-                RESPONSE.setHeader('Content-type', 'application/data')
-                RESPONSE.setHeader('Content-Disposition',
-                                   'inline;filename=%s.%s' % (id, suffix))
-            return f.getvalue()
+            if RESPONSE is None:
+                return b''.join(exportChunks(ob._p_jar, ob._p_oid))
+            RESPONSE.setHeader('Content-type', 'application/data')
+            RESPONSE.setHeader('Content-Disposition',
+                               'inline;filename=%s.%s' % (id, suffix))
+            # The publisher sends the export as it is produced.
+            return ExportStreamIterator(ob)
 
         cfg = getConfiguration()
         f = os.path.join(cfg.clienthome, '%s.%s' % (id, suffix))
@@ -637,7 +803,11 @@ class ObjectManager(CopyContainer,
                 title='Object imported',
                 update_menu=1)
 
-    def _importObjectFromFile(self, filepath, verify=1, set_owner=1):
+    def _importObjectFromFile(self, filepath, verify=1, set_owner=1,
+                              batch_size=0, progress=None):
+        # A batch_size commits the transaction after every batch_size
+        # objects, see OFS.zexp.BatchImporter. This is only possible
+        # from scripts, not while publishing a request.
         # locate a valid connection
         connection = self._p_jar
         obj = self
@@ -645,7 +815,16 @@ class ObjectManager(CopyContainer,
         while connection is None:
             obj = aq_parent(obj)
             connection = obj._p_jar
-        ob = connection.importFile(filepath)
+        if batch_size and filepath.endswith('.zexp'):
+            path = '/'.join(self.getPhysicalPath())
+            checkpoint = '%s.%s.checkpoint' % (
+                filepath, md5(path.encode('utf-8')).hexdigest()[:12])
+            importer = BatchImporter(
+                connection, filepath, batch_size=batch_size,
+                checkpoint=checkpoint, progress=progress, key=path)
+            ob = importer()
+        else:
+            ob = connection.importFile(filepath)
         if verify:
             self._verifyObjectPaste(ob, validate_src=0)
         id = ob.id
@@ -798,11 +977,11 @@ class ObjectManager(CopyContainer,
         return self._setObject(key, value)
 
     def __contains__(self, name):
-        for ob in self._objects:
-            if name == ob['id']:
-                return True
-
-        return False
+        try:
+            return name in self._getObjectsIndex()[3]
+        except TypeError:
+            # unhashable
+            return False
 
     def __iter__(self):
         return iter(self.objectIds())
@@ -837,6 +1016,9 @@ class ObjectManager(CopyContainer,
 # Don't InitializeClass, there is a specific __class_init__ on ObjectManager
 # InitializeClass(ObjectManager)
 
+_delObjectFunction = getattr(ObjectManager._delObject, '__func__',
+                             ObjectManager._delObject)
+
 
 def findChildren(obj, dirname=''):
     """ recursive walk through the object hierarchy to
@@ -0,0 +1,352 @@
+##############################################################################
+#
+# Copyright (c) 2017 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""In-process RAM cache and cache manager.
+"""
+
+from collections import OrderedDict
+from logging import getLogger
+from threading import Lock
+import sys
+import time
+
+from AccessControl.class_init import InitializeClass
+from AccessControl.SecurityInfo import ClassSecurityInfo
+from Acquisition import aq_base
+from App.special_dtml import DTMLFile
+from six import binary_type
+from six import text_type
+from six.moves.cPickle import dumps
+from six.moves.cPickle import HIGHEST_PROTOCOL
+
+from OFS.Cache import Cache
+from OFS.Cache import CacheManager
+from OFS.Cache import ChangeCacheSettingsPermission
+from OFS.Cache import ViewManagementScreensPermission
+from OFS.PropertyManager import PropertyManager
+from OFS.SimpleItem import SimpleItem
+
+LOG = getLogger('OFS.RAMCache')
+
+
+def _keyValue(value):
+    # Turn a keyword value into something hashable which is equal for
+    # equal values. Objects with a physical path are represented by it.
+    getPhysicalPath = getattr(value, 'getPhysicalPath', None)
+    if getPhysicalPath is not None:
+        try:
+            return ('path',) + tuple(getPhysicalPath())
+        except Exception:
+            pass
+    if isinstance(value, dict):
+        return tuple(sorted((k, _keyValue(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_keyValue(v) for v in value)
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+def _approximateSize(data):
+    # The memory used by strings, or the size of the pickle of other data.
+    # Returns None if the data cannot be pickled.
+    if isinstance(data, (binary_type, text_type)):
+        return sys.getsizeof(data)
+    try:
+        return len(dumps(data, HIGHEST_PROTOCOL))
+    except Exception:
+        return None
+
+
+class _Entry(object):
+
+    __slots__ = ('data', 'size', 'mtime', 'expires', 'path')
+
+    def __init__(self, data, size, mtime, expires, path):
+        self.data = data
+        self.size = size
+        self.mtime = mtime
+        self.expires = expires
+        self.path = path
+
+
+class RAMCache(Cache):
+    """A thread safe cache keeping the data in memory.
+
+    Entries are evicted in least recently used order when there are more
+    than `max_entries` of them or the approximate size of their data
+    exceeds `max_bytes`. An entry expires `max_age` seconds after it was
+    stored and is ignored once the object it was stored for was modified
+    (see Cacheable.ZCacheable_getModTime). A limit of 0 means no limit.
+    """
+
+    # The names of the arguments of configure
+    settings = ('max_entries', 'max_bytes', 'max_age')
+
+    def __init__(self, max_entries=1000, max_bytes=0, max_age=3600):
+        self._lock = Lock()
+        self._entries = OrderedDict()  # key -> _Entry, oldest first
+        self._paths = {}  # physical path -> set of keys
+        self._size = 0
+        self.configure(max_entries, max_bytes, max_age)
+        self.clearStatistics()
+
+    def configure(self, max_entries=1000, max_bytes=0, max_age=3600):
+        with self._lock:
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self.max_age = max_age
+            self._evict()
+
+    def getSettings(self):
+        return dict((name, getattr(self, name)) for name in self.settings)
+
+    def clearStatistics(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+            self.invalidations = 0
+
+    def getStatistics(self):
+        """Return a mapping with the statistics of the cache.
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'size': self._size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+    def _getKey(self, path, view_name, keywords):
+        if keywords:
+            keywords = tuple(sorted((k, _keyValue(v))
+                                    for k, v in keywords.items()))
+        else:
+            keywords = ()
+        return (path, view_name, keywords)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._size -= entry.size
+        keys = self._paths.get(entry.path)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._paths[entry.path]
+
+    def _evict(self):
+        entries = self._entries
+        while entries and (
+                (self.max_entries and len(entries) > self.max_entries) or
+                (self.max_bytes and self._size > self.max_bytes)):
+            key = next(iter(entries))
+            self._remove(key)
+            self.evictions += 1
+
+    def ZCache_get(self, ob, view_name='', keywords=None,
+                   mtime_func=None, default=None):
+        path = tuple(ob.getPhysicalPath())
+        key = self._getKey(path, view_name, keywords)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry.expires is not None and entry.expires < time.time():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+        # Get the modification time without holding the lock, it may
+        # load the object from the database.
+        mtime = ob.ZCacheable_getModTime(mtime_func)
+        with self._lock:
+            if mtime > entry.mtime:
+                if self._entries.get(key) is entry:
+                    self._remove(key)
+                self.invalidations += 1
+                self.misses += 1
+                return default
+            if key in self._entries:
+                # Mark it as the most recently used one.
+                self._entries[key] = self._entries.pop(key)
+            self.hits += 1
+            return entry.data
+
+    def ZCache_set(self, ob, data, view_name='', keywords=None,
+                   mtime_func=None):
+        size = _approximateSize(data)
+        if size is None:
+            LOG.debug('Not caching unpicklable data for %r', ob)
+            return
+        if self.max_bytes and size > self.max_bytes:
+            return
+        path = tuple(ob.getPhysicalPath())
+        key = self._getKey(path, view_name, keywords)
+        mtime = ob.ZCacheable_getModTime(mtime_func)
+        with self._lock:
+            expires = None
+            if self.max_age:
+                expires = time.time() + self.max_age
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(data, size, mtime, expires, path)
+            self._paths.setdefault(path, set()).add(key)
+            self._size += size
+            self._evict()
+
+    def ZCache_invalidate(self, ob):
+        path = tuple(ob.getPhysicalPath())
+        with self._lock:
+            keys = list(self._paths.get(path, ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+        return 'Invalidated %d cache entries.' % len(keys)
+
+    def invalidateAll(self):
+        """Remove all entries."""
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._paths.clear()
+            self._size = 0
+
+
+# The caches of the RAMCacheManagers in this process, by cache id.
+caches = {}
+caches_lock = Lock()
+
+manage_addRAMCacheManagerForm = DTMLFile('dtml/addRAMCacheManager',
+                                         globals())
+
+
+def manage_addRAMCacheManager(self, id, title='', REQUEST=None):
+    """Add a new RAM Cache Manager object with id *id*.
+    """
+    ob = RAMCacheManager(id)
+    ob.title = title
+    self._setObject(id, ob)
+    if REQUEST is not None:
+        return self.manage_main(self, REQUEST)
+
+
+class RAMCacheManager(CacheManager, PropertyManager, SimpleItem):
+
+    """ Cache manager keeping the cached data in the memory of the
+    process, see RAMCache.
+    """
+    meta_type = 'RAM Cache Manager'
+
+    security = ClassSecurityInfo()
+
+    _cache_class = RAMCache
+
+    max_entries = 1000
+    max_bytes = 0
+    max_age = 3600
+
+    _properties = (
+        {'id': 'title', 'type': 'string', 'mode': 'w'},
+        {'id': 'max_entries', 'type': 'int', 'mode': 'w'},
+        {'id': 'max_bytes', 'type': 'int', 'mode': 'w'},
+        {'id': 'max_age', 'type': 'int', 'mode': 'w'},
+    )
+
+    manage_options = (
+        CacheManager.manage_options +
+        PropertyManager.manage_options +
+        SimpleItem.manage_options
+    )
+
+    def __init__(self, id):
+        self.id = id
+
+    def _getCacheId(self):
+        # Copies of the manager must not share its cache.
+        base = aq_base(self)
+        jar = base._p_jar
+        if jar is None or base._p_oid is None:
+            return id(base)
+        return (jar.db().database_name, base._p_oid)
+
+    def _settings(self):
+        return dict((name, getattr(self, name))
+                    for name in self._cache_class.settings)
+
+    security.declarePrivate('ZCacheManager_getCache')
+    def ZCacheManager_getCache(self):
+        cache_id = self._getCacheId()
+        settings = self._settings()
+        with caches_lock:
+            cache = caches.get(cache_id)
+            if cache is None:
+                cache = caches[cache_id] = self._cache_class(**settings)
+                return cache
+        if cache.getSettings() != settings:
+            # The settings were changed, maybe in another process.
+            cache.configure(**settings)
+        return cache
+
+    def _setPropValue(self, id, value):
+        super(RAMCacheManager, self)._setPropValue(id, value)
+        if id in self._cache_class.settings:
+            self.ZCacheManager_getCache()
+
+    def manage_beforeDelete(self, item, container):
+        super(RAMCacheManager, self).manage_beforeDelete(item, container)
+        if aq_base(self) is aq_base(item):
+            with caches_lock:
+                caches.pop(self._getCacheId(), None)
+
+    security.declareProtected(ViewManagementScreensPermission,
+                              'getCacheStatistics')
+    def getCacheStatistics(self):
+        """Return the hit, miss and eviction counts and the number and
+        approximate size in bytes of the entries of the cache.
+        """
+        cache = self.ZCacheManager_getCache()
+        if cache is None:
+            return {}
+        return cache.getStatistics()
+
+    security.declareProtected(ChangeCacheSettingsPermission,
+                              'manage_invalidateAll')
+    def manage_invalidateAll(self, REQUEST=None):
+        """Remove all entries from the cache."""
+        cache = self.ZCacheManager_getCache()
+        if cache is not None:
+            cache.invalidateAll()
+        if REQUEST is not None:
+            return self.manage_propertiesForm(
+                self, REQUEST, manage_tabs_message='Cache invalidated.')
+
+    security.declareProtected(ChangeCacheSettingsPermission,
+                              'manage_clearStatistics')
+    def manage_clearStatistics(self, REQUEST=None):
+        """Reset the statistics of the cache."""
+        cache = self.ZCacheManager_getCache()
+        if cache is not None:
+            cache.clearStatistics()
+        if REQUEST is not None:
+            return self.manage_propertiesForm(
+                self, REQUEST, manage_tabs_message='Statistics cleared.')
+
+InitializeClass(RAMCacheManager)
@@ -688,10 +688,18 @@ class IObjectManager(IZopeObject, ICopyContainer, INavigation, IManageable,
         """
         """
 
+    def _setObjects(items, set_owner=1, suppress_events=False):
+        """Set many (id, object) tuples into the container at once.
+        """
+
     def _delObject(id, dp=1):
         """
         """
 
+    def _delObjects(ids, suppress_events=False):
+        """Delete many objects from the container at once.
+        """
+
     def hasObject(id):
         """Indicate whether the folder has an item by ID.
         """
@@ -717,6 +725,24 @@ class IObjectManager(IZopeObject, ICopyContainer, INavigation, IManageable,
         'spec'.
         """
 
+    def lazyObjectIds(spec=None):
+        """Return a lazy sequence of the IDs of the subobjects.
+
+        See objectIds.
+        """
+
+    def lazyObjectValues(spec=None):
+        """Return a lazy sequence of the subobjects.
+
+        Subobjects are only loaded when they are accessed. See objectValues.
+        """
+
+    def lazyObjectItems(spec=None):
+        """Return a lazy sequence of (ID, subobject) tuples.
+
+        Subobjects are only loaded when they are accessed. See objectItems.
+        """
+
     def objectMap():
         """Return a tuple of mappings containing subobject meta-data.
         """
@@ -760,7 +786,8 @@ class IFindSupport(Interface):
                  obj_mtime=None, obj_mspec=None,
                  obj_permission=None, obj_roles=None,
                  search_sub=0,
-                 REQUEST=None, result=None, pre=''):
+                 REQUEST=None, result=None, pre='',
+                 limit=None, max_depth=None):
         """Zope Find interface"""
 
     def ZopeFindAndApply(obj, obj_ids=None, obj_metatypes=None,
@@ -769,9 +796,19 @@ class IFindSupport(Interface):
                          obj_permission=None, obj_roles=None,
                          search_sub=0,
                          REQUEST=None, result=None, pre='',
-                         apply_func=None, apply_path=''):
+                         apply_func=None, apply_path='',
+                         limit=None, max_depth=None):
         """Zope Find interface and apply"""
 
+    def ZopeFindIter(obj, obj_ids=None, obj_metatypes=None,
+                     obj_searchterm=None, obj_expr=None,
+                     obj_mtime=None, obj_mspec=None,
+                     obj_permission=None, obj_roles=None,
+                     search_sub=0,
+                     REQUEST=None, pre='',
+                     limit=None, max_depth=None):
+        """Iterate over the (path, object) tuples found by ZopeFind"""
+
 
 # XXX: might contain non-API methods and outdated comments;
 #      not synced with ZopeBook API Reference;
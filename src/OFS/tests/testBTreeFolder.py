@@ -0,0 +1,239 @@
+import unittest
+
+import transaction
+from zExceptions import BadRequest
+
+
+class TestBTreeFolder(unittest.TestCase):
+
+    def _makeOne(self, id='folder'):
+        from OFS.BTreeFolder import BTreeFolder
+        return BTreeFolder(id)
+
+    def _makeItem(self, id, meta_type='Dummy'):
+        from OFS.SimpleItem import SimpleItem
+        ob = SimpleItem()
+        ob.id = id
+        ob.meta_type = meta_type
+        return ob
+
+    def _fill(self, folder):
+        for id, meta_type in (('c', 'Dummy'), ('a', 'Other'), ('b', 'Dummy')):
+            folder._setObject(id, self._makeItem(id, meta_type), set_owner=0)
+
+    def test_interfaces(self):
+        from OFS.interfaces import IFolder
+        from OFS.BTreeFolder import BTreeFolder
+        from zope.interface.verify import verifyClass
+
+        verifyClass(IFolder, BTreeFolder)
+
+    def test_empty(self):
+        folder = self._makeOne()
+        self.assertEqual(folder.objectIds(), [])
+        self.assertEqual(folder.objectIds('Dummy'), [])
+        self.assertEqual(len(folder), 0)
+        self.assertFalse('a' in folder)
+        self.assertEqual(folder._objects, ())
+        self.assertEqual(folder.__dict__.get('_objects'), None)
+
+    def test_setObject(self):
+        folder = self._makeOne()
+        self._fill(folder)
+        self.assertEqual(folder.objectIds(), ['a', 'b', 'c'])
+        self.assertEqual(len(folder), 3)
+        self.assertTrue('b' in folder)
+        self.assertTrue(folder.hasObject('b'))
+        self.assertEqual(folder['b'].getId(), 'b')
+        self.assertEqual(folder.get('b').getId(), 'b')
+        self.assertEqual(folder.get('x'), None)
+        self.assertRaises(KeyError, folder.__getitem__, 'x')
+        self.assertEqual(list(folder), ['a', 'b', 'c'])
+        self.assertEqual(folder.objectMap(), (
+            {'id': 'a', 'meta_type': 'Other'},
+            {'id': 'b', 'meta_type': 'Dummy'},
+            {'id': 'c', 'meta_type': 'Dummy'},
+        ))
+        self.assertFalse('b' in folder.__dict__)
+
+    def test_objectIds_spec(self):
+        folder = self._makeOne()
+        self._fill(folder)
+        self.assertEqual(folder.objectIds('Dummy'), ['b', 'c'])
+        self.assertEqual(folder.objectIds(['Other']), ['a'])
+        self.assertEqual(folder.objectIds(['Other', 'Dummy']),
+                         ['a', 'b', 'c'])
+        self.assertEqual(folder.objectIds('Missing'), [])
+        self.assertEqual([ob.getId() for ob in folder.objectValues('Dummy')],
+                         ['b', 'c'])
+        self.assertEqual([id for id, ob in folder.objectItems('Other')],
+                         ['a'])
+
+    def test_lazyObjectValues(self):
+        folder = self._makeOne()
+        self._fill(folder)
+        self.assertEqual(list(folder.lazyObjectIds()), ['a', 'b', 'c'])
+        self.assertEqual(list(folder.lazyObjectIds(['Dummy', 'Other'])),
+                         ['a', 'b', 'c'])
+        values = folder.lazyObjectValues('Dummy')
+        self.assertEqual(len(values), 2)
+        self.assertEqual([ob.getId() for ob in values[1:]], ['c'])
+        self.assertEqual([id for id, ob in folder.lazyObjectItems('Other')],
+                         ['a'])
+        self.assertEqual(list(folder.lazyObjectValues('Missing')), [])
+
+    def test_lazyObjectValues_loads_slice_only(self):
+        from ZODB.DB import DB
+        from ZODB.MappingStorage import MappingStorage
+        db = DB(MappingStorage())
+        conn = db.open()
+        try:
+            conn.root()['folder'] = folder = self._makeOne()
+            for i in range(100):
+                id = 'item%03d' % i
+                folder._setObject(id, self._makeItem(id), set_owner=0)
+            transaction.commit()
+            conn.cacheMinimize()
+            page = folder.lazyObjectValues('Dummy')[20:25]
+            self.assertEqual([ob.getId() for ob in page],
+                             ['item%03d' % i for i in range(20, 25)])
+            loaded = [id for id, ob in folder._tree.items()
+                      if ob._p_changed is not None]
+            self.assertEqual(loaded, ['item%03d' % i for i in range(20, 25)])
+        finally:
+            transaction.abort()
+            conn.close()
+            db.close()
+
+    def test_getOb_wraps(self):
+        from Acquisition import aq_base
+        from Acquisition import aq_parent
+        from OFS.Folder import Folder
+        folder = self._makeOne()
+        self._fill(folder)
+        self.assertTrue(aq_parent(folder._getOb('a')) is folder)
+        wrapped = folder.__of__(Folder('root'))
+        self.assertTrue(aq_base(aq_parent(wrapped.a)) is folder)
+        self.assertEqual(folder._getOb('x', None), None)
+        self.assertRaises(AttributeError, folder._getOb, 'x')
+        self.assertRaises(AttributeError, getattr, folder, 'x')
+        self.assertRaises(AttributeError, getattr, folder, '_x')
+
+    def test_duplicate_id(self):
+        folder = self._makeOne()
+        self._fill(folder)
+        self.assertRaises(BadRequest, folder._setObject,
+                          'a', self._makeItem('a'), set_owner=0)
+
+    def test_delObject(self):
+        folder = self._makeOne()
+        self._fill(folder)
+        folder._delObject('b')
+        self.assertEqual(folder.objectIds(), ['a', 'c'])
+        self.assertEqual(folder.objectIds('Dummy'), ['c'])
+        self.assertEqual(len(folder), 2)
+        folder.manage_delObjects(['a', 'c'])
+        self.assertEqual(folder.objectIds(), [])
+        self.assertEqual(len(folder._mt_index), 0)
+
+    def test_delObject_changed_meta_type(self):
+        folder = self._makeOne()
+        self._fill(folder)
+        folder._getOb('a').meta_type = 'Changed'
+        folder._delObject('a')
+        self.assertEqual(folder.objectIds('Other'), [])
+
+    def test_replace_with_setOb(self):
+        folder = self._makeOne()
+        self._fill(folder)
+        folder._setOb('a', self._makeItem('a', 'Dummy'))
+        self.assertEqual(folder.objectIds('Dummy'), ['a', 'b', 'c'])
+        self.assertEqual(folder.objectIds('Other'), [])
+        self.assertEqual(len(folder), 3)
+
+    def test_setObjects_delObjects(self):
+        folder = self._makeOne()
+        self._fill(folder)
+        folder._setObjects([('e', self._makeItem('e')),
+                            ('d', self._makeItem('d', 'Other'))],
+                           set_owner=0)
+        self.assertEqual(folder.objectIds(), ['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual(folder.objectIds('Other'), ['a', 'd'])
+        self.assertEqual(len(folder), 5)
+        folder._delObjects(['a', 'e'])
+        self.assertEqual(folder.objectIds(), ['b', 'c', 'd'])
+        self.assertEqual(len(folder), 3)
+
+    def test_objects(self):
+        folder = self._makeOne()
+        self._fill(folder)
+        self.assertEqual(len(folder._objects), 3)
+        self.assertEqual([i['id'] for i in folder._objects], ['a', 'b', 'c'])
+        self.assertEqual(folder._objects[1],
+                         {'id': 'b', 'meta_type': 'Dummy'})
+        self.assertEqual(folder.objectMap(), tuple(folder._objects))
+
+    def test_assign_objects_then_delOb(self):
+        # The way _delObject overrides used to remove subobjects
+        import warnings
+        folder = self._makeOne()
+        self._fill(folder)
+        with warnings.catch_warnings(record=True) as log:
+            warnings.simplefilter('always')
+            folder._objects = tuple(
+                i for i in folder._objects if i['id'] != 'a')
+        self.assertEqual(log[0].category, DeprecationWarning)
+        self.assertEqual(folder.objectIds(), ['a', 'b', 'c'])
+        folder._delOb('a')
+        self.assertEqual(folder.objectIds(), ['b', 'c'])
+        self.assertEqual([i['id'] for i in folder._objects], ['b', 'c'])
+        self.assertEqual(len(folder), 2)
+
+    def test_add_does_not_write_folder(self):
+        from ZODB.DB import DB
+        from ZODB.MappingStorage import MappingStorage
+        db = DB(MappingStorage())
+        conn = db.open()
+        try:
+            conn.root()['folder'] = folder = self._makeOne()
+            self._fill(folder)
+            transaction.commit()
+            folder._setObject('d', self._makeItem('d'), set_owner=0)
+            self.assertFalse(folder._p_changed)
+            self.assertEqual(folder.objectIds(), ['a', 'b', 'c', 'd'])
+            transaction.commit()
+        finally:
+            transaction.abort()
+            conn.close()
+            db.close()
+
+
+class TestBTreeSupport(unittest.TestCase):
+
+    def test_mixin_without_folder(self):
+        from OFS.BTreeSupport import BTreeSupport
+        from OFS.ObjectManager import ObjectManager
+        from OFS.SimpleItem import SimpleItem
+
+        class Container(BTreeSupport, ObjectManager):
+            pass
+
+        container = Container()
+        self.assertEqual(len(container), 0)
+        container._setObject('item', SimpleItem(), set_owner=0)
+        self.assertEqual(container.objectIds(), ['item'])
+        self.assertEqual(len(container), 1)
+
+    def test_registered(self):
+        from Testing.ZopeTestCase import base
+        app = base.app()
+        try:
+            meta_types = [info['name'] for info in app.all_meta_types()]
+            self.assertTrue('Folder (BTree)' in meta_types)
+            factory = app.manage_addProduct['OFSP']
+            factory.manage_addBTreeFolder('btf', 'Title')
+            self.assertEqual(app.btf.meta_type, 'Folder (BTree)')
+            self.assertEqual(app.btf.title, 'Title')
+        finally:
+            transaction.abort()
+            base.close(app)
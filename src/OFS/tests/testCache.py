@@ -32,3 +32,180 @@ class CacheTests(unittest.TestCase):
 
         # The parent_cache should still trigger managersExist
         self.assertTrue(managersExist(root.child.child_content))
+
+    def test_ZCacheable_getModTime(self):
+        from OFS.DTMLMethod import DTMLMethod
+        method = DTMLMethod('method')
+        self.assertEqual(method.ZCacheable_getModTime(), 0)
+        self.assertEqual(method.ZCacheable_getModTime(lambda: 10), 10)
+        method._p_jar = None
+        method._p_serial = b'\x03\xc6\x7f\x1a\x00\x00\x00\x00'
+        self.assertEqual(method.ZCacheable_getModTime(), method._p_mtime)
+
+
+class DummyCache(object):
+
+    def ZCache_invalidate(self, ob):
+        pass
+
+
+class CountingCacheManager(DummyCacheManager):
+
+    lookups = 0
+
+    def ZCacheManager_getCache(self):
+        self.lookups += 1
+        cache = self.__dict__.get('_v_cache')
+        if cache is None:
+            cache = self._v_cache = DummyCache()
+        return cache
+
+setDeprecatedManageAddDelete(CountingCacheManager)
+
+
+class CacheLookupTests(unittest.TestCase):
+
+    def setUp(self):
+        from AccessControl.SecurityManagement import newSecurityManager
+        from AccessControl.User import system
+        from zope.configuration import xmlconfig
+        import OFS
+        xmlconfig.file('event.zcml', OFS)
+        newSecurityManager(None, system)
+
+    def tearDown(self):
+        from AccessControl.SecurityManagement import noSecurityManager
+        from zope.testing.cleanup import cleanUp
+        noSecurityManager()
+        cleanUp()
+
+    def _makeRoot(self):
+        from OFS.DTMLMethod import DTMLMethod
+        root = Folder('root')
+        root._setObject('cache', CountingCacheManager('cache'))
+        root._setObject('folder', Folder('folder'))
+        for name in ('one', 'two'):
+            root.folder._setObject(name, DTMLMethod('', __name__=name))
+        root._setObject('three', DTMLMethod('', __name__='three'))
+        return root
+
+    def test_getCache_other_manager_added(self):
+        root = self._makeRoot()
+        one = root.folder.one
+        one.ZCacheable_setManagerId('cache')
+        cache = one.ZCacheable_getCache()
+        lookups = root.cache.lookups
+        # Adding a manager with another id keeps the cached lookup
+        root._setObject('other', CountingCacheManager('other'))
+        self.assertTrue(one.ZCacheable_getCache() is cache)
+        self.assertEqual(root.cache.lookups, lookups)
+        # Adding one with the same id doesn't
+        root.folder._setObject('cache', CountingCacheManager('cache'))
+        self.assertTrue(one.ZCacheable_getCache() is
+                        root.folder.cache.ZCacheManager_getCache())
+
+    def test_getCache_registry(self):
+        import transaction
+        from ZODB.DB import DB
+        from ZODB.MappingStorage import MappingStorage
+        from OFS.Cache import cache_registry
+        db = DB(MappingStorage())
+        conn = db.open()
+        try:
+            conn.root()['root'] = root = self._makeRoot()
+            root.folder.one.ZCacheable_setManagerId('cache')
+            root.folder.two.ZCacheable_setManagerId('cache')
+            transaction.commit()
+            cache_registry.clear()
+            lookups = root.cache.lookups
+            cache = root.folder.one.ZCacheable_getCache()
+            # The other object in the folder finds the cache in the
+            # registry.
+            self.assertTrue(root.folder.two.ZCacheable_getCache() is cache)
+            self.assertEqual(root.cache.lookups, lookups + 1)
+        finally:
+            cache_registry.clear()
+            transaction.abort()
+            conn.close()
+            db.close()
+
+    def test_getCache_registry_other_process(self):
+        import transaction
+        from ZODB.DB import DB
+        from ZODB.MappingStorage import MappingStorage
+        from OFS.Cache import cache_registry
+        from OFS.Cache import manager_timestamps
+        db = DB(MappingStorage())
+        conn = db.open()
+        tm = transaction.TransactionManager()
+        other = None
+        try:
+            conn.root()['root'] = root = self._makeRoot()
+            root.folder.one.ZCacheable_setManagerId('cache')
+            root.folder.two.ZCacheable_setManagerId('cache')
+            transaction.commit()
+            other = db.open(transaction_manager=tm)
+            cache_registry.clear()
+            cache = root.folder.one.ZCacheable_getCache()
+            # Another process replaces the manager, which doesn't change
+            # the manager timestamps of this one.
+            timestamps = dict(manager_timestamps)
+            other_root = other.root()['root']
+            other_root.manage_delObjects(['cache'])
+            other_root._setObject('cache', CountingCacheManager('cache'))
+            tm.commit()
+            manager_timestamps.clear()
+            manager_timestamps.update(timestamps)
+            transaction.begin()
+            new_cache = root.folder.two.ZCacheable_getCache()
+            self.assertFalse(new_cache is cache)
+            self.assertTrue(new_cache is root.cache.ZCacheManager_getCache())
+        finally:
+            cache_registry.clear()
+            transaction.abort()
+            if other is not None:
+                tm.abort()
+                other.close()
+            conn.close()
+            db.close()
+
+    def test_locate_associated(self):
+        root = self._makeRoot()
+        root.folder.one.ZCacheable_setManagerId('cache')
+        root.three.ZCacheable_setManagerId('cache')
+        # Associations made before the index existed are found
+        self.assertEqual(root.cache._cacheables, None)
+        result = root.cache.ZCacheManager_locate(1, 1)
+        self.assertEqual([info['path'] for info in result],
+                         ['folder/one', 'three'])
+        self.assertEqual(list(root.cache._cacheables),
+                         ['folder/one', 'three'])
+        # and the index is updated
+        root.folder.two.ZCacheable_setManagerId('cache')
+        root.three.ZCacheable_setManagerId(None)
+        result = root.cache.ZCacheManager_locate(1, 1)
+        self.assertEqual([info['path'] for info in result],
+                         ['folder/one', 'folder/two'])
+        self.assertEqual(root.cache.ZCacheManager_locate(1, 0), [])
+        self.assertEqual(
+            root.cache.ZCacheManager_locate(1, 1, ['Folder']), [])
+
+    def test_locate_moved(self):
+        import transaction
+        from ZODB.DB import DB
+        from ZODB.MappingStorage import MappingStorage
+        db = DB(MappingStorage())
+        conn = db.open()
+        try:
+            conn.root()['root'] = root = self._makeRoot()
+            transaction.savepoint(optimistic=True)
+            root.folder.one.ZCacheable_setManagerId('cache')
+            root.cache.ZCacheManager_reindex()
+            root.folder.manage_renameObject('one', 'renamed')
+            self.assertEqual(list(root.cache._cacheables), ['folder/renamed'])
+            root.folder._delObject('renamed')
+            self.assertEqual(list(root.cache._cacheables), [])
+        finally:
+            transaction.abort()
+            conn.close()
+            db.close()
@@ -15,6 +15,7 @@ from OFS.Cache import ZCM_MANAGERS
 from OFS.Image import Pdata
 from ZPublisher.HTTPRequest import HTTPRequest
 from ZPublisher.HTTPResponse import HTTPResponse
+from ZPublisher.Iterators import IStreamIterator
 from App.Common import rfc1123_date
 from Testing.makerequest import makerequest
 from zExceptions import Redirect
@@ -202,6 +203,22 @@ class FileTests(unittest.TestCase):
         data, size = self.file._read_data(s)
         self.assertNotEqual(data.next, None)
 
+    def testPdataIndex(self):
+        s = "a" * (1 << 16) * 3 + "b" * 100
+        self.file.manage_upload(BytesIO(s))
+        index = self.file._pdata_index
+        self.assertTrue(index[0] is aq_base(self.file.data))
+        pos, data = self.file._seek_pdata(len(s) - 1)
+        self.assertEqual(pos, len(s) - (1 << 16))
+        self.assertEqual(data.data[-1:], "b")
+        self.assertEqual(len(self.file.data), len(s))
+
+    def testPdataIndexDroppedOnNewData(self):
+        self.file.manage_upload(BytesIO("a" * (1 << 16) * 3))
+        self.assertFalse(self.file._pdata_index is None)
+        self.file.manage_edit('foobar', 'text/plain', filedata='ASD')
+        self.assertTrue(self.file._pdata_index is None)
+
     def testManageEditWithFileData(self):
         self.file.manage_edit('foobar', 'text/plain', filedata='ASD')
         self.assertEqual(self.file.title, 'foobar')
@@ -253,9 +270,117 @@ class FileTests(unittest.TestCase):
         self.assertEqual(resp.getStatus(), 200)
         self.assertEqual(data, str(self.file.data))
 
+    def testContentEtag(self):
+        etag = self.file.http__etag()
+        self.assertTrue(etag.startswith('md5-'))
+        self.file.update_data('foo')
+        self.assertNotEqual(self.file.http__etag(), etag)
+        etag = self.file.http__etag()
+        self.file.update_data('bar')
+        self.file.update_data('foo')
+        self.assertEqual(self.file.http__etag(), etag)
+        # Pdata chains get the same tag as strings
+        s = 'a' * (1 << 16) * 3
+        self.file.manage_upload(BytesIO(s))
+        etag = self.file.http__etag()
+        self.file.update_data(s)
+        self.assertEqual(self.file.http__etag(), etag)
+
+    def testContentEtagDoesNotLoadChain(self):
+        from ZPublisher.conditional import contentETag
+        s = 'a' * (1 << 16) * 3 + 'b' * 100
+        self.file.manage_upload(BytesIO(s))
+        # The tag was computed while reading, the chunks but the first
+        # one, which is used to guess the content type, are still ghosts.
+        chunks = list(self.file._pdata_index.values())
+        self.assertEqual(len(chunks), 3)
+        for chunk in chunks[1:]:
+            self.assertEqual(chunk._p_state, -1)
+        self.assertEqual(self.file.http__etag(), contentETag((s,)))
+
+    def testIfNoneMatch(self):
+        e = {'SERVER_NAME': 'foo',
+             'SERVER_PORT': '80',
+             'REQUEST_METHOD': 'GET'}
+        resp = HTTPResponse(stdout=BytesIO())
+        req = HTTPRequest(sys.stdin, e, resp)
+        data = self.file.index_html(req, resp)
+        self.assertEqual(resp.getStatus(), 200)
+        etag = resp.getHeader('ETag')
+        self.assertEqual(etag, '"%s"' % self.file.http__etag())
+
+        e['HTTP_IF_NONE_MATCH'] = etag
+        resp = HTTPResponse(stdout=BytesIO())
+        req = HTTPRequest(sys.stdin, e, resp)
+        data = self.file.index_html(req, resp)
+        self.assertEqual(resp.getStatus(), 304)
+        self.assertEqual(resp.getHeader('ETag'), etag)
+        self.assertEqual(data, '')
+
+        # If-None-Match takes precedence over If-Modified-Since
+        e['HTTP_IF_NONE_MATCH'] = '"other"'
+        e['HTTP_IF_MODIFIED_SINCE'] = rfc1123_date(time.time())
+        resp = HTTPResponse(stdout=BytesIO())
+        req = HTTPRequest(sys.stdin, e, resp)
+        data = self.file.index_html(req, resp)
+        self.assertEqual(resp.getStatus(), 200)
+
+    def testNotModifiedWithoutLoadingData(self):
+        s = 'a' * (1 << 16) * 3
+        self.file.manage_upload(BytesIO(s))
+        transaction.commit()
+        etag = self.file.http__etag()
+        self.file.data._p_deactivate()
+        e = {'SERVER_NAME': 'foo',
+             'SERVER_PORT': '80',
+             'REQUEST_METHOD': 'GET',
+             'HTTP_IF_NONE_MATCH': '"%s"' % etag}
+        resp = HTTPResponse(stdout=BytesIO())
+        req = HTTPRequest(sys.stdin, e, resp)
+        self.file.index_html(req, resp)
+        self.assertEqual(resp.getStatus(), 304)
+        self.assertEqual(self.file.__dict__['data']._p_changed, None)
+
+    def testIfRangeContentEtag(self):
+        e = {'SERVER_NAME': 'foo',
+             'SERVER_PORT': '80',
+             'REQUEST_METHOD': 'GET',
+             'HTTP_RANGE': 'bytes=0-1',
+             'HTTP_IF_RANGE': '"%s"' % self.file.http__etag()}
+        resp = HTTPResponse(stdout=BytesIO())
+        req = HTTPRequest(sys.stdin, e, resp)
+        self.file.index_html(req, resp)
+        self.assertEqual(resp.getStatus(), 206)
+        e['HTTP_IF_RANGE'] = 'W/"%s"' % self.file.http__etag()
+        resp = HTTPResponse(stdout=BytesIO())
+        req = HTTPRequest(sys.stdin, e, resp)
+        self.file.index_html(req, resp)
+        self.assertEqual(resp.getStatus(), 200)
+
     def testIndexHtmlWithPdata(self):
         self.file.manage_upload('a' * (2 << 16))  # 128K
-        self.file.index_html(self.app.REQUEST, self.app.REQUEST.RESPONSE)
+        result = self.file.index_html(
+            self.app.REQUEST, self.app.REQUEST.RESPONSE)
+        self.assertTrue(IStreamIterator.providedBy(result))
+        self.assertEqual(len(result), 2 << 16)
+        self.assertEqual(''.join(result), 'a' * (2 << 16))
+
+    def testIndexHtmlWithPdataChain(self):
+        s = ''.join([chr(ord('a') + i) * (1 << 16) for i in range(5)])
+        self.file.manage_upload(BytesIO(s))
+        transaction.commit()
+        result = self.file.index_html(
+            self.app.REQUEST, self.app.REQUEST.RESPONSE)
+        self.assertTrue(IStreamIterator.providedBy(result))
+        chunks = list(result)
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(''.join(chunks), s)
+
+    def testIndexHtmlWithPdataChainWithoutConnection(self):
+        s = ''.join([chr(ord('a') + i) * (1 << 16) for i in range(5)])
+        file = OFS.Image.File('bigfile', '', BytesIO(s)).__of__(self.app)
+        result = file.index_html(self.app.REQUEST, self.app.REQUEST.RESPONSE)
+        self.assertEqual(result, '')
         self.assertTrue(self.app.REQUEST.RESPONSE._wrote)
 
     def testIndexHtmlWithString(self):
@@ -313,6 +438,13 @@ class ImageTests(FileTests):
             ('<img src="http://nohost/file" '
              'alt="" title="" height="16" width="16" />'))
 
+    def testContentEtagDoesNotLoadChain(self):
+        # getImageInfo reads all the data of images.
+        from ZPublisher.conditional import contentETag
+        s = 'a' * (1 << 16) * 3 + 'b' * 100
+        self.file.manage_upload(BytesIO(s))
+        self.assertEqual(self.file.http__etag(), contentETag((s,)))
+
     def testTag(self):
         tag_fmt = ('<img src="http://nohost/file" '
                    'alt="%s" title="%s" height="16" width="16" />')
@@ -0,0 +1,302 @@
+import binascii
+import os
+import shutil
+import tempfile
+import unittest
+
+from OFS.FileCache import FileCacheManager
+from OFS.metaconfigure import setDeprecatedManageAddDelete
+from OFS.tests.testRAMCache import DummyCacheable
+
+setDeprecatedManageAddDelete(FileCacheManager)
+
+
+class FileCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _makeOne(self, **kw):
+        from OFS.FileCache import FileCache
+        kw.setdefault('check_interval', 0)
+        return FileCache(self.directory, **kw)
+
+    def _entries(self, cache):
+        return [name for name in os.listdir(cache._path)
+                if not name.startswith('.')]
+
+    def test_get_set(self):
+        cache = self._makeOne()
+        ob = DummyCacheable(('', 'ob'))
+        self.assertEqual(cache.ZCache_get(ob, default='default'), 'default')
+        cache.ZCache_set(ob, {'data': 1})
+        self.assertEqual(cache.ZCache_get(ob), {'data': 1})
+        stats = cache.getStatistics()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['entries'], 1)
+        self.assertTrue(stats['size'] > 0)
+
+    def test_shared(self):
+        # Caches using the same directory, e.g. in other processes,
+        # share the entries and invalidations.
+        cache = self._makeOne()
+        other = self._makeOne()
+        ob = DummyCacheable(('', 'ob'))
+        cache.ZCache_set(ob, 'data')
+        self.assertEqual(other.ZCache_get(ob), 'data')
+        other.ZCache_invalidate(ob)
+        self.assertEqual(cache.ZCache_get(ob), None)
+
+    def test_keys(self):
+        cache = self._makeOne()
+        ob = DummyCacheable(('', 'ob'))
+        cache.ZCache_set(ob, 'a', keywords={'x': 1})
+        cache.ZCache_set(ob, 'b', keywords={'x': 2})
+        cache.ZCache_set(ob, 'view', view_name='view')
+        self.assertEqual(cache.ZCache_get(ob, keywords={'x': 1}), 'a')
+        self.assertEqual(cache.ZCache_get(ob, keywords={'x': 2}), 'b')
+        self.assertEqual(cache.ZCache_get(ob, view_name='view'), 'view')
+        self.assertEqual(cache.ZCache_get(ob), None)
+
+    def test_max_entries(self):
+        cache = self._makeOne(max_entries=2, check_interval=3600)
+        obs = [DummyCacheable(('', str(i))) for i in range(3)]
+        for i, ob in enumerate(obs):
+            cache.ZCache_set(ob, i)
+        # Make the first one the most recently used one
+        for i, ob in enumerate(obs):
+            path = cache._getPath(ob)
+            for name in os.listdir(path):
+                os.utime(os.path.join(path, name), (i, i))
+        self.assertEqual(cache.ZCache_get(obs[0]), 0)
+        cache.checkLimits()
+        self.assertEqual(cache.ZCache_get(obs[0]), 0)
+        self.assertEqual(cache.ZCache_get(obs[1]), None)
+        self.assertEqual(cache.ZCache_get(obs[2]), 2)
+        self.assertEqual(cache.getStatistics()['evictions'], 1)
+
+    def test_max_bytes(self):
+        cache = self._makeOne(max_bytes=100)
+        ob = DummyCacheable(('', 'ob'))
+        cache.ZCache_set(ob, b'x' * 1000)
+        self.assertEqual(cache.ZCache_get(ob), None)
+        self.assertEqual(cache.getStatistics()['entries'], 0)
+        self.assertEqual(self._entries(cache), [])
+
+    def test_max_age(self):
+        cache = self._makeOne(max_age=-1)
+        ob = DummyCacheable(('', 'ob'))
+        cache.ZCache_set(ob, 'data')
+        self.assertEqual(cache.ZCache_get(ob), None)
+        stats = cache.getStatistics()
+        self.assertEqual(stats['expirations'], 1)
+        self.assertEqual(stats['entries'], 0)
+
+    def test_modified(self):
+        cache = self._makeOne()
+        ob = DummyCacheable(('', 'ob'), mtime=10)
+        cache.ZCache_set(ob, 'data')
+        self.assertEqual(cache.ZCache_get(ob), 'data')
+        self.assertEqual(cache.ZCache_get(ob, mtime_func=lambda: 5), 'data')
+        ob.mtime = 20
+        self.assertEqual(cache.ZCache_get(ob), None)
+        self.assertEqual(cache.getStatistics()['invalidations'], 1)
+
+    def test_unpicklable(self):
+        cache = self._makeOne()
+        ob = DummyCacheable(('', 'ob'))
+        cache.ZCache_set(ob, lambda: None)
+        self.assertEqual(cache.getStatistics()['entries'], 0)
+        self.assertEqual(self._entries(cache), [])
+
+    def test_corrupt_entry(self):
+        cache = self._makeOne()
+        ob = DummyCacheable(('', 'ob'))
+        cache.ZCache_set(ob, 'data')
+        path = cache._getPath(ob)
+        filename = os.path.join(path, os.listdir(path)[0])
+        with open(filename, 'wb') as f:
+            f.write(b'garbage')
+        self.assertEqual(cache.ZCache_get(ob), None)
+        self.assertFalse(os.path.exists(filename))
+
+    def test_invalidate(self):
+        cache = self._makeOne()
+        ob = DummyCacheable(('', 'ob'))
+        other = DummyCacheable(('', 'other'))
+        cache.ZCache_set(ob, 'a', keywords={'x': 1})
+        cache.ZCache_set(ob, 'b', view_name='view')
+        cache.ZCache_set(other, 'c')
+        self.assertEqual(
+            cache.ZCache_invalidate(ob), 'Invalidated 2 cache entries.')
+        self.assertEqual(cache.ZCache_get(ob, keywords={'x': 1}), None)
+        self.assertEqual(cache.ZCache_get(ob, view_name='view'), None)
+        self.assertEqual(cache.ZCache_get(other), 'c')
+        cache.invalidateAll()
+        self.assertEqual(cache.ZCache_get(other), None)
+        self.assertEqual(cache.getStatistics()['invalidations'], 3)
+        self.assertEqual(self._entries(cache), [])
+
+
+    def test_entries_directory(self):
+        from OFS.FileCache import MARKER
+        cache = self._makeOne()
+        self.assertEqual(cache._path,
+                         os.path.join(self.directory, 'zope-file-cache'))
+        self.assertTrue(os.path.exists(os.path.join(cache._path, MARKER)))
+        # Another cache using the same directory
+        self.assertEqual(self._makeOne()._path, cache._path)
+
+    def test_foreign_entries_directory(self):
+        from OFS.FileCache import FileCache
+        os.mkdir(os.path.join(self.directory, 'zope-file-cache'))
+        with self.assertRaises(ValueError):
+            FileCache(self.directory)
+
+    def test_other_files_kept(self):
+        # Files the cache didn't make are neither evicted nor removed.
+        cache = self._makeOne(max_entries=1)
+        project = os.path.join(self.directory, 'myproject', 'src')
+        os.makedirs(project)
+        others = [os.path.join(project, name) for name in ('a.py', 'b.py')]
+        others.append(os.path.join(cache._path, 'notes.txt'))
+        os.mkdir(os.path.join(cache._path, 'subdir'))
+        others.append(os.path.join(cache._path, 'subdir', 'c.py'))
+        for name in others:
+            with open(name, 'w') as f:
+                f.write('data')
+        obs = [DummyCacheable(('', str(i))) for i in range(3)]
+        for ob in obs:
+            cache.ZCache_set(ob, 'data')
+        cache.checkLimits()
+        self.assertEqual(cache.getStatistics()['entries'], 1)
+        cache.invalidateAll()
+        self.assertEqual(cache.getStatistics()['entries'], 0)
+        for name in others:
+            self.assertTrue(os.path.exists(name))
+
+    def test_unsafe_directory(self):
+        from OFS.FileCache import FileCache
+        import stat
+        directory = os.path.join(self.directory, 'sub', 'cache')
+        FileCache(directory)
+        mode = stat.S_IMODE(os.stat(directory).st_mode)
+        self.assertEqual(mode & 0o077, 0)
+        os.chmod(self.directory, 0o777)
+        with self.assertRaises(ValueError):
+            FileCache(self.directory)
+        os.chmod(self.directory, 0o700)
+        FileCache(self.directory)
+        if hasattr(os, 'getuid'):
+            # Owned by another user
+            getuid = os.getuid
+            os.getuid = lambda: getuid() + 1
+            try:
+                with self.assertRaises(ValueError):
+                    FileCache(self.directory)
+            finally:
+                os.getuid = getuid
+
+
+class FileCacheManagerTests(unittest.TestCase):
+
+    def setUp(self):
+        from OFS.FileCache import configure
+        self.directory = tempfile.mkdtemp()
+        configure(self.directory)
+
+    def tearDown(self):
+        from OFS.FileCache import configure
+        from OFS.RAMCache import caches
+        configure(None)
+        caches.clear()
+        shutil.rmtree(self.directory)
+
+    def _makeRoot(self):
+        from OFS.DTMLMethod import DTMLMethod
+        from OFS.FileCache import manage_addFileCacheManager
+        from OFS.Folder import Folder
+        root = Folder('root')
+        manage_addFileCacheManager(root, 'cache')
+        root._setObject('method', DTMLMethod('method'))
+        root.method.ZCacheable_setManagerId('cache')
+        return root
+
+    def test_cacheable(self):
+        root = self._makeRoot()
+        method = root.method
+        self.assertEqual(method.ZCacheable_get(default='default'), 'default')
+        method.ZCacheable_set('data')
+        self.assertEqual(method.ZCacheable_get(), 'data')
+        self.assertEqual(root.cache.getCacheStatistics()['hits'], 1)
+        method.ZCacheable_invalidate()
+        self.assertEqual(method.ZCacheable_get(), None)
+
+    def test_change_settings(self):
+        root = self._makeRoot()
+        cache = root.cache.ZCacheManager_getCache()
+        self.assertEqual(os.path.dirname(cache.directory), self.directory)
+        root.cache.manage_changeProperties(max_entries=5)
+        self.assertEqual(cache.max_entries, 5)
+
+    def test_directory_not_a_property(self):
+        root = self._makeRoot()
+        self.assertFalse(root.cache.hasProperty('directory'))
+
+    def test_directory(self):
+        import transaction
+        from ZODB.DB import DB
+        from ZODB.MappingStorage import MappingStorage
+        db = DB(MappingStorage())
+        conn = db.open()
+        try:
+            conn.root()['root'] = root = self._makeRoot()
+            transaction.commit()
+            cache = root.cache.ZCacheManager_getCache()
+            # The same in every process using the database
+            self.assertEqual(
+                os.path.basename(cache.directory),
+                'unnamed-%s' % binascii.hexlify(root.cache._p_oid))
+            root.method.ZCacheable_set('data')
+            root.manage_delObjects(['cache'])
+            self.assertEqual(cache.getStatistics()['entries'], 0)
+        finally:
+            transaction.abort()
+            conn.close()
+            db.close()
+
+    def test_no_directory(self):
+        from OFS.FileCache import configure
+        configure(None)
+        # Nothing is cached without a directory.
+        root = self._makeRoot()
+        self.assertEqual(root.cache.ZCacheManager_getCache(), None)
+        root.method.ZCacheable_set('data')
+        self.assertEqual(root.method.ZCacheable_get(), None)
+        self.assertEqual(root.cache.getCacheStatistics(), {})
+        root.manage_delObjects(['cache'])
+
+    def test_configure_unsafe_directory(self):
+        from OFS.FileCache import configure
+        os.chmod(self.directory, 0o777)
+        with self.assertRaises(ValueError):
+            configure(self.directory)
+
+    def test_registered(self):
+        import transaction
+        from Testing.ZopeTestCase import base
+        app = base.app()
+        try:
+            meta_types = [info['name'] for info in app.all_meta_types()]
+            self.assertTrue('File Cache Manager' in meta_types)
+            factory = app.manage_addProduct['OFSP']
+            factory.manage_addFileCacheManager('files', 'Title')
+            self.assertEqual(app.files.meta_type, 'File Cache Manager')
+            self.assertEqual(app.files.title, 'Title')
+        finally:
+            transaction.abort()
+            base.close(app)
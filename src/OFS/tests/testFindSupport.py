@@ -47,3 +47,66 @@ class TestFindSupport(unittest.TestCase):
         self.assertEqual(self.base['1'].id, '1')
         self.assertEqual(self.base['2'].id, 'foo2')
         self.assertEqual(self.base['3'].id, '3')
+
+    def test_find_limit(self):
+        self.base['4'] = sub = DummyFolder('4')
+        sub['5'] = DummyItem('5')
+        found = self.base.ZopeFind(self.base, search_sub=1)
+        self.assertEqual(len(found), 5)
+        found = self.base.ZopeFind(self.base, search_sub=1, limit=2)
+        self.assertEqual(len(found), 2)
+
+    def test_find_max_depth(self):
+        self.base['4'] = sub = DummyFolder('4')
+        sub['5'] = DummyItem('5')
+        found = self.base.ZopeFind(self.base, search_sub=1, max_depth=1)
+        self.assertEqual(sorted(p for p, ob in found), ['1', '2', '3', '4'])
+        found = self.base.ZopeFind(self.base, search_sub=1, max_depth=2)
+        self.assertTrue('4/5' in [p for p, ob in found])
+
+    def test_find_iter(self):
+        found = self.base.ZopeFindIter(self.base, obj_ids=['1', '3'])
+        self.assertEqual(sorted(p for p, ob in found), ['1', '3'])
+
+
+class TestFindSupportZODB(unittest.TestCase):
+
+    def setUp(self):
+        import transaction
+        from OFS.Folder import Folder
+        from OFS.Image import File
+        from ZODB.DB import DB
+        from ZODB.MappingStorage import MappingStorage
+        self.db = DB(MappingStorage())
+        self.conn = self.db.open()
+        self.conn.root()['base'] = base = Folder('base')
+        for i in range(3):
+            id = 'sub%d' % i
+            base._setObject(id, Folder(id), set_owner=0)
+            base[id]._setObject('file', File('file', '', b''), set_owner=0)
+        transaction.commit()
+        self.conn.cacheMinimize()
+        self.base = base
+
+    def tearDown(self):
+        import transaction
+        transaction.abort()
+        self.conn.close()
+        self.db.close()
+
+    def test_meta_type_does_not_load_others(self):
+        base = self.base
+        found = base.ZopeFind(base, obj_metatypes=['Folder'])
+        self.assertEqual([p for p, ob in found], ['sub0', 'sub1', 'sub2'])
+        found = base.ZopeFind(base, obj_metatypes=['File'], search_sub=1)
+        self.assertEqual([p for p, ob in found],
+                         ['sub0/file', 'sub1/file', 'sub2/file'])
+        # the folders were searched and deactivated again
+        self.assertEqual(base.__dict__['sub0']._p_changed, None)
+
+    def test_find_leaves_unmatched_ghosts(self):
+        base = self.base
+        found = base.ZopeFind(base, obj_ids=['sub1'])
+        self.assertEqual([p for p, ob in found], ['sub1'])
+        self.assertEqual(base.__dict__['sub0']._p_changed, None)
+        self.assertEqual(base.__dict__['sub2']._p_changed, None)
@@ -6,12 +6,13 @@ from AccessControl.SecurityManagement import noSecurityManager
 from AccessControl.SecurityManager import setSecurityPolicy
 from AccessControl.SpecialUsers import emergency_user, nobody, system
 from AccessControl.User import User  # before SpecialUsers
-from Acquisition import aq_self, Implicit
+from Acquisition import aq_base, aq_self, Implicit
 from App.config import getConfiguration
 from logging import getLogger
 from zExceptions import BadRequest
 from zope.component.testing import PlacelessSetup
 from zope.interface import implementer
+import zope.component
 from Zope2.App import zcml
 
 from OFS.interfaces import IItem
@@ -322,6 +323,112 @@ class ObjectManagerTests(PlacelessSetup, unittest.TestCase):
         om.manage_delObjects(u'stuff')
         self.assertFalse('stuff' in om)
 
+    def test_manage_delObjects_missing(self):
+        om = self._makeFilled()
+        self.assertRaises(BadRequest, om.manage_delObjects, ['a', 'x'])
+        self.assertRaises(BadRequest, om.manage_delObjects, ['a', 'a'])
+        self.assertEqual(om.objectIds(), ['c', 'a', 'b'])
+
+    def _recordEvents(self):
+        from zope.component import provideHandler
+        from zope.component.interfaces import IObjectEvent
+        events = []
+
+        @provideHandler
+        @zope.component.adapter(IObjectEvent)
+        def record(event):
+            events.append((event.__class__.__name__,
+                           getattr(aq_base(event.object), 'id', None)))
+
+        return events
+
+    def test_setObjects(self):
+        om = self._makeFilled()
+        events = self._recordEvents()
+        items = []
+        for id in ('e', 'd'):
+            ob = SimpleItem()
+            ob.id = id
+            items.append((id, ob))
+        self.assertEqual(om._setObjects(items, set_owner=0), ['e', 'd'])
+        self.assertEqual(om.objectIds(), ['c', 'a', 'b', 'e', 'd'])
+        self.assertEqual(om.objectIds(SimpleItem.meta_type), ['e', 'd'])
+        self.assertEqual(om.d.__parent__, om)
+        self.assertEqual(events, [
+            ('ObjectWillBeAddedEvent', 'e'),
+            ('ObjectWillBeAddedEvent', 'd'),
+            ('ObjectAddedEvent', 'e'),
+            ('ObjectAddedEvent', 'd'),
+            ('ContainerModifiedEvent', None),
+        ])
+
+    def test_contains(self):
+        om = self._makeFilled()
+        self.assertTrue('a' in om)
+        self.assertFalse('x' in om)
+        self.assertFalse([] in om)
+        om._setObjects([('x', SimpleItem())], set_owner=0)
+        self.assertTrue('x' in om)
+        om._delObject('a')
+        self.assertFalse('a' in om)
+
+    def test_setObjects_checkId(self):
+        om = self._makeFilled()
+        self.assertRaises(BadRequest, om._setObjects,
+                          [('x', SimpleItem()), ('x', SimpleItem())])
+        self.assertRaises(BadRequest, om._setObjects,
+                          [('x', SimpleItem()), ('a', SimpleItem())])
+        self.assertEqual(om.objectIds(), ['c', 'a', 'b'])
+
+    def test_setObjects_suppress_events(self):
+        om = self._makeFilled()
+        events = self._recordEvents()
+        om._setObjects([('x', SimpleItem())], set_owner=0,
+                       suppress_events=True)
+        self.assertEqual(om.objectIds(), ['c', 'a', 'b', 'x'])
+        self.assertEqual(events, [])
+
+    def test_delObjects(self):
+        om = self._makeFilled()
+        events = self._recordEvents()
+        om._delObjects(['c', 'b'])
+        self.assertEqual(om.objectIds(), ['a'])
+        self.assertFalse(om.hasObject('c'))
+        self.assertEqual(events, [
+            ('ObjectWillBeRemovedEvent', 'c'),
+            ('ObjectWillBeRemovedEvent', 'b'),
+            ('ObjectRemovedEvent', 'c'),
+            ('ObjectRemovedEvent', 'b'),
+            ('ContainerModifiedEvent', None),
+        ])
+
+    def test_manage_delObjects_one_event(self):
+        om = self._makeFilled()
+        events = self._recordEvents()
+        om.manage_delObjects(['c', 'a', 'b'])
+        self.assertEqual(om.objectIds(), [])
+        self.assertEqual(events[-1], ('ContainerModifiedEvent', None))
+        self.assertEqual(
+            [name for name, id in events].count('ContainerModifiedEvent'), 1)
+        self.assertEqual(
+            [id for name, id in events if name == 'ObjectRemovedEvent'],
+            ['b', 'a', 'c'])
+
+    def test_manage_delObjects_overridden_delObject(self):
+        deleted = []
+
+        class OM(self._getTargetClass()):
+            def _delObject(self, id, dp=1, suppress_events=False):
+                deleted.append(id)
+                super(OM, self)._delObject(id, dp, suppress_events)
+
+        om = OM().__of__(FauxRoot())
+        for id in ('a', 'b', 'c'):
+            om._setObject(id, SimpleItem(id), set_owner=0)
+        om.manage_delObjects(['a', 'c'])
+        self.assertEqual(deleted, ['c', 'a'])
+        self.assertEqual(om.objectIds(), ['b'])
+
     def test_hasObject(self):
         om = self._makeOne()
         self.assertFalse(om.hasObject('_properties'))
@@ -486,6 +593,58 @@ class ObjectManagerTests(PlacelessSetup, unittest.TestCase):
         om['1'] = si1
         self.assertTrue(si1 in list(om.values()))
 
+    def _makeFilled(self):
+        om = self._makeOne()
+        for id, meta_type in (('c', 'Dummy'), ('a', 'Other'), ('b', 'Dummy')):
+            ob = SimpleItem()
+            ob.id = id
+            ob.meta_type = meta_type
+            om._setObject(id, ob, set_owner=0)
+        return om
+
+    def test_objectIds_spec(self):
+        om = self._makeFilled()
+        self.assertEqual(om.objectIds(), ['c', 'a', 'b'])
+        self.assertEqual(om.objectIds('Dummy'), ['c', 'b'])
+        self.assertEqual(om.objectIds(['Dummy', 'Other']), ['c', 'a', 'b'])
+        self.assertEqual(om.objectIds('Missing'), [])
+        # the result can be modified
+        om.objectIds('Dummy').append('x')
+        self.assertEqual(om.objectIds('Dummy'), ['c', 'b'])
+        om._delObject('c')
+        self.assertEqual(om.objectIds('Dummy'), ['b'])
+
+    def test_lazyObjectIds(self):
+        om = self._makeFilled()
+        ids = om.lazyObjectIds()
+        self.assertEqual(len(ids), 3)
+        self.assertEqual(list(ids), ['c', 'a', 'b'])
+        self.assertEqual(list(om.lazyObjectIds('Dummy')), ['c', 'b'])
+
+    def test_lazyObjectValues(self):
+        om = self._makeFilled()
+        loaded = []
+        _getOb = om._getOb
+
+        def getOb(id, default=None):
+            loaded.append(id)
+            return _getOb(id)
+
+        om._getOb = getOb
+        values = om.lazyObjectValues()
+        self.assertEqual(len(values), 3)
+        self.assertEqual(loaded, [])
+        self.assertEqual([ob.getId() for ob in values[1:2]], ['a'])
+        self.assertEqual(loaded, ['a'])
+        self.assertEqual([ob.getId() for ob in om.lazyObjectValues('Dummy')],
+                         ['c', 'b'])
+
+    def test_lazyObjectItems(self):
+        om = self._makeFilled()
+        items = om.lazyObjectItems('Dummy')
+        self.assertEqual([(id, ob.getId()) for id, ob in items],
+                         [('c', 'c'), ('b', 'b')])
+
     def test_list_imports(self):
         om = self._makeOne()
         # This must work whether we've done "make instance" or not.
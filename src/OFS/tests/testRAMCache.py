@@ -0,0 +1,272 @@
+import unittest
+
+from OFS.metaconfigure import setDeprecatedManageAddDelete
+from OFS.RAMCache import RAMCacheManager
+
+setDeprecatedManageAddDelete(RAMCacheManager)
+
+
+class DummyCacheable(object):
+
+    def __init__(self, path, mtime=0):
+        self.path = path
+        self.mtime = mtime
+
+    def getPhysicalPath(self):
+        return self.path
+
+    def ZCacheable_getModTime(self, mtime_func=None):
+        if mtime_func is not None:
+            return max(self.mtime, mtime_func())
+        return self.mtime
+
+
+class RAMCacheTests(unittest.TestCase):
+
+    def _makeOne(self, *args, **kw):
+        from OFS.RAMCache import RAMCache
+        return RAMCache(*args, **kw)
+
+    def test_get_set(self):
+        cache = self._makeOne()
+        ob = DummyCacheable(('', 'ob'))
+        self.assertEqual(cache.ZCache_get(ob, default='default'), 'default')
+        cache.ZCache_set(ob, 'data')
+        self.assertEqual(cache.ZCache_get(ob), 'data')
+        stats = cache.getStatistics()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['entries'], 1)
+        self.assertTrue(stats['size'] > 0)
+
+    def test_keys(self):
+        cache = self._makeOne()
+        ob = DummyCacheable(('', 'ob'))
+        other = DummyCacheable(('', 'other'))
+        cache.ZCache_set(ob, 'a', keywords={'x': 1, 'y': [1, 2]})
+        cache.ZCache_set(ob, 'b', keywords={'x': 2, 'y': [1, 2]})
+        cache.ZCache_set(ob, 'view', view_name='view')
+        self.assertEqual(
+            cache.ZCache_get(ob, keywords={'y': [1, 2], 'x': 1}), 'a')
+        self.assertEqual(
+            cache.ZCache_get(ob, keywords={'y': [1, 2], 'x': 2}), 'b')
+        self.assertEqual(cache.ZCache_get(ob, view_name='view'), 'view')
+        self.assertEqual(cache.ZCache_get(ob), None)
+        self.assertEqual(cache.ZCache_get(other, view_name='view'), None)
+
+    def test_keys_objects_by_path(self):
+        cache = self._makeOne()
+        ob = DummyCacheable(('', 'ob'))
+        cache.ZCache_set(ob, 'a', keywords={'here': DummyCacheable(('', 'a'))})
+        self.assertEqual(
+            cache.ZCache_get(ob, keywords={'here': DummyCacheable(('', 'a'))}),
+            'a')
+        self.assertEqual(
+            cache.ZCache_get(ob, keywords={'here': DummyCacheable(('', 'b'))}),
+            None)
+
+    def test_max_entries(self):
+        cache = self._makeOne(max_entries=2)
+        obs = [DummyCacheable(('', str(i))) for i in range(3)]
+        cache.ZCache_set(obs[0], 0)
+        cache.ZCache_set(obs[1], 1)
+        # Using the first one makes the second the least recently used
+        self.assertEqual(cache.ZCache_get(obs[0]), 0)
+        cache.ZCache_set(obs[2], 2)
+        self.assertEqual(cache.ZCache_get(obs[0]), 0)
+        self.assertEqual(cache.ZCache_get(obs[1]), None)
+        self.assertEqual(cache.ZCache_get(obs[2]), 2)
+        self.assertEqual(cache.getStatistics()['evictions'], 1)
+
+    def test_max_bytes(self):
+        import sys
+        size = sys.getsizeof(b'x' * 100)
+        cache = self._makeOne(max_bytes=size * 2)
+        obs = [DummyCacheable(('', str(i))) for i in range(3)]
+        for ob in obs:
+            cache.ZCache_set(ob, b'x' * 100)
+        self.assertEqual(cache.getStatistics()['entries'], 2)
+        self.assertEqual(cache.getStatistics()['size'], size * 2)
+        self.assertEqual(cache.ZCache_get(obs[0]), None)
+        # Too big to be cached at all
+        cache.ZCache_set(obs[0], b'x' * 1000)
+        self.assertEqual(cache.ZCache_get(obs[0]), None)
+        self.assertEqual(cache.getStatistics()['entries'], 2)
+
+    def test_max_age(self):
+        cache = self._makeOne(max_age=-1)
+        ob = DummyCacheable(('', 'ob'))
+        cache.ZCache_set(ob, 'data')
+        self.assertEqual(cache.ZCache_get(ob), None)
+        stats = cache.getStatistics()
+        self.assertEqual(stats['expirations'], 1)
+        self.assertEqual(stats['entries'], 0)
+
+    def test_no_max_age(self):
+        cache = self._makeOne(max_age=0)
+        ob = DummyCacheable(('', 'ob'))
+        cache.ZCache_set(ob, 'data')
+        self.assertEqual(cache.ZCache_get(ob), 'data')
+
+    def test_modified(self):
+        cache = self._makeOne()
+        ob = DummyCacheable(('', 'ob'), mtime=10)
+        cache.ZCache_set(ob, 'data')
+        self.assertEqual(cache.ZCache_get(ob), 'data')
+        ob.mtime = 20
+        self.assertEqual(cache.ZCache_get(ob), None)
+        self.assertEqual(cache.getStatistics()['invalidations'], 1)
+
+    def test_mtime_func(self):
+        cache = self._makeOne()
+        ob = DummyCacheable(('', 'ob'), mtime=10)
+        cache.ZCache_set(ob, 'data', mtime_func=lambda: 15)
+        self.assertEqual(cache.ZCache_get(ob, mtime_func=lambda: 15), 'data')
+        self.assertEqual(cache.ZCache_get(ob, mtime_func=lambda: 16), None)
+
+    def test_unpicklable(self):
+        cache = self._makeOne()
+        ob = DummyCacheable(('', 'ob'))
+        cache.ZCache_set(ob, lambda: None)
+        self.assertEqual(cache.getStatistics()['entries'], 0)
+
+    def test_invalidate(self):
+        cache = self._makeOne()
+        ob = DummyCacheable(('', 'ob'))
+        other = DummyCacheable(('', 'other'))
+        cache.ZCache_set(ob, 'a', keywords={'x': 1})
+        cache.ZCache_set(ob, 'b', view_name='view')
+        cache.ZCache_set(other, 'c')
+        cache.ZCache_invalidate(ob)
+        self.assertEqual(cache.ZCache_get(ob, keywords={'x': 1}), None)
+        self.assertEqual(cache.ZCache_get(ob, view_name='view'), None)
+        self.assertEqual(cache.ZCache_get(other), 'c')
+        cache.invalidateAll()
+        self.assertEqual(cache.ZCache_get(other), None)
+        stats = cache.getStatistics()
+        self.assertEqual(stats['invalidations'], 3)
+        self.assertEqual(stats['size'], 0)
+
+    def test_configure(self):
+        cache = self._makeOne()
+        for i in range(3):
+            cache.ZCache_set(DummyCacheable(('', str(i))), i)
+        cache.configure(max_entries=1)
+        self.assertEqual(cache.getStatistics()['entries'], 1)
+        cache.clearStatistics()
+        self.assertEqual(cache.getStatistics()['evictions'], 0)
+
+    def test_threads(self):
+        from threading import Thread
+        cache = self._makeOne(max_entries=50)
+        obs = [DummyCacheable(('', str(i))) for i in range(100)]
+
+        def work():
+            for ob in obs:
+                cache.ZCache_set(ob, ob.path)
+                cache.ZCache_get(ob)
+
+        threads = [Thread(target=work) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = cache.getStatistics()
+        self.assertEqual(stats['entries'], 50)
+        self.assertEqual(stats['hits'] + stats['misses'], 400)
+
+
+class RAMCacheManagerTests(unittest.TestCase):
+
+    def _makeRoot(self):
+        from OFS.DTMLMethod import DTMLMethod
+        from OFS.Folder import Folder
+        from OFS.RAMCache import manage_addRAMCacheManager
+        root = Folder('root')
+        manage_addRAMCacheManager(root, 'cache')
+        root._setObject('method', DTMLMethod('method'))
+        root.method.ZCacheable_setManagerId('cache')
+        return root
+
+    def tearDown(self):
+        from OFS.RAMCache import caches
+        caches.clear()
+
+    def test_cacheable(self):
+        root = self._makeRoot()
+        method = root.method
+        self.assertEqual(method.ZCacheable_get(default='default'), 'default')
+        method.ZCacheable_set('data')
+        self.assertEqual(method.ZCacheable_get(), 'data')
+        self.assertEqual(root.cache.getCacheStatistics()['hits'], 1)
+        method.ZCacheable_invalidate()
+        self.assertEqual(method.ZCacheable_get(), None)
+
+    def test_own_cache(self):
+        from OFS.RAMCache import RAMCacheManager
+        root = self._makeRoot()
+        root._setObject('other', RAMCacheManager('other'))
+        self.assertFalse(root.cache.ZCacheManager_getCache() is
+                         root.other.ZCacheManager_getCache())
+        self.assertTrue(root.cache.ZCacheManager_getCache() is
+                        root.cache.ZCacheManager_getCache())
+
+    def test_change_settings(self):
+        root = self._makeRoot()
+        cache = root.cache.ZCacheManager_getCache()
+        root.cache.manage_changeProperties(max_entries=5, max_age=60)
+        self.assertEqual(cache.max_entries, 5)
+        self.assertEqual(cache.max_age, 60)
+
+    def test_invalidate_all(self):
+        root = self._makeRoot()
+        root.method.ZCacheable_set('data')
+        root.cache.manage_invalidateAll()
+        self.assertEqual(root.method.ZCacheable_get(), None)
+        root.cache.manage_clearStatistics()
+        self.assertEqual(root.cache.getCacheStatistics()['misses'], 0)
+
+    def test_delete(self):
+        from OFS.RAMCache import caches
+        root = self._makeRoot()
+        root.cache.ZCacheManager_getCache()
+        self.assertEqual(len(caches), 1)
+        root.manage_delObjects(['cache'])
+        self.assertEqual(len(caches), 0)
+
+    def test_registered(self):
+        import transaction
+        from Testing.ZopeTestCase import base
+        app = base.app()
+        try:
+            meta_types = [info['name'] for info in app.all_meta_types()]
+            self.assertTrue('RAM Cache Manager' in meta_types)
+            factory = app.manage_addProduct['OFSP']
+            factory.manage_addRAMCacheManager('ram', 'Title')
+            self.assertEqual(app.ram.meta_type, 'RAM Cache Manager')
+            self.assertEqual(app.ram.title, 'Title')
+        finally:
+            transaction.abort()
+            base.close(app)
+
+    def test_persistent(self):
+        import transaction
+        from ZODB.DB import DB
+        from ZODB.MappingStorage import MappingStorage
+        db = DB(MappingStorage())
+        conn = db.open()
+        try:
+            conn.root()['root'] = root = self._makeRoot()
+            transaction.commit()
+            cache = root.cache.ZCacheManager_getCache()
+            root.method.ZCacheable_set('data')
+            self.assertEqual(root.method.ZCacheable_get(), 'data')
+            # Editing the method makes the entry stale.
+            root.method.title = 'changed'
+            transaction.commit()
+            self.assertEqual(root.method.ZCacheable_get(), None)
+            self.assertEqual(cache.getStatistics()['invalidations'], 1)
+        finally:
+            transaction.abort()
+            conn.close()
+            db.close()
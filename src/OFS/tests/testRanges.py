@@ -96,11 +96,20 @@ class TestRequestRange(unittest.TestCase):
 
     # Utility methods
     def uploadBigFile(self):
+        import transaction
         self.file.manage_upload(BIGFILE)
         self.data = BIGFILE.getvalue()
+        # Big files are streamed from a connection of their own, which
+        # needs to see the data.
+        transaction.commit()
 
     def doGET(self, request, response):
+        from ZPublisher.Iterators import IStreamIterator
         rv = self.file.index_html(request, response)
+        if IStreamIterator.providedBy(rv):
+            self.assertEqual(
+                response.getHeader('content-length'), str(len(rv)))
+            rv = ''.join(rv)
 
         # Large files are written to resposeOut directly, small ones are
         # returned from the index_html method.
@@ -266,6 +275,16 @@ class TestRequestRange(unittest.TestCase):
         range = '%d-%d' % (start, end - 1)
         self.expectSingleRange(range, start, end)
 
+    def testBigFileWithoutPdataIndex(self):
+        # Files uploaded before the Pdata index existed walk the chain.
+        self.uploadBigFile()
+        del self.file._pdata_index
+        join = 3 * (1 << 16)
+        start = join - 1000
+        end = join + 1000
+        range = '%d-%d' % (start, end - 1)
+        self.expectSingleRange(range, start, end)
+
     def testBigFileEndOverflow(self):
         self.uploadBigFile()
         l = len(self.data)
@@ -296,6 +315,14 @@ class TestRequestRange(unittest.TestCase):
             [(10, 16), (len(self.data) - 10000, len(self.data)),
              (70000, 80001)])
 
+    def testMultipleRangesBigFileWithoutPdataIndex(self):
+        self.uploadBigFile()
+        del self.file._pdata_index
+        self.expectMultipleRanges(
+            '10-15,-10000,70000-80000',
+            [(10, 16), (len(self.data) - 10000, len(self.data)),
+             (70000, 80001)])
+
     def testMultipleRangesBigFileEndOverflow(self):
         self.uploadBigFile()
         l = len(self.data)
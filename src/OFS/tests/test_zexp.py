@@ -0,0 +1,276 @@
+import unittest
+
+import transaction
+
+
+class ExportStreamTests(unittest.TestCase):
+
+    def _makeOne(self, chunks):
+        from OFS.zexp import ExportStream
+        return ExportStream(chunks)
+
+    def test_read(self):
+        stream = self._makeOne([b'abc', b'', b'defgh', b'ij'])
+        self.assertEqual(stream.read(2), b'ab')
+        self.assertEqual(stream.read(4), b'cdef')
+        self.assertEqual(stream.tell(), 6)
+        self.assertEqual(stream.read(), b'ghij')
+        self.assertEqual(stream.read(1), b'')
+
+    def test_seek_back(self):
+        stream = self._makeOne([b'x' * 100, b'0123456789', b'y' * 100])
+        stream.read(100)
+        self.assertEqual(stream.read(10), b'0123456789')
+        stream.seek(-10, 1)
+        self.assertEqual(stream.read(4), b'0123')
+        stream.seek(104)
+        self.assertEqual(stream.read(3), b'456')
+
+    def test_seek_too_far_back(self):
+        stream = self._makeOne([b'x' * 100, b'y' * 100, b'z' * 100])
+        stream.read(150)
+        stream.read(100)
+        self.assertRaises(IOError, stream.seek, 0)
+        self.assertRaises(IOError, stream.seek, 0, 2)
+
+    def test_seek_forward(self):
+        stream = self._makeOne([b'abc', b'def'])
+        stream.seek(4)
+        self.assertEqual(stream.read(), b'ef')
+
+
+class ExportTests(unittest.TestCase):
+
+    def setUp(self):
+        from OFS.Folder import Folder
+        from OFS.Image import File
+        from ZODB.DB import DB
+        from ZODB.MappingStorage import MappingStorage
+        self.db = DB(MappingStorage())
+        self.conn = self.db.open()
+        root = self.conn.root()
+        root['folder'] = folder = Folder('folder')
+        folder._setObject('sub', Folder('sub'), set_owner=0)
+        folder.sub._setObject(
+            'file', File('file', '', b'data' * 1000), set_owner=0)
+        transaction.commit()
+        self.folder = folder
+
+    def tearDown(self):
+        transaction.abort()
+        self.conn.close()
+        self.db.close()
+
+    def test_exportChunks(self):
+        from io import BytesIO
+        from OFS.zexp import exportChunks
+        expected = BytesIO()
+        self.conn.exportFile(self.folder._p_oid, expected)
+        self.assertEqual(
+            b''.join(exportChunks(self.conn, self.folder._p_oid)),
+            expected.getvalue())
+
+    def test_manage_exportObject_download(self):
+        from io import BytesIO
+        expected = BytesIO()
+        self.conn.exportFile(self.folder.sub._p_oid, expected)
+        self.assertEqual(self.folder.manage_exportObject('sub', download=1),
+                         expected.getvalue())
+
+        from ZPublisher.Iterators import IUnboundStreamIterator
+        response = DummyResponse()
+        result = self.folder.manage_exportObject(
+            'sub', download=1, RESPONSE=response)
+        self.assertTrue(IUnboundStreamIterator.providedBy(result))
+        self.assertEqual(response.headers['Content-Disposition'],
+                         'inline;filename=sub.zexp')
+        # The request's connection may be closed before it is sent.
+        transaction.abort()
+        self.conn.close()
+        self.assertEqual(b''.join(result), expected.getvalue())
+        self.conn = self.db.open()
+
+    def test_cloneObject(self):
+        from OFS.zexp import cloneObject
+        copy = cloneObject(self.folder, self.conn)
+        self.assertFalse(copy is self.folder)
+        self.assertNotEqual(copy._p_oid, self.folder._p_oid)
+        self.assertEqual(copy.objectIds(), ['sub'])
+        self.assertEqual(bytes(copy.sub.file.data), b'data' * 1000)
+        self.assertNotEqual(copy.sub._p_oid, self.folder.sub._p_oid)
+        copy.sub.file.title = 'changed'
+        self.assertEqual(self.folder.sub.file.title, '')
+
+    def test_cloneObject_exclude(self):
+        from OFS.Image import File
+        from OFS.zexp import cloneObject
+        from OFS.zexp import exportChunks
+        exclude = set([self.folder.sub.file._p_oid])
+        data = b''.join(
+            exportChunks(self.conn, self.folder._p_oid, exclude))
+        self.assertFalse(b'datadata' in data)
+        copy = cloneObject(self.folder, self.conn, exclude)
+        # The excluded object is copied without its state.
+        self.assertTrue(isinstance(copy.sub.file, File))
+        self.assertFalse('data' in copy.sub.file.__dict__)
+        self.assertEqual(bytes(self.folder.sub.file.data), b'data' * 1000)
+
+    def test_cloneObject_uncommitted_changes(self):
+        from OFS.zexp import cloneObject
+        self.folder.sub.file.title = 'changed'
+        transaction.savepoint(optimistic=True)
+        copy = cloneObject(self.folder, self.conn)
+        self.assertEqual(copy.sub.file.title, 'changed')
+
+
+class BatchImporterTests(unittest.TestCase):
+
+    def setUp(self):
+        import os
+        import tempfile
+        from OFS.Folder import Folder
+        from OFS.Image import File
+        from ZODB.DB import DB
+        from ZODB.MappingStorage import MappingStorage
+        self.db = DB(MappingStorage())
+        self.conn = self.db.open()
+        root = self.conn.root()
+        root['folder'] = folder = Folder('folder')
+        for i in range(5):
+            id = 'sub%d' % i
+            folder._setObject(id, Folder(id), set_owner=0)
+            folder[id]._setObject(
+                'file', File('file', id, b'data%d' % i), set_owner=0)
+        transaction.commit()
+        self.folder = folder
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'folder.zexp')
+        self.conn.exportFile(folder._p_oid, self.filename)
+
+    def tearDown(self):
+        import shutil
+        transaction.abort()
+        self.conn.close()
+        self.db.close()
+        shutil.rmtree(self.tmpdir)
+
+    def _makeOne(self, *args, **kw):
+        from OFS.zexp import BatchImporter
+        return BatchImporter(self.conn, self.filename, *args, **kw)
+
+    def _checkCopy(self, copy):
+        self.assertNotEqual(copy._p_oid, self.folder._p_oid)
+        self.assertEqual(copy.getId(), 'folder')
+        self.assertEqual(copy.objectIds(), self.folder.objectIds())
+        for i in range(5):
+            file = copy['sub%d' % i].file
+            self.assertEqual(file.title, 'sub%d' % i)
+            self.assertEqual(bytes(file.data), b'data%d' % i)
+            self.assertNotEqual(file._p_oid,
+                                self.folder['sub%d' % i].file._p_oid)
+
+    def test_import(self):
+        progress = []
+        importer = self._makeOne(batch_size=4,
+                                 progress=lambda *args: progress.append(args))
+        copy = importer()
+        self._checkCopy(copy)
+        # the folder, 5 subfolders and 5 files
+        self.assertEqual(progress, [(4, 11), (8, 11), (11, 11)])
+
+    def test_commits_batches(self):
+        commits = []
+        importer = self._makeOne(batch_size=5)
+        importer.transaction_manager = DummyTransactionManager(commits)
+        importer()
+        self.assertEqual(len(commits), 3)
+
+    def test_resume(self):
+        import os
+        checkpoint = self.filename + '.checkpoint'
+
+        class Interrupted(Exception):
+            pass
+
+        def interrupt(done, total):
+            if done == 8:
+                raise Interrupted
+
+        importer = self._makeOne(batch_size=4, checkpoint=checkpoint,
+                                 progress=interrupt)
+        self.assertRaises(Interrupted, importer)
+        self.assertTrue(os.path.exists(checkpoint))
+
+        resumed = []
+        importer = self._makeOne(
+            batch_size=4, checkpoint=checkpoint,
+            progress=lambda done, total: resumed.append(done))
+        copy = importer()
+        self.assertEqual(resumed, [11])
+        self._checkCopy(copy)
+        self.assertFalse(os.path.exists(checkpoint))
+
+    def test_resume_other_target(self):
+        import os
+        checkpoint = self.filename + '.checkpoint'
+
+        def interrupt(done, total):
+            raise ValueError
+
+        importer = self._makeOne(batch_size=4, checkpoint=checkpoint,
+                                 progress=interrupt, key='/target')
+        self.assertRaises(ValueError, importer)
+        importer = self._makeOne(batch_size=4, checkpoint=checkpoint,
+                                 key='/other')
+        self._checkCopy(importer())
+        self.assertEqual(importer.done, 11)
+        self.assertFalse(os.path.exists(checkpoint))
+
+    def test_failure_aborts(self):
+        from ZODB.POSException import ExportError
+        with open(self.filename, 'r+b') as f:
+            f.seek(-16, 2)
+            f.write(b'\0' * 16)
+        importer = self._makeOne(batch_size=4)
+        self.assertRaises(ExportError, importer)
+        self.assertEqual(self.conn._registered_objects, [])
+
+    def test_refuses_pending_changes(self):
+        self.folder.title = 'changed'
+        self.assertRaises(ValueError, self._makeOne())
+
+    def test_importObjectFromFile(self):
+        from OFS.Folder import Folder
+        self.conn.root()['target'] = target = Folder('target')
+        transaction.commit()
+        target._importObjectFromFile(
+            self.filename, verify=0, set_owner=0, batch_size=4)
+        self._checkCopy(target.folder)
+
+    def test_invalid_file(self):
+        from ZODB.POSException import ExportError
+        with open(self.filename, 'wb') as f:
+            f.write(b'<?xml')
+        self.assertRaises(ExportError, self._makeOne())
+
+
+class DummyResponse(object):
+
+    def __init__(self):
+        self.headers = {}
+
+    def setHeader(self, name, value):
+        self.headers[name] = value
+
+
+class DummyTransactionManager(object):
+
+    def __init__(self, commits):
+        self.commits = commits
+
+    def commit(self):
+        self.commits.append(1)
+        transaction.commit()
+
+    def abort(self):
+        transaction.abort()
@@ -33,6 +33,7 @@ from App.Management import Tabs
 from App.special_dtml import DTMLFile
 from OFS.role import RoleManager
 from OFS.SimpleItem import Item
+from ZPublisher.ValidationCache import invalidateValidationCache
 
 
 class BasicUserFolder(Navigation, Tabs, Item, RoleManager,
@@ -238,6 +239,7 @@ class BasicUserFolder(Navigation, Tabs, Item, RoleManager,
 
     def manage_beforeDelete(self, item, container):
         if item is self:
+            invalidateValidationCache(self)
             try:
                 del container.__allow_groups__
             except Exception:
@@ -269,6 +271,21 @@ class UserFolder(accesscontrol_userfolder.UserFolder, BasicUserFolder):
         super(UserFolder, self).__init__()
         self._ofs_migrated = True
 
+    def _doAddUser(self, name, password, roles, domains, **kw):
+        user = super(UserFolder, self)._doAddUser(
+            name, password, roles, domains, **kw)
+        invalidateValidationCache(self)
+        return user
+
+    def _doChangeUser(self, name, password, roles, domains, **kw):
+        super(UserFolder, self)._doChangeUser(
+            name, password, roles, domains, **kw)
+        invalidateValidationCache(self)
+
+    def _doDelUsers(self, names):
+        super(UserFolder, self)._doDelUsers(names)
+        invalidateValidationCache(self)
+
     def _createInitialUser(self):
         """
         If there are no users or only one user in this user folder,
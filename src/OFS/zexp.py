@@ -0,0 +1,424 @@
+##############################################################################
+#
+# Copyright (c) 2017 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Streaming of ZODB exports (zexp) and batched imports.
+
+The data written is the same as the one of ZODB's Connection.exportFile,
+but it is produced record by record instead of being written to a file
+first.
+"""
+
+from binascii import hexlify
+from binascii import unhexlify
+from collections import deque
+from io import BytesIO
+from logging import getLogger
+import json
+import os
+import pickletools
+
+import transaction
+from ZODB._compat import _protocol
+from ZODB._compat import dumps
+from ZODB._compat import PersistentUnpickler
+from ZODB.blob import Blob
+from ZODB.ExportImport import blob_begin_marker
+from ZODB.ExportImport import export_end_marker
+from ZODB.interfaces import IBlobStorage
+from ZODB.POSException import ExportError
+from ZODB.POSException import POSKeyError
+from ZODB.serialize import referencesf
+from ZODB.utils import cp
+from ZODB.utils import mktemp
+from ZODB.utils import p64
+from ZODB.utils import u64
+from zope.interface import implementer
+from ZPublisher.Iterators import IUnboundStreamIterator
+
+LOG = getLogger('OFS.zexp')
+
+EXPORT_MAGIC = b'ZEXP'
+CHUNK_SIZE = 1 << 16
+
+
+def _emptyRecord(data):
+    # The record of an object of the same class, with an empty state.
+    for opcode, arg, pos in pickletools.genops(data):
+        if opcode.name == 'STOP':
+            return data[:pos + 1] + dumps({}, _protocol)
+    raise ExportError('Invalid record')
+
+
+def exportRecords(jar, oid, exclude=()):
+    """Iterate over the records of the object `oid` and the objects it
+    references, as stored in the storage of the connection `jar`.
+
+    The objects whose oids are in `exclude` are exported with an empty
+    state, and the objects only they reference are left out. `exclude`
+    is asked about every oid just before its record is exported, so it
+    may be filled while the records are exported.
+
+    Yields (oid, data, blob file name or None) tuples.
+    """
+    storage = jar._storage
+    supports_blobs = IBlobStorage.providedBy(storage)
+    oids = deque([oid])
+    done = set()
+    while oids:
+        oid = oids.popleft()
+        if oid in done:
+            continue
+        done.add(oid)
+        try:
+            data, serial = storage.load(oid)
+        except POSKeyError:
+            LOG.debug('broken reference for oid %r', oid, exc_info=True)
+            continue
+        if oid in exclude:
+            yield oid, _emptyRecord(data), None
+            continue
+        oids.extend(referencesf(data))
+        blobfilename = None
+        if supports_blobs and isinstance(jar._reader.getGhost(data), Blob):
+            blobfilename = storage.loadBlob(oid, serial)
+        yield oid, data, blobfilename
+
+
+def exportChunks(jar, oid, exclude=()):
+    """Iterate over the chunks of the zexp export of the object `oid`,
+    see `exportRecords` for `exclude`.
+    """
+    yield EXPORT_MAGIC
+    for oid, data, blobfilename in exportRecords(jar, oid, exclude):
+        yield oid + p64(len(data)) + data
+        if blobfilename is not None:
+            with open(blobfilename, 'rb') as f:
+                f.seek(0, 2)
+                yield blob_begin_marker + p64(f.tell())
+                f.seek(0)
+                while True:
+                    chunk = f.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+    yield export_end_marker
+
+
+@implementer(IUnboundStreamIterator)
+class ExportStreamIterator(object):
+    """Publish the zexp export of a persistent object.
+
+    The records are read through a database connection of our own when
+    the response is sent, so the export is never held in memory and the
+    request's connection may be closed before. The export holds the
+    committed state of the object.
+    """
+
+    def __init__(self, ob):
+        self._db = ob._p_jar.db()
+        self._oid = ob._p_oid
+        self._chunks = self._read()
+
+    def _read(self):
+        connection = self._db.open(
+            transaction_manager=transaction.TransactionManager())
+        try:
+            # Send blocks of about CHUNK_SIZE bytes.
+            block = []
+            size = 0
+            for chunk in exportChunks(connection, self._oid):
+                block.append(chunk)
+                size += len(chunk)
+                if size >= CHUNK_SIZE:
+                    yield b''.join(block)
+                    block = []
+                    size = 0
+            if block:
+                yield b''.join(block)
+        finally:
+            connection.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._chunks)
+
+    next = __next__
+
+    def close(self):
+        self._chunks.close()
+
+
+class ExportStream(object):
+    """Read-only file like object over an iterator of chunks.
+
+    Only the last few bytes read are kept, so seeking is limited to
+    going back a little, which is what importing a zexp needs.
+    """
+
+    keep = 16
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._data = b''
+        self._pos = 0
+        self._offset = 0  # number of bytes dropped from _data
+
+    def _fill(self, size):
+        while size < 0 or len(self._data) - self._pos < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return
+            drop = self._pos - self.keep
+            if drop > 0:
+                self._data = self._data[drop:]
+                self._pos -= drop
+                self._offset += drop
+            self._data += chunk
+
+    def read(self, size=-1):
+        self._fill(size)
+        if size < 0:
+            end = len(self._data)
+        else:
+            end = self._pos + size
+        data = self._data[self._pos:end]
+        self._pos += len(data)
+        return data
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self.tell()
+        elif whence != 0:
+            raise IOError('Seeking from the end is not supported')
+        if offset < self._offset:
+            raise IOError('Cannot seek back to %d' % offset)
+        if offset - self._offset > len(self._data):
+            self._fill(offset - self.tell())
+        self._pos = min(offset - self._offset, len(self._data))
+
+    def tell(self):
+        return self._offset + self._pos
+
+    def close(self):
+        self._chunks = iter(())
+        self._data = b''
+        self._pos = 0
+
+
+def cloneObject(ob, jar, exclude=()):
+    """Copy the persistent object `ob` and its subobjects into the
+    connection `jar`, without writing an export file. The objects whose
+    oids are in `exclude` are copied without their state (see
+    `exportRecords`).
+
+    Returns the copy, which is only stored in a savepoint of the current
+    transaction.
+    """
+    return jar.importFile(
+        ExportStream(exportChunks(ob._p_jar, ob._p_oid, exclude)))
+
+
+def _readRecordHeaders(f):
+    # Map the oids of the records of a zexp file to the offsets of their
+    # data, without reading the data.
+    offsets = {}
+    order = []
+    f.seek(len(EXPORT_MAGIC))
+    while True:
+        header = f.read(16)
+        if header == export_end_marker:
+            return offsets, order
+        if len(header) != 16:
+            raise ExportError('Truncated export file')
+        oid = header[:8]
+        length = u64(header[8:16])
+        offsets[oid] = f.tell() - 16
+        order.append(oid)
+        f.seek(length, 1)
+        marker = f.read(len(blob_begin_marker))
+        if marker == blob_begin_marker:
+            f.seek(u64(f.read(8)), 1)
+        else:
+            f.seek(-len(marker), 1)
+
+
+def _readRecord(f, offset, blob=True):
+    # Return the data of the record at offset and the name of a temporary
+    # file with its blob data (if any and `blob` is true).
+    f.seek(offset)
+    header = f.read(16)
+    data = f.read(u64(header[8:16]))
+    blobfilename = None
+    if blob:
+        marker = f.read(len(blob_begin_marker))
+        if marker == blob_begin_marker:
+            blobfilename = mktemp()
+            with open(blobfilename, 'wb') as blobfile:
+                cp(f, blobfile, u64(f.read(8)))
+    return data, blobfilename
+
+
+class BatchImporter(object):
+    """Import a zexp file into a connection in several transactions.
+
+    ZODB's Connection.importFile stores all objects of an export in a
+    single savepoint. This importer commits the transaction every
+    `batch_size` records instead, so large exports don't need to be held
+    in one transaction. It is meant for scripts: the transaction must not
+    hold other changes when the import starts, and it must not run while
+    a request is published.
+
+    If `checkpoint` is a file name, the state of the import is saved to
+    it after every batch and an interrupted import is resumed from it,
+    provided the checkpoint was written for the same `key` (e.g. the path
+    of the target container) and the file did not change. `progress` is
+    called after every batch with the number of records imported and the
+    total number of records.
+
+    Objects referenced by a record are created (empty) when the record
+    is imported and get their state when their own record is reached. The
+    imported objects are not reachable until the caller adds the
+    returned root object to a container. If the import fails, the
+    current batch is aborted; the batches committed before stay
+    unreachable, until the import is resumed or the database is packed.
+    """
+
+    def __init__(self, jar, filename, batch_size=1000, checkpoint=None,
+                 progress=None, transaction_manager=None, key=None):
+        self.jar = jar
+        self.filename = filename
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint
+        self.progress = progress
+        self.key = key
+        if transaction_manager is None:
+            transaction_manager = jar.transaction_manager
+        self.transaction_manager = transaction_manager
+        self.oids = {}  # oid in the export -> new oid
+        self.done = 0
+
+    def _fileInfo(self):
+        st = os.stat(self.filename)
+        return [self.key, st.st_size, st.st_mtime]
+
+    def _loadCheckpoint(self):
+        if self.checkpoint is None or not os.path.exists(self.checkpoint):
+            return
+        with open(self.checkpoint, 'rb') as f:
+            state = json.load(f)
+        if state.get('file') != self._fileInfo():
+            LOG.warning('Ignoring checkpoint %s of another import',
+                        self.checkpoint)
+            return
+        self.done = state['done']
+        self.oids = dict((unhexlify(old), unhexlify(new))
+                         for old, new in state['oids'].items())
+
+    def _saveCheckpoint(self):
+        if self.checkpoint is None:
+            return
+        state = {
+            'file': self._fileInfo(),
+            'done': self.done,
+            'oids': dict((hexlify(old).decode('ascii'),
+                          hexlify(new).decode('ascii'))
+                         for old, new in self.oids.items()),
+        }
+        tmp = self.checkpoint + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.rename(tmp, self.checkpoint)
+
+    def _get(self, f, offsets, oid):
+        # Return the new object for the oid of the export, creating it
+        # if necessary.
+        new_oid = self.oids.get(oid)
+        if new_oid is not None:
+            return self.jar.get(new_oid)
+        offset = offsets.get(oid)
+        if offset is None:
+            raise ExportError('Reference to missing record %r' % oid)
+        data, blobfilename = _readRecord(f, offset, blob=False)
+        ob = self.jar._reader.getGhost(data)
+        self.jar.add(ob)
+        self.oids[oid] = ob._p_oid
+        return ob
+
+    def _unpickler(self, f, offsets, data):
+        jar = self.jar
+
+        def find_global(modulename, name):
+            return jar._db.classFactory(jar, modulename, name)
+
+        def persistent_load(reference):
+            if isinstance(reference, tuple):
+                reference = reference[0]
+            if not isinstance(reference, bytes):
+                raise ExportError(
+                    'Unsupported reference %r in export' % (reference,))
+            return self._get(f, offsets, reference)
+
+        return PersistentUnpickler(
+            find_global, persistent_load, BytesIO(data))
+
+    def _importRecord(self, f, offsets, oid):
+        data, blobfilename = _readRecord(f, offsets[oid])
+        ob = self._get(f, offsets, oid)
+        unpickler = self._unpickler(f, offsets, data)
+        unpickler.load()  # the class
+        state = unpickler.load()
+        if ob._p_changed is None:
+            ob._p_activate()
+        ob.__setstate__(state)
+        ob._p_changed = True
+        if blobfilename is not None:
+            ob.consumeFile(blobfilename)
+
+    def __call__(self):
+        """Import the file and return the new root object."""
+        if getattr(self.jar, '_registered_objects', None):
+            raise ValueError('The transaction holds changes, batched '
+                             'imports would commit them.')
+        self._loadCheckpoint()
+        try:
+            with open(self.filename, 'rb') as f:
+                order = self._import(f)
+        except Exception:
+            self.transaction_manager.abort()
+            LOG.error('Importing %s failed', self.filename)
+            raise
+        root = self.jar.get(self.oids[order[0]])
+        if self.checkpoint is not None and os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+        return root
+
+    def _import(self, f):
+        if f.read(len(EXPORT_MAGIC)) != EXPORT_MAGIC:
+            raise ExportError('Invalid export header')
+        offsets, order = _readRecordHeaders(f)
+        if not order:
+            raise ExportError('Empty export file')
+        total = len(order)
+        for oid in order[self.done:]:
+            self._importRecord(f, offsets, oid)
+            self.done += 1
+            if self.done % self.batch_size == 0 or self.done == total:
+                self.transaction_manager.commit()
+                self._saveCheckpoint()
+                self.jar.cacheGC()
+                LOG.info('Imported %d of %d records from %s',
+                         self.done, total, self.filename)
+                if self.progress is not None:
+                    self.progress(self.done, total)
+        return order
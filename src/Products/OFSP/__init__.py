@@ -13,12 +13,15 @@
 
 from AccessControl.Permissions import add_documents_images_and_files
 from AccessControl.Permissions import add_folders
+import OFS.BTreeFolder
 import OFS.DTMLMethod
 import OFS.DTMLDocument
+import OFS.FileCache
 import OFS.Folder
 import OFS.Image
 import OFS.OrderedFolder
 import OFS.PropertySheets
+import OFS.RAMCache
 import OFS.userfolder
 
 
@@ -72,6 +75,28 @@ def initialize(context):
         legacy=(OFS.OrderedFolder.manage_addOrderedFolder,),
     )
 
+    context.registerClass(
+        OFS.BTreeFolder.BTreeFolder,
+        permission=add_folders,
+        constructors=(OFS.BTreeFolder.manage_addBTreeFolderForm,
+                      OFS.BTreeFolder.manage_addBTreeFolder),
+        legacy=(OFS.BTreeFolder.manage_addBTreeFolder,),
+    )
+
+    context.registerClass(
+        OFS.RAMCache.RAMCacheManager,
+        constructors=(OFS.RAMCache.manage_addRAMCacheManagerForm,
+                      OFS.RAMCache.manage_addRAMCacheManager),
+        legacy=(OFS.RAMCache.manage_addRAMCacheManager,),
+    )
+
+    context.registerClass(
+        OFS.FileCache.FileCacheManager,
+        constructors=(OFS.FileCache.manage_addFileCacheManagerForm,
+                      OFS.FileCache.manage_addFileCacheManager),
+        legacy=(OFS.FileCache.manage_addFileCacheManager,),
+    )
+
     context.registerClass(
         OFS.userfolder.UserFolder,
         constructors=(OFS.userfolder.manage_addUserFolder,),
@@ -16,12 +16,14 @@
 import sys
 
 from Acquisition import aq_base, aq_inner, aq_parent
+from ComputedAttribute import ComputedAttribute
 import ExtensionClass
 import zope.pagetemplate.pagetemplate
 from zope.pagetemplate.pagetemplate import PTRuntimeError
 from zope.pagetemplate.pagetemplate import PageTemplateTracebackSupplement
 from zope.tales.expressions import SimpleModuleImporter
 from Products.PageTemplates.Expressions import getEngine
+from Products.PageTemplates.fragmentcache import sourceMacros
 
 
 class PageTemplate(ExtensionClass.Base,
@@ -48,10 +50,13 @@ class PageTemplate(ExtensionClass.Base,
             c['root'] = self
         return c
 
-    @property
-    def macros(self):
+    def _get_macros(self):
         return self.pt_macros()
 
+    # Computed in the acquisition context, so that the macros know the
+    # path of the template.
+    macros = ComputedAttribute(_get_macros, 1)
+
     # sub classes may override this to do additional stuff for macro access
     def pt_macros(self):
         self._cook_check()
@@ -62,7 +67,7 @@ class PageTemplate(ExtensionClass.Base,
                 'Page Template %s has errors: %s' % (
                     self.id, self._v_errors
                 ))
-        return self._v_macros
+        return sourceMacros(self._v_macros, self)
 
     # these methods are reimplemented or duplicated here because of
     # different call signatures in the Zope 2 world
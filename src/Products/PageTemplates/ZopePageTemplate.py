@@ -13,6 +13,7 @@
 """Zope Page Template module (wrapper for the zope.pagetemplate implementation)
 """
 
+from hashlib import md5
 import os
 import sys
 
@@ -24,6 +25,7 @@ from AccessControl.Permissions import view_management_screens
 from AccessControl.SecurityManagement import getSecurityManager
 from AccessControl.SecurityInfo import ClassSecurityInfo
 from Acquisition import Acquired
+from Acquisition import aq_base
 from Acquisition import aq_get
 from Acquisition import Explicit
 from zExceptions import ResourceLockedError
@@ -52,6 +54,21 @@ if 'ZPT_PREFERRED_ENCODING' in os.environ:
     preferred_encodings.insert(0, os.environ['ZPT_PREFERRED_ENCODING'])
 
 
+def _cacheKeyValue(value):
+    # Objects are identified by their path, other values by their repr.
+    getPhysicalPath = getattr(aq_base(value), 'getPhysicalPath', None)
+    if getPhysicalPath is not None:
+        try:
+            return ('path', tuple(value.getPhysicalPath()))
+        except Exception:
+            pass
+    if isinstance(value, dict):
+        return tuple(sorted((k, _cacheKeyValue(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_cacheKeyValue(v) for v in value)
+    return value
+
+
 class Src(Explicit):
     """ I am scary code """
     security = ClassSecurityInfo()
@@ -98,6 +115,16 @@ class ZopePageTemplate(Script, PageTemplate, Cacheable,
         {'id': 'expand', 'type': 'boolean', 'mode': 'w'},
     )
 
+    # The cache key policy: the names of the request variables and of the
+    # options ('*' for all of them) the result depends on, and whether it
+    # depends on the path of the context, the roles of the user in the
+    # context and the user.
+    _cache_request_keys = ()
+    _cache_option_keys = ('*',)
+    _cache_key_context = True
+    _cache_key_roles = True
+    _cache_key_user = True
+
     security = ClassSecurityInfo()
     security.declareObjectProtected(view)
 
@@ -277,8 +304,7 @@ class ZopePageTemplate(Script, PageTemplate, Cacheable,
         keyset = None
         if self.ZCacheable_isCachingEnabled():
             # Prepare a cache key.
-            keyset = {'here': self._getContext(),
-                      'bound_names': bound_names}
+            keyset = {'key': self._getCacheKey(request, security, kw)}
             result = self.ZCacheable_get(keywords=keyset)
             if result is not None:
                 # Got a cached value.
@@ -296,6 +322,70 @@ class ZopePageTemplate(Script, PageTemplate, Cacheable,
         finally:
             security.removeContext(self)
 
+    def _getCacheKey(self, request, security, options):
+        # Compute the cache key of a rendering from the parts selected by
+        # the cache key policy, reduced to a short digest.
+        key = [tuple(self._getTraverseSubpath())]
+        if self._cache_key_context or self._cache_key_roles:
+            context = self._getContext()
+            if self._cache_key_context:
+                key.append(_cacheKeyValue(context))
+        if self._cache_key_roles or self._cache_key_user:
+            user = security.getUser()
+            if self._cache_key_roles:
+                key.append(tuple(sorted(user.getRolesInContext(context))))
+            if self._cache_key_user:
+                key.append(user.getId())
+        if self._cache_request_keys:
+            get = getattr(request, 'get', None)
+            key.append(tuple(
+                _cacheKeyValue(get(name)) if get is not None else None
+                for name in self._cache_request_keys))
+        if '*' in self._cache_option_keys:
+            key.append(_cacheKeyValue(options))
+        elif self._cache_option_keys:
+            key.append(tuple(_cacheKeyValue(options.get(name))
+                             for name in self._cache_option_keys))
+        return md5(repr(key).encode('utf-8')).hexdigest()
+
+    security.declareProtected(change_page_templates, 'ZCacheable_configHTML')
+    ZCacheable_configHTML = PageTemplateFile('www/cacheKeyPolicy', globals())
+
+    security.declareProtected(change_page_templates, 'getCacheKeyPolicy')
+    def getCacheKeyPolicy(self):
+        """Return the cache key policy as a mapping."""
+        return {
+            'request_keys': self._cache_request_keys,
+            'option_keys': self._cache_option_keys,
+            'context': self._cache_key_context,
+            'roles': self._cache_key_roles,
+            'user': self._cache_key_user,
+        }
+
+    security.declareProtected(change_page_templates, 'setCacheKeyPolicy')
+    def setCacheKeyPolicy(self, request_keys=(), option_keys=(),
+                          context=False, roles=False, user=False,
+                          REQUEST=None):
+        """Set what the cache keys of the renderings consist of.
+
+        `request_keys` and `option_keys` are the names of the request
+        variables and of the options ('*' for all of them) the result
+        depends on. `context`, `roles` and `user` tell whether it depends
+        on the path of the context, the roles of the user in the context
+        and the user.
+        """
+        self._cache_request_keys = tuple(
+            filter(None, [str(key).strip() for key in request_keys]))
+        self._cache_option_keys = tuple(
+            filter(None, [str(key).strip() for key in option_keys]))
+        self._cache_key_context = bool(context)
+        self._cache_key_roles = bool(roles)
+        self._cache_key_user = bool(user)
+        self.ZCacheable_invalidate()
+
+        if REQUEST is not None:
+            return self.ZCacheable_manage(self, REQUEST)
+
     if bbb.HAS_ZSERVER:
         security.declareProtected(change_page_templates, 'PUT')
         def PUT(self, REQUEST, RESPONSE):
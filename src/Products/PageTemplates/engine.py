@@ -12,6 +12,7 @@ from z3c.pt.pagetemplate import PageTemplate as ChameleonPageTemplate
 from AccessControl.class_init import InitializeClass
 from AccessControl.SecurityInfo import ClassSecurityInfo
 from Products.PageTemplates.Expressions import getEngine
+from Products.PageTemplates import programcache
 from Products.PageTemplates import ZRPythonExpr
 
 from chameleon.tales import StringExpr
@@ -20,6 +21,7 @@ from chameleon.tal import RepeatDict
 
 from z3c.pt.expressions import PythonExpr, ProviderExpr
 
+from .expression import CacheExpr
 from .expression import PathExpr
 from .expression import TrustedPathExpr
 from .expression import NocallExpr
@@ -50,6 +52,7 @@ class Program(object):
         'path': PathExpr,
         'provider': ProviderExpr,
         'nocall': NocallExpr,
+        'cache': CacheExpr,
     }
 
     # Zope 3 Page Template expressions
@@ -61,6 +64,7 @@ class Program(object):
         'path': TrustedPathExpr,
         'provider': ProviderExpr,
         'nocall': NocallExpr,
+        'cache': CacheExpr,
     }
 
     extra_builtins = {
@@ -82,6 +86,9 @@ class Program(object):
         kwargs['wrapped_repeat'] = kwargs['repeat']
         kwargs['repeat'] = RepeatDict(context.repeat_vars)
 
+        # Restricted traversal results are reused during this rendering
+        kwargs['__traversal_memo'] = {}
+
         return self.template.render(**kwargs)
 
     @classmethod
@@ -113,10 +120,17 @@ class Program(object):
         if source_file is not None and source_file.startswith('file:'):
             source_file = source_file[5:]
 
+        config = {}
+        loader = programcache.getLoader(expression_types)
+        if loader is not None:
+            # Share the compiled program with the other processes
+            config['loader'] = loader
+
         template = ChameleonPageTemplate(
             text, filename=source_file, keep_body=True,
             expression_types=expression_types,
             encoding='utf-8', extra_builtins=cls.extra_builtins,
+            **config
         )
 
         return cls(template), template.macros
@@ -12,18 +12,23 @@ from RestrictedPython.Utilities import utility_builtins
 from RestrictedPython import MutatingWalker
 
 from Products.PageTemplates.Expressions import render
+from Products.PageTemplates.fragmentcache import CachedMacro
 
+from AccessControl.SecurityManagement import getSecurityManager
 from AccessControl.ZopeGuards import guarded_getattr
 from AccessControl.ZopeGuards import guarded_getitem
 from AccessControl.ZopeGuards import guarded_apply
 from AccessControl.ZopeGuards import guarded_iter
 from AccessControl.ZopeGuards import protected_inplacevar
 
+from chameleon.astutil import load
+from chameleon.astutil import store
 from chameleon.astutil import Symbol
 from chameleon.astutil import Static
 from chameleon.codegen import template
 
 from z3c.pt import expressions
+import ast
 import collections
 
 _marker = object()
@@ -71,11 +76,36 @@ class BoboAwareZopeTraverse(object):
 
         return base
 
+    @classmethod
+    def traverseMemoized(cls, memo, base, request, path_items):
+        """Traverse like `traverse`, reusing the result of traversing the
+        same path from the same object for the same user.
+
+        `memo` is a dictionary kept for a rendering of a template (see
+        engine.Program), so the results are not reused once it is done.
+        """
+        if not ITraversable.providedBy(base):
+            return cls.traverse(base, request, path_items)
+        user = getSecurityManager().getUser()
+        key = (id(base), tuple(path_items), id(user))
+        entry = memo.get(key)
+        # The base and user are kept in the entry, so that their ids are
+        # not reused by other objects during the rendering.
+        if entry is not None and entry[0] is base and entry[1] is user:
+            return entry[2]
+        result = cls.traverse(base, request, path_items)
+        memo[key] = (base, user, result)
+        return result
+
     def __call__(self, base, econtext, call, path_items):
         request = econtext.get('request')
 
         if path_items:
-            base = self.traverse(base, request, path_items)
+            memo = econtext.get('__traversal_memo')
+            if memo is None:
+                base = self.traverse(base, request, path_items)
+            else:
+                base = self.traverseMemoized(memo, base, request, path_items)
 
         if call is False:
             return base
@@ -129,6 +159,32 @@ class ExistsExpr(expressions.ExistsExpr):
     exceptions = zope2_exceptions
 
 
+class CacheExpr(object):
+    """Caches the output of the macro of a ``metal:use-macro``.
+
+    The expression is ``cache: <key expression>; <macro expression>``,
+    see Products.PageTemplates.fragmentcache.
+    """
+
+    def __init__(self, expression):
+        key, sep, macro = expression.rpartition(';')
+        self.expression = expression.strip()
+        self.key = key.strip()
+        self.macro = macro.strip()
+
+    def __call__(self, target, engine):
+        body = engine.parse(self.macro).assign_value(target)
+        if self.key:
+            body += engine.parse(self.key).assign_value(store('__cache_key'))
+            key = load('__cache_key')
+        else:
+            key = load('None')
+        return body + template(
+            "target = cached(target, key, expression)",
+            target=target, cached=Symbol(CachedMacro), key=key,
+            expression=ast.Str(s=self.expression))
+
+
 class RestrictionTransform(NodeTransformer):
     secured = {
         '_getattr_': guarded_getattr,
@@ -0,0 +1,206 @@
+##############################################################################
+#
+# Copyright (c) 2017 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Cache of the output of macros.
+
+A ``cache:`` expression in ``metal:use-macro`` caches the output of the
+macro (including the slots filled by the using element)::
+
+  <div metal:use-macro="cache: python: (request['LANGUAGE'], user.getId());
+                        context/main_template/macros/header" />
+
+The value of the expression before the last ``;`` is the key of the
+fragment, it has to cover everything the output depends on. Without a key
+the output is the same for all renderings of the using template. To cache
+the content of a slot, fill it by using a macro with a ``cache:``
+expression. Variables defined globally by a cached macro are not defined
+when its output comes from the cache.
+
+A fragment is stale once the using template or the template defining the
+macro is edited. `invalidate` removes the fragments of the macros used by
+or defined in a template.
+
+The fragments are stored in an OFS.Cache.Cache, by default a RAMCache
+whose entries expire after an hour. Use `setCache` to plug in another
+one (e.g. a FileCache shared by all processes).
+"""
+
+import threading
+
+from Acquisition import aq_base
+from chameleon.zpt.template import Macros
+from OFS.RAMCache import RAMCache
+
+_cache = RAMCache(max_entries=1000, max_bytes=0, max_age=3600)
+
+
+def getCache():
+    """Return the cache storing the fragments, or None."""
+    return _cache
+
+
+def setCache(cache):
+    """Store the fragments in the OFS.Cache.Cache `cache`, or do not cache
+    them if it is None.
+    """
+    global _cache
+    _cache = cache
+
+
+def invalidate(template=None):
+    """Remove the fragments of the macros used by or defined in `template`,
+    or all fragments.
+    """
+    cache = _cache
+    if cache is None:
+        return
+    if template is None:
+        cache.invalidateAll()
+        return
+    path = _templatePath(template)
+    users = _Fragments(path + (_USERS,))
+    paths = cache.ZCache_get(users, default=())
+    cache.ZCache_invalidate(users)
+    cache.ZCache_invalidate(_Fragments(path))
+    for user in paths:
+        cache.ZCache_invalidate(_Fragments(user))
+
+
+def sourceMacros(macros, template):
+    """Return `macros`, the macros of `template`, as macros telling the
+    fragment cache the template they are defined in.
+    """
+    if isinstance(macros, Macros):
+        return _Macros(macros, template)
+    return macros
+
+
+# The name below the path of a template under which the paths of the
+# templates using its macros are kept.
+_USERS = ' fragment users'
+
+_lock = threading.Lock()
+
+
+def _templatePath(template):
+    filename = getattr(aq_base(template), 'filename', None)
+    if filename:
+        return ('file', filename)
+    try:
+        return tuple(template.getPhysicalPath())
+    except Exception:
+        return ('template', repr(template))
+
+
+def _modTime(template):
+    if template is None:
+        return 0
+    template = aq_base(template)
+    mtime = getattr(template, '_p_mtime', None)
+    if mtime is None:
+        # A template file, read again when its file changed
+        mtime = getattr(template, '_v_last_read', None)
+    if not isinstance(mtime, (int, float)):
+        return 0
+    return mtime
+
+
+def _addUser(cache, source, path):
+    # Record that the fragments below `path` use a macro of `source`.
+    users = _Fragments(_templatePath(source) + (_USERS,))
+    with _lock:
+        paths = cache.ZCache_get(users, default=())
+        if path not in paths:
+            cache.ZCache_set(users, paths + (path,))
+
+
+class _Fragments(object):
+    # Stands for the fragments stored below `path` in the cache, those
+    # older than `mtime` are stale.
+
+    def __init__(self, path, mtime=0):
+        self.path = path
+        self.mtime = mtime
+
+    def getPhysicalPath(self):
+        return self.path
+
+    def ZCacheable_getModTime(self, mtime_func=None):
+        return self.mtime
+
+
+class _Macros(object):
+    # The macros of a template, see sourceMacros.
+
+    __slots__ = ('macros', 'template')
+
+    def __init__(self, macros, template):
+        self.macros = macros
+        self.template = template
+
+    def __getitem__(self, name):
+        return _Macro(self.macros[name].include, self.template)
+
+    @property
+    def names(self):
+        return self.macros.names
+
+
+class _Macro(object):
+    # A macro which knows the template it is defined in.
+
+    __slots__ = ('include', 'template')
+
+    def __init__(self, include, template):
+        self.include = include
+        self.template = template
+
+
+class CachedMacro(object):
+    """Macro taking its output from the fragment cache.
+
+    `expression` tells the place where it is used in the template apart.
+    """
+
+    __slots__ = ('macro', 'key', 'expression')
+
+    def __init__(self, macro, key, expression):
+        self.macro = macro
+        self.key = key
+        self.expression = expression
+
+    def include(self, stream, econtext, rcontext, *args):
+        cache = _cache
+        template = econtext.get('template')
+        if cache is None or template is None:
+            return self.macro.include(stream, econtext, rcontext, *args)
+        # The fragments are kept below the path of the using template,
+        # editing it or the template defining the macro makes them stale.
+        source = getattr(self.macro, 'template', None)
+        ob = _Fragments(_templatePath(template),
+                        max(_modTime(template), _modTime(source)))
+        keywords = {'key': self.key}
+        if source is not None:
+            keywords['macro'] = _templatePath(source)
+        fragment = cache.ZCache_get(ob, self.expression, keywords)
+        if fragment is not None:
+            stream.append(fragment)
+            return
+        # The filled slots write to the stream of the using template
+        # rather than to the one passed to the macro, so the output is
+        # taken from the end of that stream.
+        start = len(stream)
+        self.macro.include(stream, econtext, rcontext, *args)
+        fragment = u''.join(stream[start:])
+        cache.ZCache_set(ob, fragment, self.expression, keywords)
+        if source is not None:
+            _addUser(cache, source, ob.path)
@@ -0,0 +1,230 @@
+##############################################################################
+#
+# Copyright (c) 2017 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Cache of compiled page template programs in a directory, which is
+shared by all processes of an instance.
+"""
+
+from hashlib import sha1
+from logging import getLogger
+from threading import Lock
+import errno
+import marshal
+import os
+import re
+import tempfile
+import time
+
+import pkg_resources
+
+from App.Common import checkPrivateDirectory
+
+try:
+    from importlib.util import MAGIC_NUMBER
+except ImportError:  # Python 2
+    from imp import get_magic
+    MAGIC_NUMBER = get_magic()
+
+LOG = getLogger('Products.PageTemplates.programcache')
+
+# The cached programs depend on the code generating them.
+ENGINE_VERSION = ';'.join(
+    '%s=%s' % (name, pkg_resources.get_distribution(name).version)
+    for name in ('Chameleon', 'z3c.pt', 'Zope2'))
+
+_cache = None
+
+# The names of the files of the programs, see _Loader.
+_isProgram = re.compile(r'[0-9a-f]{16}-[0-9a-f]+\.py$').match
+
+
+def configure(directory, max_size=64 << 20):
+    """Cache the compiled programs in `directory`, using at most about
+    `max_size` bytes. Passing an empty directory disables the cache.
+    """
+    global _cache
+    if directory:
+        _cache = ProgramCache(directory, max_size)
+    else:
+        _cache = None
+
+
+def getLoader(expression_types):
+    """Return a Chameleon template loader for templates using the
+    expression types, or None if the cache is disabled.
+    """
+    cache = _cache
+    if cache is None:
+        return None
+    return cache.getLoader(expression_types)
+
+
+class ProgramCache(object):
+    """Compiled template programs, stored as marshalled code in the
+    files of `directory`.
+
+    Chameleon names the programs after a digest of the template source,
+    its builtins and the versions of the installed distributions. The
+    file names add the expression types and the engine version, as the
+    programs of secure and trusted templates differ.
+
+    The directory is created if it does not exist and must be owned by
+    the user of the process and not be writable by other users, as the
+    programs are executed. Only files named like programs are counted
+    and removed, other files in the directory are left alone.
+
+    Files are written to a temporary name and renamed, so processes never
+    read partial programs. Loading a program updates the modification
+    time of its file. When the files take more than `max_size` bytes,
+    the least recently used ones are removed until they take less than
+    90 percent of it. The size is checked after writing new programs,
+    at most every `check_interval` seconds unless this process has
+    written more than `max_size` bytes since the last check.
+    """
+
+    def __init__(self, directory, max_size=64 << 20, check_interval=60):
+        self.directory = directory
+        self.max_size = max_size
+        self.check_interval = check_interval
+        self._lock = Lock()
+        self._loaders = {}
+        self._last_check = 0
+        self._written = 0
+        checkPrivateDirectory(directory)
+        self.checkSize()
+
+    def getLoader(self, expression_types):
+        key = tuple(sorted(
+            (name, '%s.%s' % (factory.__module__, factory.__name__))
+            for name, factory in expression_types.items()))
+        try:
+            return self._loaders[key]
+        except KeyError:
+            pass
+        digest = sha1(repr((key, ENGINE_VERSION)).encode('utf-8'))
+        digest.update(MAGIC_NUMBER)
+        loader = self._loaders[key] = _Loader(self, digest.hexdigest()[:16])
+        return loader
+
+    def _path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def load(self, filename):
+        path = self._path(filename)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except (IOError, OSError):
+            return None
+        try:
+            if data[:len(MAGIC_NUMBER)] != MAGIC_NUMBER:
+                raise ValueError('Bad magic number')
+            code = marshal.loads(data[len(MAGIC_NUMBER):])
+        except (EOFError, TypeError, ValueError):
+            LOG.warning('Removing invalid compiled template %s', path)
+            self._unlink(path)
+            return None
+        try:
+            # Mark it as the most recently used one.
+            os.utime(path, None)
+        except OSError:
+            pass
+        env = {}
+        exec(code, env)
+        return env
+
+    def store(self, filename, source):
+        code = compile(source, filename, 'exec')
+        data = MAGIC_NUMBER + marshal.dumps(code)
+        try:
+            fd, tmp = tempfile.mkstemp(prefix='.', dir=self.directory)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.rename(tmp, self._path(filename))
+            finally:
+                self._unlink(tmp)
+        except (IOError, OSError):
+            LOG.warning('Cannot write compiled template %s', filename,
+                        exc_info=True)
+        else:
+            with self._lock:
+                self._written += len(data)
+                check = (self._written > self.max_size or
+                         time.time() - self._last_check >=
+                         self.check_interval)
+            if check:
+                self.checkSize()
+        env = {}
+        exec(code, env)
+        return env
+
+    def _unlink(self, path):
+        try:
+            os.unlink(path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+    def _files(self):
+        # (modification time, size, path) of all programs.
+        files = []
+        for name in os.listdir(self.directory):
+            if not _isProgram(name):
+                continue
+            path = self._path(name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        return files
+
+    def getSize(self):
+        """Return the number of bytes taken by the programs."""
+        return sum(size for mtime, size, path in self._files())
+
+    def checkSize(self):
+        """Remove the least recently used programs if they take more than
+        `max_size` bytes.
+        """
+        with self._lock:
+            self._last_check = time.time()
+            self._written = 0
+        if not self.max_size:
+            return
+        files = self._files()
+        size = sum(file_size for mtime, file_size, path in files)
+        if size <= self.max_size:
+            return
+        files.sort()
+        for mtime, file_size, path in files:
+            if size < self.max_size * 0.9:
+                break
+            self._unlink(path)
+            size -= file_size
+
+
+class _Loader(object):
+    """Chameleon template loader storing the programs of templates
+    with the same expression types in a ProgramCache.
+    """
+
+    def __init__(self, cache, prefix):
+        self.cache = cache
+        self.prefix = prefix
+
+    def get(self, filename):
+        return self.cache.load('%s-%s' % (self.prefix, filename))
+
+    def build(self, source, filename):
+        return self.cache.store('%s-%s' % (self.prefix, filename), source)
@@ -355,6 +355,96 @@ class ZopePageTemplateFileTests(ZopeTestCase):
         self.assertEqual('ATTR' in result, False)
 
 
+class ZPTCacheKeyTests(ZopeTestCase):
+
+    def afterSetUp(self):
+        from OFS.RAMCache import manage_addRAMCacheManager
+        manage_addRAMCacheManager(self.folder, 'cache')
+        manage_addPageTemplate(
+            self.folder, 'test',
+            text='<p tal:content="python: request.get(\'x\', \'\') + '
+                 'options.get(\'y\', \'\')"/>')
+        self.folder.test.ZCacheable_setManagerId('cache')
+
+    def beforeTearDown(self):
+        from OFS.RAMCache import caches
+        caches.clear()
+
+    def _render(self, x=None, **options):
+        self.app.REQUEST.other.pop('x', None)
+        if x is not None:
+            self.app.REQUEST.set('x', x)
+        return self.folder.test(**options).strip()
+
+    def _hits(self):
+        return self.folder.cache.getCacheStatistics()['hits']
+
+    def test_default_policy(self):
+        self.assertEqual(self._render(), '<p></p>')
+        self.assertEqual(self._render(), '<p></p>')
+        self.assertEqual(self._hits(), 1)
+        # The options are part of the key, the request is not
+        self.assertEqual(self._render(y='1'), '<p>1</p>')
+        self.assertEqual(self._render(x='2', y='1'), '<p>1</p>')
+        self.assertEqual(self._hits(), 2)
+
+    def test_request_keys(self):
+        self.folder.test.setCacheKeyPolicy(request_keys=['x', ''])
+        self.assertEqual(self.folder.test.getCacheKeyPolicy(), {
+            'request_keys': ('x',), 'option_keys': (),
+            'context': False, 'roles': False, 'user': False})
+        self.assertEqual(self._render('1'), '<p>1</p>')
+        self.assertEqual(self._render('2'), '<p>2</p>')
+        self.assertEqual(self._render('1'), '<p>1</p>')
+        self.assertEqual(self._hits(), 1)
+        # Options are not part of the key any longer
+        self.assertEqual(self._render('1', y='3'), '<p>1</p>')
+
+    def test_option_keys(self):
+        self.folder.test.setCacheKeyPolicy(option_keys=['y'])
+        self.assertEqual(self._render(y='1'), '<p>1</p>')
+        self.assertEqual(self._render(y='1', z='2'), '<p>1</p>')
+        self.assertEqual(self._render(y='2'), '<p>2</p>')
+        self.assertEqual(self._hits(), 1)
+
+    def test_context_and_user(self):
+        from AccessControl.SecurityManagement import newSecurityManager
+        from Testing.ZopeTestCase import user_name
+        self.folder.manage_addFolder('sub')
+        self.folder.test.setCacheKeyPolicy(context=True, roles=True)
+        self.folder.test()
+        self.folder.sub.test()
+        self.assertEqual(self._hits(), 0)
+        self.folder.sub.test()
+        self.assertEqual(self._hits(), 1)
+        # Another user with the same roles, the creator of sub is its owner
+        self.folder.acl_users.userFolderAddUser(
+            'other', 'secret', ['test_role_1_'], [])
+        self.folder.sub.manage_setLocalRoles('other', ['Owner'])
+        newSecurityManager(
+            None, self.folder.acl_users.getUser('other').__of__(
+                self.folder.acl_users))
+        self.folder.sub.test()
+        self.assertEqual(self._hits(), 2)
+        self.folder.test.setCacheKeyPolicy(context=True, user=True)
+        self.folder.sub.test()
+        self.login(user_name)
+        self.folder.sub.test()
+        self.assertEqual(self._hits(), 2)
+
+    def test_edit_policy_invalidates(self):
+        self._render()
+        self.folder.test.setCacheKeyPolicy(option_keys=['*'])
+        self._render()
+        self.assertEqual(self._hits(), 0)
+
+    def test_configHTML(self):
+        self.setRoles(['Manager'])
+        html = self.folder.test.ZCacheable_configHTML()
+        self.assertTrue('name="request_keys:lines"' in html)
+        self.assertTrue('setCacheKeyPolicy:method' in html)
+
+
 class PreferredCharsetUnicodeResolverTests(unittest.TestCase):
 
     def testPreferredCharsetResolverWithoutRequestAndWithoutEncoding(self):
@@ -539,5 +629,6 @@ def test_suite():
         unittest.makeSuite(ZopePageTemplateFileTests),
         unittest.makeSuite(ZPTUnicodeEncodingConflictResolution),
         unittest.makeSuite(PreferredCharsetUnicodeResolverTests),
+        unittest.makeSuite(ZPTCacheKeyTests),
         unittest.makeSuite(SrcTests),
     ))
@@ -1,10 +1,12 @@
 import os
 import unittest
 
+from OFS.SimpleItem import SimpleItem
 from Testing.ZopeTestCase import ZopeTestCase
 from Testing.ZopeTestCase.sandbox import Sandboxed
 
 path = os.path.dirname(__file__)
+_marker = object()
 
 
 class TestPatches(Sandboxed, ZopeTestCase):
@@ -76,7 +78,76 @@ class TestPatches(Sandboxed, ZopeTestCase):
         self.assertIn('world', template())
 
 
+class TraversalMemoTests(Sandboxed, ZopeTestCase):
+
+    def afterSetUp(self):
+        from Zope2.App import zcml
+        import Products.PageTemplates
+        zcml.load_config("configure.zcml", Products.PageTemplates)
+        self.folder._setObject('ob', CountingItem('ob'))
+
+    def _makeTraverser(self):
+        from Products.PageTemplates.expression import BoboAwareZopeTraverse
+        return BoboAwareZopeTraverse()
+
+    def test_memo(self):
+        traverser = self._makeTraverser()
+        econtext = {'request': None, '__traversal_memo': {}}
+        for i in range(3):
+            self.assertEqual(
+                traverser(self.folder, econtext, False, ['ob', 'title']),
+                'Counting')
+        self.assertEqual(self.folder.ob.traversals, 1)
+        # A different path
+        traverser(self.folder, econtext, False, ['ob', 'id'])
+        self.assertEqual(self.folder.ob.traversals, 2)
+
+    def test_memo_user(self):
+        from AccessControl.SecurityManagement import newSecurityManager
+        from AccessControl.SpecialUsers import system
+        traverser = self._makeTraverser()
+        econtext = {'request': None, '__traversal_memo': {}}
+        traverser(self.folder, econtext, False, ['ob', 'title'])
+        newSecurityManager(None, system)
+        traverser(self.folder, econtext, False, ['ob', 'title'])
+        self.assertEqual(self.folder.ob.traversals, 2)
+
+    def test_no_memo(self):
+        traverser = self._makeTraverser()
+        econtext = {'request': None}
+        for i in range(3):
+            traverser(self.folder, econtext, False, ['ob', 'title'])
+        self.assertEqual(self.folder.ob.traversals, 3)
+
+    def test_render(self):
+        from Products.PageTemplates.ZopePageTemplate import \
+            manage_addPageTemplate
+        template = manage_addPageTemplate(
+            self.folder, 'test',
+            text='<p tal:repeat="i python: range(3)"'
+                 ' tal:content="here/ob/title" />')
+        template = template.__of__(self.folder)
+        self.assertEqual(template().count('<p>Counting</p>'), 3)
+        self.assertEqual(self.folder.ob.traversals, 1)
+        # Every rendering starts with an empty memo
+        template()
+        self.assertEqual(self.folder.ob.traversals, 2)
+
+
+class CountingItem(SimpleItem):
+
+    title = 'Counting'
+    traversals = 0
+
+    def restrictedTraverse(self, path, default=_marker):
+        self.traversals += 1
+        if default is _marker:
+            return SimpleItem.restrictedTraverse(self, path)
+        return SimpleItem.restrictedTraverse(self, path, default)
+
+
 def test_suite():
     return unittest.TestSuite((
         unittest.makeSuite(TestPatches),
+        unittest.makeSuite(TraversalMemoTests),
     ))
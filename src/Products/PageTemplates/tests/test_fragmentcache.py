@@ -0,0 +1,167 @@
+import unittest
+
+from Testing.ZopeTestCase import ZopeTestCase
+from Testing.ZopeTestCase.sandbox import Sandboxed
+
+MACROS = '''\
+<div metal:define-macro="header"
+     tal:content="request/n">n</div>
+<div metal:define-macro="layout">
+  <p tal:content="request/n">n</p>
+  <metal:slot define-slot="main">main</metal:slot>
+</div>
+'''
+
+
+class FragmentCacheTests(Sandboxed, ZopeTestCase):
+
+    def afterSetUp(self):
+        from Zope2.App import zcml
+        import Products.PageTemplates
+        from Products.PageTemplates import fragmentcache
+        from Products.PageTemplates.ZopePageTemplate import \
+            manage_addPageTemplate
+        from OFS.RAMCache import RAMCache
+        zcml.load_config("configure.zcml", Products.PageTemplates)
+        self._old_cache = fragmentcache.getCache()
+        fragmentcache.setCache(RAMCache())
+        manage_addPageTemplate(self.folder, 'macros', text=MACROS)
+
+    def beforeTearDown(self):
+        from Products.PageTemplates import fragmentcache
+        fragmentcache.setCache(self._old_cache)
+
+    def _addTemplate(self, text):
+        from Products.PageTemplates.ZopePageTemplate import \
+            manage_addPageTemplate
+        return manage_addPageTemplate(self.folder, 'test', text=text)
+
+    def _render(self, n, **form):
+        request = self.app.REQUEST
+        request.set('n', n)
+        for name, value in form.items():
+            request.set(name, value)
+        return self.folder.test().strip()
+
+    def test_no_key(self):
+        from Products.PageTemplates import fragmentcache
+        self._addTemplate(
+            '<div metal:use-macro="cache: here/macros/macros/header" />')
+        self.assertEqual(self._render('1'), '<div>1</div>')
+        self.assertEqual(self._render('2'), '<div>1</div>')
+        stats = fragmentcache.getCache().getStatistics()
+        self.assertEqual(stats['hits'], 1)
+        # The fragment and the record of the templates using the macros
+        self.assertEqual(stats['entries'], 2)
+
+    def test_key(self):
+        self._addTemplate(
+            '<div metal:use-macro="cache: request/lang;'
+            ' here/macros/macros/header" />')
+        self.assertEqual(self._render('1', lang='en'), '<div>1</div>')
+        self.assertEqual(self._render('2', lang='de'), '<div>2</div>')
+        self.assertEqual(self._render('3', lang='en'), '<div>1</div>')
+
+    def test_python_key(self):
+        self._addTemplate(
+            '<div metal:use-macro="cache: python: request[\'lang\'][:2];'
+            ' here/macros/macros/header" />')
+        self.assertEqual(self._render('1', lang='en-us'), '<div>1</div>')
+        self.assertEqual(self._render('2', lang='en-gb'), '<div>1</div>')
+
+    def test_slots(self):
+        self._addTemplate(
+            '<div metal:use-macro="cache: here/macros/macros/layout">'
+            '<b metal:fill-slot="main" tal:content="request/n">x</b>'
+            '</div>')
+        first = self._render('1')
+        self.assertTrue('<p>1</p>' in first)
+        self.assertTrue('<b>1</b>' in first)
+        self.assertEqual(self._render('2'), first)
+
+    def test_invalidate(self):
+        from Products.PageTemplates import fragmentcache
+        self._addTemplate(
+            '<div metal:use-macro="cache: here/macros/macros/header" />')
+        self._render('1')
+        fragmentcache.invalidate(self.folder.test)
+        self.assertEqual(self._render('2'), '<div>2</div>')
+        fragmentcache.invalidate(self.folder.macros)
+        self.assertEqual(self._render('3'), '<div>3</div>')
+        fragmentcache.invalidate()
+        self.assertEqual(self._render('4'), '<div>4</div>')
+
+    def test_invalidate_macros(self):
+        from Products.PageTemplates import fragmentcache
+        from Products.PageTemplates.ZopePageTemplate import \
+            manage_addPageTemplate
+        self._addTemplate(
+            '<div metal:use-macro="cache: here/macros/macros/header" />')
+        manage_addPageTemplate(
+            self.folder, 'other', text=MACROS.replace('div', 'span'))
+        manage_addPageTemplate(
+            self.folder, 'test2',
+            text='<div metal:use-macro="cache: here/other/macros/header" />')
+        self._render('1')
+        self.assertEqual(self.folder.test2().strip(), '<span>1</span>')
+        fragmentcache.invalidate(self.folder.macros)
+        self.assertEqual(self._render('2'), '<div>2</div>')
+        self.assertEqual(self.folder.test2().strip(), '<span>1</span>')
+
+    def test_edit_macros(self):
+        import transaction
+        self._addTemplate(
+            '<div metal:use-macro="cache: here/macros/macros/header" />')
+        transaction.commit()
+        self.assertEqual(self._render('1'), '<div>1</div>')
+        self.folder.macros.pt_edit(MACROS.replace('div', 'span'),
+                                   'text/html')
+        transaction.commit()
+        self.assertEqual(self._render('2'), '<span>2</span>')
+        self.assertEqual(self._render('3'), '<span>2</span>')
+
+    def test_acquired_macros(self):
+        # The same expression finds the macros of another template here
+        from OFS.Folder import manage_addFolder
+        from Products.PageTemplates.ZopePageTemplate import \
+            manage_addPageTemplate
+        self._addTemplate(
+            '<div metal:use-macro="cache: here/macros/macros/header" />')
+        manage_addFolder(self.folder, 'sub')
+        manage_addPageTemplate(
+            self.folder.sub, 'macros', text=MACROS.replace('div', 'span'))
+        self.assertEqual(self._render('1'), '<div>1</div>')
+        self.assertEqual(self.folder.sub.test().strip(), '<span>1</span>')
+        self.app.REQUEST.set('n', '2')
+        self.assertEqual(self.folder.sub.test().strip(), '<span>1</span>')
+
+    def test_disabled(self):
+        from Products.PageTemplates import fragmentcache
+        fragmentcache.setCache(None)
+        self._addTemplate(
+            '<div metal:use-macro="cache: here/macros/macros/header" />')
+        self.assertEqual(self._render('1'), '<div>1</div>')
+        self.assertEqual(self._render('2'), '<div>2</div>')
+
+    def test_template_file(self):
+        import os
+        import shutil
+        import tempfile
+        from Products.PageTemplates.PageTemplateFile import PageTemplateFile
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'cache.pt')
+        with open(path, 'w') as f:
+            f.write('<div metal:use-macro="cache: here/macros/macros/header"'
+                    ' />')
+        try:
+            template = PageTemplateFile(path).__of__(self.folder)
+            self.app.REQUEST.set('n', '1')
+            self.assertEqual(template().strip(), '<div>1</div>')
+            self.app.REQUEST.set('n', '2')
+            self.assertEqual(template().strip(), '<div>1</div>')
+        finally:
+            shutil.rmtree(directory)
+
+
+def test_suite():
+    return unittest.defaultTestLoader.loadTestsFromName(__name__)
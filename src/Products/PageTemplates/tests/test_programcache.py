@@ -0,0 +1,141 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class ProgramCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _makeOne(self, **kw):
+        from Products.PageTemplates.programcache import ProgramCache
+        return ProgramCache(self.directory, **kw)
+
+    def test_store_load(self):
+        cache = self._makeOne()
+        self.assertEqual(cache.load('program.py'), None)
+        env = cache.store('program.py', 'def initialize():\n    return 42\n')
+        self.assertEqual(env['initialize'](), 42)
+        self.assertEqual(os.listdir(self.directory), ['program.py'])
+        # Another process using the directory
+        env = self._makeOne().load('program.py')
+        self.assertEqual(env['initialize'](), 42)
+
+    def test_invalid(self):
+        cache = self._makeOne()
+        with open(os.path.join(self.directory, 'program.py'), 'wb') as f:
+            f.write(b'garbage')
+        self.assertEqual(cache.load('program.py'), None)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_loaders(self):
+        from Products.PageTemplates.engine import Program
+        cache = self._makeOne()
+        secure = cache.getLoader(Program.secure_expression_types)
+        trusted = cache.getLoader(Program.expression_types)
+        self.assertTrue(
+            secure is cache.getLoader(Program.secure_expression_types))
+        self.assertNotEqual(secure.prefix, trusted.prefix)
+        secure.build('x = 1\n', 'program.py')
+        self.assertEqual(trusted.get('program.py'), None)
+        self.assertEqual(secure.get('program.py')['x'], 1)
+
+    def _name(self, i):
+        # As named by the loaders
+        return '0123456789abcdef-%d.py' % i
+
+    def test_max_size(self):
+        source = 'x = %r\n' % ('x' * 300)
+        self._makeOne().store(self._name(9), source)
+        path = os.path.join(self.directory, self._name(9))
+        size = os.path.getsize(path)
+        os.unlink(path)
+        cache = self._makeOne(max_size=size * 5 // 2, check_interval=0)
+        for i in range(2):
+            cache.store(self._name(i), source)
+            os.utime(os.path.join(self.directory, self._name(i)), (i, i))
+        # Loading the oldest one makes it the most recently used one.
+        cache.load(self._name(0))
+        cache.store(self._name(2), source)
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         [self._name(0), self._name(2)])
+        self.assertTrue(cache.getSize() <= size * 5 // 2)
+
+    def test_other_files_kept(self):
+        for name in ('Data.fs', 'event.log'):
+            with open(os.path.join(self.directory, name), 'wb') as f:
+                f.write(b'x' * 100)
+        cache = self._makeOne(max_size=5, check_interval=0)
+        cache.store(self._name(0), 'x = 1\n')
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ['Data.fs', 'event.log'])
+        self.assertEqual(cache.getSize(), 0)
+
+    def test_directory(self):
+        import stat
+        from Products.PageTemplates.programcache import ProgramCache
+        directory = os.path.join(self.directory, 'templates')
+        ProgramCache(directory)
+        mode = stat.S_IMODE(os.stat(directory).st_mode)
+        self.assertEqual(mode & 0o077, 0)
+        os.chmod(directory, 0o775)
+        with self.assertRaises(ValueError):
+            ProgramCache(directory)
+        os.chmod(directory, 0o700)
+        if hasattr(os, 'getuid'):
+            # Owned by another user
+            getuid = os.getuid
+            os.getuid = lambda: getuid() + 1
+            try:
+                with self.assertRaises(ValueError):
+                    ProgramCache(directory)
+            finally:
+                os.getuid = getuid
+
+
+class CookTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        from Products.PageTemplates import programcache
+        programcache.configure(None)
+        shutil.rmtree(self.directory)
+
+    def _cook(self, text, engine=None):
+        from Products.PageTemplates.engine import Program
+        from Products.PageTemplates.Expressions import getEngine
+        if engine is None:
+            engine = getEngine()
+        return Program.cook(None, text, engine, 'text/html')
+
+    def test_shared(self):
+        from Products.PageTemplates import programcache
+        programcache.configure(self.directory)
+        text = '<p tal:content="python: 6 * 7">x</p>'
+        program, macros = self._cook(text)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+        # Trusted templates are compiled differently
+        self._cook(text, engine=object())
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+        # Another process finds the compiled program
+        programcache.configure(self.directory)
+        cache = programcache._cache
+
+        def store(filename, source):
+            self.fail('compiled again')
+        cache.store = store
+        program, macros = self._cook(text)
+        self.assertEqual(program.template.render(), '<p>42</p>')
+
+    def test_disabled(self):
+        program, macros = self._cook('<p>x</p>')
+        self.assertEqual(program.template.render(), '<p>x</p>')
+        self.assertEqual(os.listdir(self.directory), [])
@@ -13,6 +13,7 @@
 """ Basic ZPublisher request management.
 """
 
+from time import time
 import types
 
 from AccessControl.ZopeSecurityPolicy import getRoles
@@ -24,6 +25,7 @@ from six.moves.urllib.parse import quote as urllib_quote
 from zExceptions import Forbidden
 from zExceptions import NotFound
 from zope.component import queryMultiAdapter
+from zope.component import queryUtility
 from zope.event import notify
 from zope.interface import implementer
 from zope.interface import Interface
@@ -37,6 +39,7 @@ from zope.traversing.namespace import namespaceLookup
 from zope.traversing.namespace import nsParse
 
 from ZPublisher.Converters import type_converters
+from ZPublisher.interfaces import IValidationCache
 from ZPublisher.interfaces import UseTraversalDefault
 
 HAS_ZSERVER = True
@@ -54,6 +57,69 @@ _marker = []
 UNSPECIFIED_ROLES = ''
 
 
+# Traversal hooks whose presence is cached per class, see _getHook.
+_TRAVERSAL_HOOKS = (
+    '__before_publishing_traverse__',
+    '__bobo_traverse__',
+    '__of__',
+    '__allow_groups__',
+    '__browser_default__',
+)
+_hook_cache = {}
+
+
+def clearTraversalCache():
+    """Forget the cached traversal hooks.
+
+    Needed after hooks are added to or removed from classes at runtime.
+    """
+    _hook_cache.clear()
+
+
+def _classHooks(klass):
+    try:
+        return _hook_cache[klass]
+    except KeyError:
+        pass
+    if hasattr(klass, '__getattr__'):
+        # The hooks may be computed per instance, so we cannot tell.
+        hooks = None
+    else:
+        hooks = frozenset(
+            name for name in _TRAVERSAL_HOOKS if hasattr(klass, name))
+    _hook_cache[klass] = hooks
+    return hooks
+
+
+def _getHook(ob, name, default=None):
+    """Return the traversal hook ``name`` of ``ob`` or ``default``.
+
+    Hooks are never acquired, so unless the class of the unwrapped
+    object defines the hook, only its instance dictionary needs to be
+    looked at.
+    """
+    base = aq_base(ob)
+    if name == '__of__' and base is not ob:
+        # Acquisition wrappers always provide __of__
+        return ob.__of__
+    hooks = _classHooks(getattr(base, '__class__', type(base)))
+    if hooks is None or name in hooks:
+        return getattr(ob, name, default)
+    if getattr(base, '_p_changed', False) is None:
+        base._p_activate()
+    try:
+        found = name in base.__dict__
+    except (AttributeError, TypeError):
+        found = False
+    if found:
+        return getattr(ob, name, default)
+    return default
+
+
+def _hasHook(ob, name):
+    return _getHook(ob, name, _marker) is not _marker
+
+
 def quote(text):
     # quote url path segments, but leave + and @ intact
     return urllib_quote(text, '/+@')
@@ -87,9 +153,10 @@ class DefaultPublishTraverse(object):
 
         subobject = UseTraversalDefault  # indicator
         try:
-            if hasattr(object, '__bobo_traverse__'):
+            bobo_traverse = _getHook(object, '__bobo_traverse__')
+            if bobo_traverse is not None:
                 try:
-                    subobject = object.__bobo_traverse__(request, name)
+                    subobject = bobo_traverse(request, name)
                     if isinstance(subobject, tuple) and len(subobject) > 1:
                         # Add additional parents into the path
                         # XXX There are no tests for this:
@@ -165,8 +232,9 @@ class DefaultPublishTraverse(object):
         return subobject
 
     def browserDefault(self, request):
-        if hasattr(self.context, '__browser_default__'):
-            return self.context.__browser_default__(request)
+        browser_default = _getHook(self.context, '__browser_default__')
+        if browser_default is not None:
+            return browser_default(request)
         # Zope 3.2 still uses IDefaultView name when it
         # registeres default views, even though it's
         # deprecated. So we handle that here:
@@ -193,6 +261,14 @@ class BaseRequest(object):
 
     maybe_webdav_client = HAS_ZSERVER
 
+    # Set to record the time spent on each traversal step as a list
+    # of (name, seconds) in TraversalTimings.
+    collect_traversal_timings = False
+
+    # The ZPublisher.timing.RequestTimer recording the time spent in
+    # the phases of publishing, if timing is enabled.
+    publish_timer = None
+
     # While the following assignment is not strictly necessary, it
     # prevents alot of unnecessary searches because, without it,
     # acquisition of REQUEST is disallowed, which penalizes access
@@ -416,9 +492,10 @@ class BaseRequest(object):
 
         # if the top object has a __bobo_traverse__ method, then use it
         # to possibly traverse to an alternate top-level object.
-        if hasattr(object, '__bobo_traverse__'):
+        bobo_traverse = _getHook(object, '__bobo_traverse__')
+        if bobo_traverse is not None:
             try:
-                object = object.__bobo_traverse__(request)
+                object = bobo_traverse(request)
                 self.roles = getRoles(None, None, object, UNSPECIFIED_ROLES)
             except Exception:
                 pass
@@ -427,7 +504,7 @@ class BaseRequest(object):
             return response.forbiddenError(self['URL'])
 
         # Traverse the URL to find the object:
-        if hasattr(object, '__of__'):
+        if _hasHook(object, '__of__'):
             # Try to bind the top-level object to the request
             # This is how you get 'self.REQUEST'
             object = object.__of__(RequestContainer(REQUEST=request))
@@ -443,6 +520,12 @@ class BaseRequest(object):
         # Set the posttraverse for duration of the traversal here
         self._post_traverse = post_traverse = []
 
+        if self.collect_traversal_timings:
+            request['TraversalTimings'] = timings = []
+            started = time()
+        else:
+            timings = None
+
         # import time ordering problem
         try:
             from webdav.NullResource import NullResource
@@ -454,7 +537,7 @@ class BaseRequest(object):
             # We build parents in the wrong order, so we
             # need to make sure we reverse it when we're done.
             while 1:
-                bpth = getattr(object, '__before_publishing_traverse__', None)
+                bpth = _getHook(object, '__before_publishing_traverse__')
                 if bpth is not None:
                     bpth(object, self)
 
@@ -475,7 +558,7 @@ class BaseRequest(object):
                     # be given if it doesn't exist:
                     if (NullResource is not None and no_acquire_flag and
                             hasattr(object, 'aq_base') and
-                            not hasattr(object, '__bobo_traverse__')):
+                            not _hasHook(object, '__bobo_traverse__')):
 
                         if (object.__parent__ is not
                                 aq_inner(object).__parent__):
@@ -524,7 +607,7 @@ class BaseRequest(object):
 
                 try:
                     subobject = self.traverseName(object, entry_name)
-                    if (hasattr(object, '__bobo_traverse__') or
+                    if (_hasHook(object, '__bobo_traverse__') or
                             hasattr(object, entry_name)):
                         check_name = entry_name
                     else:
@@ -550,6 +633,11 @@ class BaseRequest(object):
                 parents.append(object)
 
                 steps.append(entry_name)
+
+                if timings is not None:
+                    now = time()
+                    timings.append((entry_name, now - started))
+                    started = now
         finally:
             parents.reverse()
 
@@ -564,7 +652,7 @@ class BaseRequest(object):
         # existing object :(
         if (no_acquire_flag and
                 hasattr(parents[1], 'aq_base') and
-                not hasattr(parents[1], '__bobo_traverse__')):
+                not _hasHook(parents[1], '__bobo_traverse__')):
             base = aq_base(parents[1])
             if not hasattr(base, entry_name):
                 try:
@@ -585,14 +673,14 @@ class BaseRequest(object):
         if 1:  # Always perform authentication.
 
             last_parent_index = len(parents)
-            if hasattr(object, '__allow_groups__'):
-                groups = object.__allow_groups__
+            groups = _getHook(object, '__allow_groups__', _marker)
+            if groups is not _marker:
                 inext = 0
             else:
                 inext = None
                 for i in range(last_parent_index):
-                    if hasattr(parents[i], '__allow_groups__'):
-                        groups = parents[i].__allow_groups__
+                    groups = _getHook(parents[i], '__allow_groups__', _marker)
+                    if groups is not _marker:
                         inext = i + 1
                         break
 
@@ -628,17 +716,15 @@ class BaseRequest(object):
 
                 if v is old_validation:
                     user = old_validation(groups, request, auth, self.roles)
-                elif self.roles is UNSPECIFIED_ROLES:
-                    user = v(request, auth)
                 else:
-                    user = v(request, auth, self.roles)
+                    user = cached_validation(
+                        groups, v, request, auth, self.roles)
 
                 while user is None and i < last_parent_index:
                     parent = parents[i]
                     i = i + 1
-                    if hasattr(parent, '__allow_groups__'):
-                        groups = parent.__allow_groups__
-                    else:
+                    groups = _getHook(parent, '__allow_groups__', _marker)
+                    if groups is _marker:
                         continue
                     if hasattr(groups, 'validate'):
                         v = groups.validate
@@ -647,10 +733,9 @@ class BaseRequest(object):
                     if v is old_validation:
                         user = old_validation(
                             groups, request, auth, self.roles)
-                    elif self.roles is UNSPECIFIED_ROLES:
-                        user = v(request, auth)
                     else:
-                        user = v(request, auth, self.roles)
+                        user = cached_validation(
+                            groups, v, request, auth, self.roles)
 
             if user is None and self.roles != UNSPECIFIED_ROLES:
                 response.unauthorized()
@@ -710,6 +795,26 @@ def exec_callables(callables):
             return result
 
 
+def cached_validation(groups, validate, request, auth,
+                      roles=UNSPECIFIED_ROLES):
+    # Call the validate method of a user folder, consulting the
+    # IValidationCache utility first if there is one.
+    cache = queryUtility(IValidationCache)
+    if cache is not None:
+        user = cache.lookup(request, groups, roles)
+        if user is not None:
+            return user
+
+    if roles is UNSPECIFIED_ROLES:
+        user = validate(request, auth)
+    else:
+        user = validate(request, auth, roles)
+
+    if cache is not None and user is not None:
+        cache.store(request, groups, roles, user)
+    return user
+
+
 def old_validation(groups, request, auth,
                    roles=UNSPECIFIED_ROLES):
 
@@ -17,6 +17,8 @@
 import base64
 from cgi import escape
 from cgi import FieldStorage
+from cgi import MiniFieldStorage
+from cgi import parse_header
 import codecs
 from copy import deepcopy
 import os
@@ -27,12 +29,14 @@ import re
 import sys
 from tempfile import (
     mkstemp,
+    SpooledTemporaryFile,
     _TemporaryFileWrapper,
 )
 import time
 
 from AccessControl.tainted import TaintedString
 import pkg_resources
+from six.moves.urllib.parse import parse_qsl
 from six.moves.urllib.parse import unquote
 from zope.i18n.interfaces import IUserPreferredLanguages
 from zope.i18n.locales import locales, LoadLocaleError
@@ -118,6 +122,14 @@ _marker = []
 
 trusted_proxies = []
 
+# The lazy-form-parsing configuration setting: if true, multipart request
+# bodies are only parsed once the form of the request is first used.
+lazy_form_parsing = False
+
+# The body-memory-limit configuration setting: request bodies which are
+# not form data are kept in memory up to this size, and on disk beyond.
+body_memory_limit = 1 << 20
+
 
 class NestedLoopExit(Exception):
     pass
@@ -180,6 +192,18 @@ class HTTPRequest(BaseRequest):
     args = ()
     _file = None
     _urls = ()
+    _deferred_inputs = None
+    _parsing_deferred = False
+    _decode_deferred = False
+
+    # Content types of request bodies holding form data, mapped to the
+    # names of the methods returning their fields. A type 'major/*'
+    # applies to all minor types. Other bodies are not parsed but made
+    # available as BODY and BODYFILE.
+    form_parsers = {
+        'application/x-www-form-urlencoded': '_readUrlencoded',
+        'multipart/*': '_readMultipart',
+    }
 
     retry_max_count = 0
 
@@ -202,7 +226,8 @@ class HTTPRequest(BaseRequest):
         # removing tempfiles.
         self.stdin = None
         self._file = None
-        self.form.clear()
+        self._deferred_inputs = None
+        self._form.clear()
         # we want to clear the lazy dict here because BaseRequests don't have
         # one.  Without this, there's the possibility of memory leaking
         # after every request.
@@ -495,9 +520,9 @@ class HTTPRequest(BaseRequest):
         else:
             fp = None
 
-        form = self.form
+        form = self._form
         other = self.other
-        taintedform = self.taintedform
+        taintedform = self._taintedform
 
         # If 'QUERY_STRING' is not present in environ
         # FieldStorage will try to get it from sys.argv[1]
@@ -506,23 +531,36 @@ class HTTPRequest(BaseRequest):
             environ['QUERY_STRING'] = ''
 
         meth = None
-        fs = ZopeFieldStorage(fp=fp, environ=environ, keep_blank_values=1)
-        if not hasattr(fs, 'list') or fs.list is None:
-            if 'HTTP_SOAPACTION' in environ:
+        fslist = None
+        if fp is None or method == 'HEAD':
+            fslist = _parse_urlencoded(environ['QUERY_STRING'])
+        else:
+            if 'CONTENT_TYPE' in environ:
+                ctype = parse_header(environ['CONTENT_TYPE'])[0]
+            elif method == 'POST':
+                ctype = 'application/x-www-form-urlencoded'
+            else:
+                ctype = 'text/plain'
+            parser = self.form_parsers.get(ctype)
+            if parser is None:
+                parser = self.form_parsers.get(ctype.split('/')[0] + '/*')
+            if parser is not None:
+                fslist = getattr(self, parser)(fp, environ)
+            elif 'HTTP_SOAPACTION' in environ:
                 # Stash XML request for interpretation by a SOAP-aware view
-                other['SOAPXML'] = fs.value
+                other['SOAPXML'] = _body_file(fp, environ).read()
             elif (xmlrpc is not None and method == 'POST' and
-                  ('content-type' in fs.headers and
-                   'text/xml' in fs.headers['content-type'])):
+                  'text/xml' in environ.get('CONTENT_TYPE', '')):
                 # Ye haaa, XML-RPC!
-                meth, self.args = xmlrpc.parse_input(fs.value)
+                meth, self.args = xmlrpc.parse_input(
+                    _body_file(fp, environ).read())
                 response = xmlrpc.response(response)
                 other['RESPONSE'] = self.response = response
                 self.maybe_webdav_client = 0
             else:
-                self._file = fs.file
-        else:
-            fslist = fs.list
+                self._file = _body_file(fp, environ)
+
+        if fslist is not None:
             tuple_items = {}
             lt = type([])
             CGI_name = isCGI_NAMEs
@@ -1151,7 +1189,7 @@ class HTTPRequest(BaseRequest):
                             tainted = tuple(taintedform[tainted_key])
                             taintedform[tainted_key] = tainted
 
-        if meth:
+        if meth and not self._parsing_deferred:
             if 'PATH_INFO' in environ:
                 path = environ['PATH_INFO']
                 while path[-1:] == '/':
@@ -1164,8 +1202,67 @@ class HTTPRequest(BaseRequest):
     def postProcessInputs(self):
         """Process the values in request.form to decode strings to unicode.
         """
-        for name, value in self.form.items():
-            self.form[name] = _decode(value, default_encoding)
+        if self._deferred_inputs is not None:
+            # Decode the form once it has been parsed
+            self._decode_deferred = True
+            return
+        for name, value in self._form.items():
+            self._form[name] = _decode(value, default_encoding)
+
+    def _readUrlencoded(self, fp, environ):
+        return _read_urlencoded(fp, environ)
+
+    def _readMultipart(self, fp, environ):
+        if self._parsing_deferred:
+            fp = self._file
+        elif lazy_form_parsing:
+            # Only parse the query string now, the body is parsed when
+            # the form is first used. Until then it can be read once
+            # from BODYFILE, straight from the input stream.
+            self._file = self._deferred_inputs = _body_file(
+                fp, environ, spool=False)
+            return _parse_urlencoded(environ['QUERY_STRING'])
+        fs = ZopeFieldStorage(fp=fp, environ=environ, keep_blank_values=1)
+        return fs.list
+
+    def _processDeferredInputs(self):
+        # Parse the request body whose parsing processInputs deferred.
+        # Fields setting a :method can no longer change the path here.
+        body = self._deferred_inputs
+        self._deferred_inputs = None
+        if not body.tell():
+            self._form.clear()
+            self._taintedform.clear()
+            self._parsing_deferred = True
+            try:
+                self.processInputs()
+            finally:
+                self._parsing_deferred = False
+        # Otherwise the body has been read from BODYFILE, only the
+        # fields of the query string are left.
+        self._file = None
+        if self._decode_deferred:
+            self.postProcessInputs()
+
+    @property
+    def form(self):
+        if self._deferred_inputs is not None:
+            self._processDeferredInputs()
+        return self._form
+
+    @form.setter
+    def form(self, value):
+        self._form = value
+
+    @property
+    def taintedform(self):
+        if self._deferred_inputs is not None:
+            self._processDeferredInputs()
+        return self._taintedform
+
+    @taintedform.setter
+    def taintedform(self, value):
+        self._taintedform = value
 
     def resolve_url(self, url):
         # Attempt to resolve a url into an object in the Zope
@@ -1327,7 +1424,8 @@ class HTTPRequest(BaseRequest):
                     self._urls = self._urls + (key,)
                 return URL
 
-            if key == 'BODY' and self._file is not None:
+            if (key == 'BODY' and self._file is not None and
+                    self._file is not self._deferred_inputs):
                 p = self._file.tell()
                 self._file.seek(0)
                 v = self._file.read()
@@ -1633,6 +1731,163 @@ class TemporaryFileWrapper(_TemporaryFileWrapper):
             self.unlink(self.name)
 
 
+def _parse_urlencoded(qs):
+    return [MiniFieldStorage(key, value)
+            for key, value in parse_qsl(qs, keep_blank_values=1)]
+
+
+def _content_length(environ):
+    try:
+        return int(environ.get('CONTENT_LENGTH', -1))
+    except ValueError:
+        return -1
+
+
+def _body_file(fp, environ, spool=True):
+    return BodyFile(fp, _content_length(environ), body_memory_limit, spool)
+
+
+def _read_urlencoded(fp, environ):
+    # Same as FieldStorage.read_urlencoded, without building the
+    # FieldStorage.
+    qs = fp.read(_content_length(environ))
+    if not isinstance(qs, str):
+        qs = qs.decode(default_encoding)
+    if environ['QUERY_STRING']:
+        qs += '&' + environ['QUERY_STRING']
+    return _parse_urlencoded(qs)
+
+
+class BodyFile(object):
+    """Read-only file holding a request body.
+
+    The body is only read from the input stream when it is read from
+    this file, up to ``length`` bytes if that is not negative. Unless
+    ``spool`` is false, what has been read is kept, in memory up to
+    ``max_memory`` bytes and in a temporary file beyond, so that the file
+    can be rewound. Otherwise the file can only be read once.
+    """
+
+    _blocksize = 1 << 16
+
+    def __init__(self, fp, length=-1, max_memory=1 << 20, spool=True):
+        self._fp = fp
+        self._remaining = length
+        if spool:
+            self._spool = SpooledTemporaryFile(max_size=max_memory)
+        else:
+            self._spool = None
+        self._size = 0
+        self._pos = 0
+
+    def _readInput(self, size):
+        # Read at most `size` bytes from the input (if size is positive).
+        if self._remaining > 0:
+            size = min(size, self._remaining)
+        data = self._fp.read(size)
+        if not data:
+            self._remaining = 0
+        elif self._remaining > 0:
+            self._remaining -= len(data)
+        return data
+
+    def _fill(self, size):
+        # Read from the input until `size` bytes (all if negative)
+        # have been spooled.
+        spool = self._spool
+        spool.seek(0, 2)
+        while self._remaining and (size < 0 or self._size < size):
+            n = self._blocksize if size < 0 else size - self._size
+            data = self._readInput(n)
+            spool.write(data)
+            self._size += len(data)
+
+    def _readUnspooled(self, size):
+        chunks = []
+        while self._remaining and size:
+            n = self._blocksize if size < 0 else size
+            data = self._readInput(n)
+            chunks.append(data)
+            self._pos += len(data)
+            if size > 0:
+                size -= len(data)
+        return b''.join(chunks)
+
+    def read(self, size=-1):
+        if self._spool is None:
+            return self._readUnspooled(-1 if size is None else size)
+        if size is None or size < 0:
+            self._fill(-1)
+        else:
+            self._fill(self._pos + size)
+        self._spool.seek(self._pos)
+        data = self._spool.read() if size is None else self._spool.read(size)
+        self._pos += len(data)
+        return data
+
+    def readline(self, size=-1):
+        if size is None:
+            size = -1
+        if self._spool is None:
+            if not self._remaining:
+                return b''
+            if size < 0 or 0 < self._remaining < size:
+                size = self._remaining
+            line = self._fp.readline(size)
+            if not line:
+                self._remaining = 0
+            elif self._remaining > 0:
+                self._remaining -= len(line)
+            self._pos += len(line)
+            return line
+        while True:
+            self._spool.seek(self._pos)
+            line = self._spool.readline(size)
+            if (line.endswith(b'\n') or 0 <= size <= len(line) or
+                    not self._remaining):
+                break
+            self._fill(self._size + self._blocksize)
+        self._pos += len(line)
+        return line
+
+    def readlines(self, sizehint=-1):
+        return list(self)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+    next = __next__
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            self._fill(-1)
+            offset += self._size
+        if offset < 0:
+            raise IOError('Invalid offset: %s' % offset)
+        if self._spool is None:
+            if offset < self._pos:
+                raise IOError('Cannot seek back in an unspooled body')
+            self._readUnspooled(offset - self._pos)
+            return
+        self._fill(offset)
+        self._pos = min(offset, self._size)
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        if self._spool is not None:
+            self._spool.close()
+
+
 class ZopeFieldStorage(FieldStorage):
 
     def make_file(self, binary=None):
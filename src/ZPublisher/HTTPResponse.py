@@ -501,8 +501,12 @@ class HTTPBaseResponse(BaseResponse):
 
         self.insertBase()
 
-        if (self.use_HTTP_content_compression and
-                self.headers.get('content-encoding', 'gzip') == 'gzip'):
+        if self.use_HTTP_content_compression:
+            self._compressBody(content_type)
+        return self
+
+    def _compressBody(self, content_type):
+        if self.headers.get('content-encoding', 'gzip') == 'gzip':
             # use HTTP content encoding to compress body contents unless
             # this response already has another type of content encoding
             if content_type.split('/')[0] not in uncompressableMimeMajorTypes:
@@ -520,17 +524,19 @@ class HTTPBaseResponse(BaseResponse):
                     self.body = z
                     self.setHeader('content-length', newlen)
                     self.setHeader('content-encoding', 'gzip')
-                    if self.use_HTTP_content_compression == 1:
-                        # use_HTTP_content_compression == 1 if force was
-                        # NOT used in enableHTTPCompression().
-                        # If we forced it, then Accept-Encoding
-                        # was ignored anyway, so cache should not
-                        # vary on it. Otherwise if not forced, cache should
-                        # respect Accept-Encoding client header
-                        vary = self.getHeader('Vary')
-                        if vary is None or 'Accept-Encoding' not in vary:
-                            self.appendHeader('Vary', 'Accept-Encoding')
-        return self
+                    self._varyOnAcceptEncoding()
+
+    def _varyOnAcceptEncoding(self):
+        if self.use_HTTP_content_compression == 1:
+            # use_HTTP_content_compression == 1 if force was
+            # NOT used in enableHTTPCompression().
+            # If we forced it, then Accept-Encoding
+            # was ignored anyway, so cache should not
+            # vary on it. Otherwise if not forced, cache should
+            # respect Accept-Encoding client header
+            vary = self.getHeader('Vary')
+            if vary is None or 'Accept-Encoding' not in vary:
+                self.appendHeader('Vary', 'Accept-Encoding')
 
     def enableHTTPCompression(self, REQUEST={}, force=0, disable=0, query=0):
         """Enable HTTP Content Encoding with gzip compression if possible
@@ -955,6 +961,12 @@ class WSGIResponse(HTTPBaseResponse):
     _http_version = None
     _server_version = None
 
+    # Set by the publisher if response.write may stream directly to the
+    # WSGI server: called on the first write, it sends the headers and
+    # returns a callable taking the body data.
+    _stream_start = None
+    _stream_writer = None
+
     # Append any "cleanup" functions to this list.
     after_list = ()
 
@@ -1050,13 +1062,31 @@ class WSGIResponse(HTTPBaseResponse):
         HTML data may be returned using a stream-oriented interface.
         This allows the browser to display partial results while
         computation of a response proceeds.
+
+        If the publisher enabled streaming, the headers are sent to the
+        WSGI server on the first call and the data is passed on as it is
+        written. The transaction is still only committed after the
+        published object returns. Headers cannot be changed anymore after
+        the first call, and errors (including conflict errors, which are
+        not retried) abort the partially sent response.
         """
         if not self._streaming:
             notify(pubevents.PubBeforeStreaming(self))
             self._streaming = 1
-            self.stdout.flush()
+            if self._stream_start is not None:
+                self._stream_writer = self._stream_start(self)
+            else:
+                self.stdout.flush()
 
-        self.stdout.write(data)
+        if self._stream_writer is not None:
+            self._stream_writer(data)
+        else:
+            self.stdout.write(data)
+
+    def _compressBody(self, content_type):
+        # The body gets compressed while it is streamed to the WSGI server,
+        # see ZPublisher.WSGIPublisher.publish_module.
+        pass
 
     def setBody(self, body, title='', is_error=0):
         if isinstance(body, IOBase):
@@ -1,4 +1,5 @@
 import io
+import zlib
 
 from zope.interface import Interface
 from zope.interface import implementer
@@ -63,3 +64,58 @@ class filestream_iterator(io.FileIO):
         size = self.tell()
         self.seek(cur_pos, io.SEEK_SET)
         return size
+
+
+@implementer(IUnboundStreamIterator)
+class gzip_iterator(object):
+    """
+    An iterator which gzip content-encodes the data of another iterable
+    (or file) chunk by chunk, so the uncompressed and the compressed body
+    never have to be held in memory at the same time.
+    """
+
+    def __init__(self, source, level=6, streamsize=1 << 16):
+        self.source = source
+        self.streamsize = streamsize
+        self._compressor = zlib.compressobj(
+            level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        self._chunks = self._encode()
+
+    def _read(self):
+        source = self.source
+        streamsize = self.streamsize
+        if hasattr(source, 'read'):
+            while True:
+                data = source.read(streamsize)
+                if not data:
+                    return
+                yield data
+        for chunk in source:
+            if len(chunk) <= streamsize:
+                yield chunk
+                continue
+            # Feed large string bodies in slices, so compressed output
+            # can leave before the whole body has been compressed.
+            for start in range(0, len(chunk), streamsize):
+                yield chunk[start:start + streamsize]
+
+    def _encode(self):
+        compress = self._compressor.compress
+        for chunk in self._read():
+            data = compress(chunk)
+            if data:
+                yield data
+        yield self._compressor.flush()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._chunks)
+
+    next = __next__
+
+    def close(self):
+        close = getattr(self.source, 'close', None)
+        if close is not None:
+            close()
@@ -0,0 +1,156 @@
+##############################################################################
+#
+# Copyright (c) 2017 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+""" Cache of the users validated by user folders.
+"""
+
+import hashlib
+import hmac
+import os
+from threading import Lock
+from time import time
+
+from Acquisition import aq_base
+from zope.component import queryUtility
+from zope.interface import implementer
+
+from ZPublisher.interfaces import IValidationCache
+
+
+def _serial(ob):
+    # The serial of the current state: an object invalidated by a commit
+    # of another connection is a ghost still having the old serial.
+    ob = aq_base(ob)
+    activate = getattr(ob, '_p_activate', None)
+    if activate is not None:
+        activate()
+    return getattr(ob, '_p_serial', None)
+
+
+def invalidateValidationCache(user_folder=None):
+    """Forget the users validated by `user_folder`, or by all user
+    folders, in the registered IValidationCache utility.
+
+    User folders call it whenever users are added, changed or removed.
+    """
+    cache = queryUtility(IValidationCache)
+    if cache is not None:
+        cache.invalidate(user_folder)
+
+
+@implementer(IValidationCache)
+class ValidationCache(object):
+    """Keep validated users for a short time.
+
+    Entries are keyed on a digest of the credentials of the request (the
+    Authorization header, the given cookies and the client address), the
+    path of the user folder and the required roles. Only the id of the
+    user is kept: on every hit the user is fetched again from the user
+    folder and authorized again by it for the published object. An entry
+    is dropped as soon as the user folder or the user object have been
+    changed in the database, or when the user folder invalidates it.
+
+    Only user folders with the `authorize` and `_getobcontext` methods
+    of AccessControl's BasicUserFolder are cached.
+    """
+
+    def __init__(self, timeout=60, max_entries=10000, cookies=('__ac', )):
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.cookies = tuple(cookies)
+        self._entries = {}
+        self._lock = Lock()
+        # The credentials are not kept, only a keyed digest of them.
+        self._secret = os.urandom(32)
+
+    def _getKey(self, request, user_folder, roles):
+        if roles is not None and not isinstance(roles, (tuple, list)):
+            # Unspecified roles, the user folder has to figure them out.
+            return None
+        if not (hasattr(user_folder, 'authorize') and
+                hasattr(user_folder, '_getobcontext')):
+            return None
+        cookies = getattr(request, 'cookies', None) or {}
+        credentials = (request._auth, ) + tuple(
+            cookies.get(name) for name in self.cookies)
+        if not any(credentials):
+            return None
+        try:
+            path = user_folder.getPhysicalPath()
+        except AttributeError:
+            return None
+        if roles is not None:
+            roles = tuple(roles)
+        digest = hmac.new(self._secret, repr(credentials).encode('utf-8'),
+                          hashlib.sha256).digest()
+        return (digest, request.get('REMOTE_ADDR'), path, roles)
+
+    def _authorize(self, request, user_folder, user, roles):
+        accessed, container, name, value = user_folder._getobcontext(
+            request['PUBLISHED'], request)
+        return user_folder.authorize(
+            user, accessed, container, name, value, roles)
+
+    def lookup(self, request, user_folder, roles):
+        key = self._getKey(request, user_folder, roles)
+        if key is None:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, folder_serial, userid, user_serial = entry
+        user = None
+        if expires > time() and folder_serial == _serial(user_folder):
+            user = user_folder.getUserById(userid)
+            if user is not None and user_serial != _serial(user):
+                user = None
+        if user is None:
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+        if not self._authorize(request, user_folder, user, roles):
+            return None
+        return user.__of__(user_folder)
+
+    def store(self, request, user_folder, roles, user):
+        key = self._getKey(request, user_folder, roles)
+        if key is None:
+            return
+        try:
+            userid = user.getId()
+            stored = user_folder.getUserById(userid)
+        except AttributeError:
+            return
+        if userid is None or stored is None:
+            # e.g. the emergency user or Anonymous
+            return
+        entry = (time() + self.timeout, _serial(user_folder),
+                 userid, _serial(stored))
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                now = time()
+                for k, v in list(self._entries.items()):
+                    if v[0] <= now:
+                        del self._entries[k]
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[key] = entry
+
+    def invalidate(self, user_folder=None):
+        with self._lock:
+            if user_folder is None:
+                self._entries.clear()
+                return
+            path = user_folder.getPhysicalPath()
+            for key in list(self._entries.keys()):
+                if key[2] == path:
+                    del self._entries[key]
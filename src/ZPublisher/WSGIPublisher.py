@@ -13,9 +13,12 @@
 """ Python Object Publisher -- Publish Python objects on web servers
 """
 from contextlib import contextmanager, closing
+from functools import partial
 from io import BytesIO
 from io import IOBase
 import sys
+import zlib
+from wsgiref.util import FileWrapper
 
 from AccessControl.SecurityManagement import newSecurityManager
 from AccessControl.SecurityManagement import noSecurityManager
@@ -36,10 +39,14 @@ from zope.security.management import newInteraction, endInteraction
 from zope.publisher.skinnable import setDefaultSkin
 
 from ZPublisher.HTTPRequest import WSGIRequest
+from ZPublisher.HTTPResponse import uncompressableMimeMajorTypes
 from ZPublisher.HTTPResponse import WSGIResponse
+from ZPublisher.Iterators import gzip_iterator
 from ZPublisher.Iterators import IUnboundStreamIterator
 from ZPublisher.mapply import mapply
 from ZPublisher import pubevents
+from ZPublisher.timing import phase
+from ZPublisher.timing import RequestTimer
 from ZPublisher.utils import recordMetaData
 
 if sys.version_info >= (3, ):
@@ -49,6 +56,12 @@ else:
 
 _DEFAULT_DEBUG_MODE = False
 _DEFAULT_REALM = None
+_DEFAULT_COMPRESSION_LEVEL = 6
+_DEFAULT_COMPRESSION_MIN_SIZE = 200
+_DEFAULT_FILE_CHUNK_SIZE = 1 << 18
+_DEFAULT_STREAMING = False
+_DEFAULT_TIMING = False
+_DEFAULT_SERVER_TIMING = False
 _MODULE_LOCK = allocate_lock()
 _MODULES = {}
 
@@ -81,6 +94,36 @@ def set_default_authentication_realm(realm):
     _DEFAULT_REALM = realm
 
 
+def set_default_compression_level(level):
+    global _DEFAULT_COMPRESSION_LEVEL
+    _DEFAULT_COMPRESSION_LEVEL = level
+
+
+def set_default_compression_min_size(min_size):
+    global _DEFAULT_COMPRESSION_MIN_SIZE
+    _DEFAULT_COMPRESSION_MIN_SIZE = min_size
+
+
+def set_default_file_chunk_size(chunk_size):
+    global _DEFAULT_FILE_CHUNK_SIZE
+    _DEFAULT_FILE_CHUNK_SIZE = chunk_size
+
+
+def set_default_streaming(streaming):
+    global _DEFAULT_STREAMING
+    _DEFAULT_STREAMING = streaming
+
+
+def set_default_timing(timing):
+    global _DEFAULT_TIMING
+    _DEFAULT_TIMING = timing
+
+
+def set_default_server_timing(server_timing):
+    global _DEFAULT_SERVER_TIMING
+    _DEFAULT_SERVER_TIMING = server_timing
+
+
 def get_module_info(module_name='Zope2'):
     global _MODULES
     info = _MODULES.get(module_name)
@@ -108,11 +151,12 @@ def transaction_pubevents(request, tm=transaction.manager):
         except (HTTPOk, HTTPRedirection) as exc:
             ok_exception = exc
 
-        notify(pubevents.PubBeforeCommit(request))
-        if tm.isDoomed():
-            tm.abort()
-        else:
-            tm.commit()
+        with phase(request, 'commit'):
+            notify(pubevents.PubBeforeCommit(request))
+            if tm.isDoomed():
+                tm.abort()
+            else:
+                tm.commit()
         notify(pubevents.PubSuccess(request))
     except Exception:
         exc_info = sys.exc_info()
@@ -131,7 +175,8 @@ def transaction_pubevents(request, tm=transaction.manager):
 def publish(request, module_info):
     obj, realm, debug_mode = module_info
 
-    request.processInputs()
+    with phase(request, 'processInputs'):
+        request.processInputs()
     response = request.response
 
     if debug_mode:
@@ -147,19 +192,22 @@ def publish(request, module_info):
     path = request.get('PATH_INFO')
     request['PARENTS'] = [obj]
 
-    obj = request.traverse(path, validated_hook=validate_user)
-    notify(pubevents.PubAfterTraversal(request))
+    with phase(request, 'traverse'):
+        obj = request.traverse(path, validated_hook=validate_user)
+    with phase(request, 'afterTraversal'):
+        notify(pubevents.PubAfterTraversal(request))
     recordMetaData(obj, request)
 
-    result = mapply(obj,
-                    request.args,
-                    request,
-                    call_object,
-                    1,
-                    missing_name,
-                    dont_publish_class,
-                    request,
-                    bind=1)
+    with phase(request, 'mapply'):
+        result = mapply(obj,
+                        request.args,
+                        request,
+                        call_object,
+                        1,
+                        missing_name,
+                        dont_publish_class,
+                        request,
+                        bind=1)
     if result is not response:
         response.setBody(result)
 
@@ -171,6 +219,12 @@ def _publish_response(request, response, module_info, _publish=publish):
         with transaction_pubevents(request):
             response = _publish(request, module_info)
     except Exception as exc:
+        if getattr(response, '_stream_writer', None) is not None:
+            # The response headers have been sent already, so we can
+            # neither render an error nor retry. Let the server abort
+            # the response.
+            raise
+
         # Normalize HTTP exceptions
         # (For example turn zope.publisher NotFound into zExceptions NotFound)
         t, v = upgradeException(exc.__class__, None)
@@ -210,6 +264,86 @@ def _publish_response(request, response, module_info, _publish=publish):
     return response
 
 
+def _use_content_encoding(environ, response):
+    """Decide whether the response body gets gzip content-encoded
+    while it is streamed to the WSGI server.
+
+    If so, update the response headers to announce the encoding.
+    """
+    if not getattr(response, 'use_HTTP_content_compression', 0):
+        return False
+    if environ.get('REQUEST_METHOD') == 'HEAD' or response.status != 200:
+        return False
+    if response.getHeader('content-encoding') is not None:
+        return False
+
+    content_type = response.getHeader('content-type')
+    if (not content_type or
+            content_type.split('/')[0] in uncompressableMimeMajorTypes):
+        return False
+
+    content_length = response.getHeader('content-length')
+    if (content_length is not None and
+            int(content_length) < _DEFAULT_COMPRESSION_MIN_SIZE):
+        return False
+
+    # The length of the encoded body is not known up front.
+    response.headers.pop('content-length', None)
+    response._streaming = 1
+    response.setHeader('content-encoding', 'gzip')
+    response._varyOnAcceptEncoding()
+    return True
+
+
+class _StreamWriter(object):
+    """Write response body data straight to the WSGI server, using
+    the write callable returned by start_response.
+    """
+
+    def __init__(self, write, compression_level=None):
+        self._write = write
+        self._compressor = None
+        if compression_level is not None:
+            self._compressor = zlib.compressobj(
+                compression_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def __call__(self, data):
+        if self._compressor is not None:
+            # Flush, so the client gets the data without delay.
+            data = (self._compressor.compress(data) +
+                    self._compressor.flush(zlib.Z_SYNC_FLUSH))
+        if data:
+            self._write(data)
+
+    def finish(self, result):
+        """Return the iterable of the body data following the data
+        written so far.
+        """
+        if self._compressor is None:
+            return result
+        return self._encode(result)
+
+    def _encode(self, result):
+        for chunk in result:
+            data = self._compressor.compress(chunk)
+            if data:
+                yield data
+        yield self._compressor.flush()
+
+
+def _start_streaming(environ, start_response, response):
+    """Send the response headers, returning a _StreamWriter for the body.
+
+    Called by the response when it is first written to.
+    """
+    content_encoding = _use_content_encoding(environ, response)
+    status, headers = response.finalize()
+    write = start_response(status, headers)
+    if content_encoding:
+        return _StreamWriter(write, _DEFAULT_COMPRESSION_LEVEL)
+    return _StreamWriter(write)
+
+
 def publish_module(environ, start_response,
                    _publish=publish,  # only for testing
                    _response=None,
@@ -229,13 +363,24 @@ def publish_module(environ, start_response,
         request = (_request if _request is not None else
                    _request_factory(environ['wsgi.input'], environ, response))
 
+        timer = None
+        if _DEFAULT_TIMING:
+            timer = environ['ZPublisher.timing'] = RequestTimer()
+
         for i in range(getattr(request, 'retry_max_count', 3) + 1):
+            if timer is not None:
+                request.publish_timer = timer
+                timer.retries = i
+            if _DEFAULT_STREAMING:
+                response._stream_start = partial(
+                    _start_streaming, environ, start_response)
             try:
                 response = _publish_response(
                     request, response, module_info, _publish=_publish)
                 break
             except (ConflictError, TransientError) as exc:
-                if request.supports_retry():
+                if (request.supports_retry() and
+                        getattr(response, '_stream_writer', None) is None):
                     new_request = request.retry()
                     request.close()
                     request = new_request
@@ -243,22 +388,49 @@ def publish_module(environ, start_response,
                 else:
                     raise
             finally:
+                if timer is not None:
+                    timer.countTransfers(request)
                 request.close()
 
-        # Start the WSGI server response
-        status, headers = response.finalize()
-        start_response(status, headers)
+        writer = getattr(response, '_stream_writer', None)
+        if writer is None:
+            # Start the WSGI server response
+            content_encoding = _use_content_encoding(environ, response)
+            if timer is not None and _DEFAULT_SERVER_TIMING:
+                response.setHeader('Server-Timing', timer.serverTiming())
+            with phase(request, 'finalize'):
+                status, headers = response.finalize()
+            start_response(status, headers)
+        else:
+            # The response was started by the first response.write.
+            content_encoding = False
 
-        if (isinstance(response.body, _FILE_TYPES) or
-                IUnboundStreamIterator.providedBy(response.body)):
+        if isinstance(response.body, _FILE_TYPES):
+            result = response.body
+            if not content_encoding and writer is None:
+                # Let the server send the file itself (e.g. using sendfile)
+                # if it can, otherwise read it in large chunks.
+                file_wrapper = environ.get('wsgi.file_wrapper', FileWrapper)
+                result = file_wrapper(result, _DEFAULT_FILE_CHUNK_SIZE)
+        elif IUnboundStreamIterator.providedBy(response.body):
             result = response.body
         else:
             # If somebody used response.write, that data will be in the
             # stdout BytesIO, so we put that before the body.
             result = (stdout.getvalue(), response.body)
 
-        for func in response.after_list:
-            func()
+        if writer is not None:
+            result = writer.finish(result)
+        elif content_encoding:
+            result = gzip_iterator(result, _DEFAULT_COMPRESSION_LEVEL,
+                                   _DEFAULT_FILE_CHUNK_SIZE)
+
+        with phase(request, 'afterList'):
+            for func in response.after_list:
+                func()
+
+        if timer is not None:
+            timer.finish()
 
     # Return the result body iterable.
     return result
@@ -0,0 +1,132 @@
+##############################################################################
+#
+# Copyright (c) 2017 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+""" Support for conditional HTTP requests (If-None-Match and
+If-Modified-Since) and content based entity tags.
+"""
+
+from email.utils import mktime_tz
+from email.utils import parsedate_tz
+from hashlib import md5
+
+from DateTime.DateTime import DateTime
+
+# Prefix of the entity tags made by contentETag, which distinguishes them
+# from the time based ones of OFS.EtagSupport and from dates.
+CONTENT_ETAG_PREFIX = 'md5-'
+
+# Clients mostly send the dates they got in Last-Modified headers, so a
+# few dates are parsed over and over.
+_dates = {}
+_dates_size = 1000
+
+
+def parseHTTPDate(value):
+    """Return the seconds since the epoch of the date in an HTTP header.
+
+    Returns None if the date is invalid. Besides the formats of RFC 7231,
+    anything DateTime understands is accepted.
+    """
+    try:
+        return _dates[value]
+    except KeyError:
+        pass
+    # Some clients append the length: "<date>; length=<size>"
+    date = value.split(';')[0].strip()
+    parsed = parsedate_tz(date)
+    result = None
+    if parsed is not None:
+        if parsed[9] is None:
+            # asctime format, which is always GMT
+            parsed = parsed[:9] + (0,)
+        try:
+            result = int(mktime_tz(parsed))
+        except (OverflowError, ValueError):
+            pass
+    else:
+        # Some proxies seem to send invalid date strings. If DateTime
+        # cannot make sense of them either, the header is ignored, as
+        # RFC 7232 tells us to do.
+        try:
+            result = int(DateTime(date).timeTime())
+        except Exception:
+            pass
+    if len(_dates) >= _dates_size:
+        _dates.clear()
+    _dates[value] = result
+    return result
+
+
+def contentETag(chunks, digest=None):
+    """Return an entity tag (without quotes) for the content made up of
+    the strings in `chunks`.
+
+    `digest` is an md5 hash object which the strings preceding `chunks`
+    were already added to, so the tag can be computed while the content
+    is read.
+    """
+    if digest is None:
+        digest = md5()
+    for chunk in chunks:
+        digest.update(chunk)
+    return CONTENT_ETAG_PREFIX + digest.hexdigest()
+
+
+def isETag(value):
+    """Return whether the value of an If-Range header is an entity tag
+    (as opposed to a date).
+    """
+    return (value[:1] == '"' or value[:2] in ('W/', 'ts') or
+            value.startswith(CONTENT_ETAG_PREFIX))
+
+
+def _unquote(etag):
+    if etag[:2] == 'W/':
+        etag = etag[2:]
+    if len(etag) > 1 and etag[0] == etag[-1] == '"':
+        etag = etag[1:-1]
+    return etag
+
+
+def etagMatches(etag, header):
+    """Return whether the entity tag (without quotes) is in the list of
+    entity tags of an If-None-Match header. The weak comparison is used.
+    """
+    header = header.strip()
+    if header == '*':
+        return True
+    if etag is None:
+        return False
+    for tag in header.split(','):
+        if _unquote(tag.strip()) == etag:
+            return True
+    return False
+
+
+def isNotModified(request, etag=None, last_modified=None):
+    """Return whether a request for a resource with the entity tag
+    (without quotes) and time of last modification can be answered with
+    304 Not Modified.
+
+    As required by RFC 7232, If-Modified-Since is ignored if the request
+    has an If-None-Match header.
+    """
+    header = request.get_header('If-None-Match', None)
+    if header is not None:
+        return etagMatches(etag, header)
+    header = request.get_header('If-Modified-Since', None)
+    if header is None or not last_modified:
+        return False
+    mod_since = parseHTTPDate(header)
+    if mod_since is None:
+        return False
+    return 0 < int(last_modified) <= mod_since
@@ -75,3 +75,33 @@ class UseTraversalDefault(Exception):
     indicate that it has no special casing for the given name and that standard
     traversal logic should be applied.
     """
+
+
+class IValidationCache(Interface):
+    """Remember which user a user folder validated for a set of credentials.
+
+    When a utility providing this interface is registered, the publisher
+    asks it before calling the ``validate`` method of a user folder, so
+    that repeated requests with the same credentials can skip the
+    authentication of the user.
+    """
+
+    def lookup(request, user_folder, roles):
+        """Return the user validated by ``user_folder`` before.
+
+        The user must have been validated for the credentials of
+        ``request`` and still be authorized by ``user_folder`` to access
+        the published object with ``roles``. Return None if there is no
+        such user.
+        """
+
+    def store(request, user_folder, roles, user):
+        """Remember that ``user_folder`` validated ``user`` for ``request``.
+        """
+
+    def invalidate(user_folder=None):
+        """Forget the users validated by ``user_folder`` or by all folders.
+
+        Called by user folders when their users are added, changed or
+        removed.
+        """
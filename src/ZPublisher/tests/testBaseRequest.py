@@ -466,6 +466,38 @@ class TestBaseRequest(unittest.TestCase, BaseRequest_factory):
         r = self._makeOne(DummyTraverser())
         self.assertRaises(NotFound, r.traverse, 'not_found')
 
+    def test_traverse_hook_set_on_instance(self):
+        # Hooks are cached per class, but may be set on instances too.
+        root, folder = self._makeRootAndFolder()
+        folder._setObject('objBasic', self._makeBasicObject())
+        r = self._makeOne(root)
+        r.traverse('folder/objBasic')
+
+        def bpth(object, REQUEST):
+            REQUEST['TraversalRequestNameStack'] += ['view']
+        folder.objBasic.__before_publishing_traverse__ = bpth
+        r = self._makeOne(root)
+        r.traverse('folder/objBasic')
+        self.assertEqual(r.URL, '/folder/objBasic/view')
+
+    def test_traverse_timings(self):
+        root, folder = self._makeRootAndFolder()
+        folder._setObject('objWithDefault', self._makeObjectWithDefault())
+        r = self._makeOne(root)
+        r.collect_traversal_timings = True
+        r.traverse('folder/objWithDefault')
+        timings = r['TraversalTimings']
+        self.assertEqual([name for name, seconds in timings],
+                         ['folder', 'objWithDefault', 'index_html'])
+        for name, seconds in timings:
+            self.assertTrue(seconds >= 0)
+
+    def test_traverse_no_timings_by_default(self):
+        root, folder = self._makeRootAndFolder()
+        r = self._makeOne(root)
+        r.traverse('folder')
+        self.assertFalse('TraversalTimings' in r)
+
 
 class TestRequestViewsBase(unittest.TestCase, BaseRequest_factory):
 
@@ -747,6 +779,30 @@ class TestBaseRequestViews(TestRequestViewsBase):
         ob = r.traverse('folder/obj/page3')
         self.assertEqual(ob(), 'Test page')
 
+    def test_publisher_adapter_registered_after_lookup(self):
+        # Adapters registered after a traversal are used
+        from zope.component import getGlobalSiteManager
+        from zope.publisher.browser import IDefaultBrowserLayer
+        from zope.publisher.interfaces.browser import IBrowserPublisher
+        from ZPublisher.BaseRequest import DefaultPublishTraverse
+        root, folder = self._makeRootAndFolder()
+        folder._setObject('obj', self._makeDummyObject('obj'))
+        self._setDefaultViewName('meth')
+        r = self._makeOne(root)
+        ob = r.traverse('folder/obj')
+        self.assertEqual(ob(), 'view on obj')
+
+        class Publisher(DefaultPublishTraverse):
+            def browserDefault(self, request):
+                return self.context, ('page', )
+
+        getGlobalSiteManager().registerAdapter(
+            Publisher, (self._dummyInterface(), IDefaultBrowserLayer),
+            IBrowserPublisher)
+        r = self._makeOne(root)
+        ob = r.traverse('folder/obj')
+        self.assertEqual(ob(), 'Test page')
+
     def test_wrapping_implicit_acquirers(self):
         # when the default publish traverser finds via adaptation
         # an object providing IAcquirer, it should wrap it in the
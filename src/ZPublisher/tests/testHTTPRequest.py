@@ -752,6 +752,121 @@ class HTTPRequestTests(unittest.TestCase, HTTPRequestFactoryMixin):
         f.seek(0)
         self.assertEqual(next(f), 'test\n')
 
+    def test_processInputs_w_urlencoded_body(self):
+        env = {'REQUEST_METHOD': 'POST',
+               'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+               'CONTENT_LENGTH': '13',
+               'QUERY_STRING': 'c=3'}
+        req = self._makeOne(stdin=BytesIO(b'a=1&b:int=2&d'), environ=env)
+        req.processInputs()
+        self.assertEqual(req.form, {'a': '1', 'b': 2, 'c': '3', 'd': ''})
+        self.assertEqual(req._file, None)
+
+    def test_processInputs_w_post_without_content_type(self):
+        env = {'REQUEST_METHOD': 'POST'}
+        req = self._makeOne(stdin=BytesIO(b'a=1&a=2'), environ=env)
+        req.processInputs()
+        self.assertEqual(req.form, {'a': ['1', '2']})
+
+    def test_processInputs_w_json_body(self):
+        body = b'{"a": [1, 2]}'
+        env = {'REQUEST_METHOD': 'POST',
+               'CONTENT_TYPE': 'application/json',
+               'CONTENT_LENGTH': str(len(body)),
+               'QUERY_STRING': 'c=3'}
+        stdin = BytesIO(body + b'trailing garbage')
+        req = self._makeOne(stdin=stdin, environ=env)
+        req.processInputs()
+        self.assertEqual(req.form, {})
+        self.assertEqual(stdin.tell(), 0)
+        self.assertEqual(req['BODY'], body)
+        self.assertEqual(req['BODYFILE'].read(), body)
+
+    def test_processInputs_w_body_without_content_length(self):
+        env = {'REQUEST_METHOD': 'PUT'}
+        req = self._makeOne(stdin=BytesIO(b'line 1\nline 2\n'), environ=env)
+        req.processInputs()
+        self.assertEqual(list(req['BODYFILE']), [b'line 1\n', b'line 2\n'])
+
+    def test_processInputs_w_soap_body(self):
+        env = {'REQUEST_METHOD': 'POST',
+               'CONTENT_TYPE': 'text/xml',
+               'HTTP_SOAPACTION': 'urn:action'}
+        req = self._makeOne(stdin=BytesIO(b'<xml/>'), environ=env)
+        req.processInputs()
+        self.assertEqual(req.other['SOAPXML'], b'<xml/>')
+
+    def test_processInputs_w_form_parsers(self):
+        class Request(self._getTargetClass()):
+            form_parsers = {'text/*': '_readUrlencoded'}
+        self._getTargetClass = lambda: Request
+        env = {'REQUEST_METHOD': 'POST', 'CONTENT_TYPE': 'text/x-fields'}
+        req = self._makeOne(stdin=BytesIO(b'a=1'), environ=env)
+        req.processInputs()
+        self.assertEqual(req.form, {'a': '1'})
+
+    def _processLazyInputs(self, stdin, environ):
+        from ZPublisher import HTTPRequest
+        HTTPRequest.lazy_form_parsing = True
+        try:
+            req = self._makeOne(stdin=stdin, environ=environ)
+            req.processInputs()
+        finally:
+            HTTPRequest.lazy_form_parsing = False
+        return req
+
+    def test_processInputs_lazy_multipart(self):
+        env = TEST_ENVIRON.copy()
+        env['QUERY_STRING'] = 'a=1'
+        stdin = BytesIO(TEST_FILE_DATA)
+        req = self._processLazyInputs(stdin, env)
+        self.assertNotEqual(req._deferred_inputs, None)
+        self.assertEqual(stdin.tell(), 0)
+        self.assertEqual(req['a'], '1')
+        self.assertEqual(req._deferred_inputs, None)
+        self.assertEqual(sorted(req.form.keys()), ['a', 'file'])
+        self.assertEqual(req.form['file'].read(), b'test\n')
+
+    def test_processInputs_lazy_multipart_bodyfile(self):
+        env = TEST_ENVIRON.copy()
+        env['QUERY_STRING'] = 'a=1'
+        env['CONTENT_LENGTH'] = str(len(TEST_FILE_DATA))
+        stdin = BytesIO(TEST_FILE_DATA + b'trailing garbage')
+        req = self._processLazyInputs(stdin, env)
+        body = req.get('BODYFILE')
+        self.assertEqual(body.read(10), TEST_FILE_DATA[:10])
+        # The body is read straight from the input stream.
+        self.assertEqual(stdin.tell(), 10)
+        self.assertFalse(body._spool)
+        self.assertEqual(body.read(), TEST_FILE_DATA[10:])
+        self.assertRaises(IOError, body.seek, 0)
+        # Only the fields of the query string are left.
+        self.assertEqual(req.form, {'a': '1'})
+
+    def test_processInputs_lazy_multipart_postprocessed(self):
+        env = TEST_ENVIRON.copy()
+        req = self._processLazyInputs(BytesIO(TEST_FILE_DATA), env)
+        req.postProcessInputs()
+        self.assertNotEqual(req._deferred_inputs, None)
+        req.form['file']
+        self.assertEqual(req._deferred_inputs, None)
+
+    def test_processInputs_lazy_multipart_method_on_query(self):
+        env = TEST_ENVIRON.copy()
+        env['QUERY_STRING'] = 'edit:method=1'
+        env['PATH_INFO'] = '/folder'
+        req = self._processLazyInputs(BytesIO(TEST_FILE_DATA), env)
+        self.assertEqual(req.other['PATH_INFO'], '/folder/edit')
+        self.assertEqual(sorted(req.taintedform.keys()), [])
+        self.assertEqual(req.other['PATH_INFO'], '/folder/edit')
+
+    def test_clear_with_deferred_inputs(self):
+        req = self._processLazyInputs(
+            BytesIO(TEST_FILE_DATA), TEST_ENVIRON.copy())
+        req.clear()
+        self.assertEqual(req._deferred_inputs, None)
+        self.assertEqual(req.form, {})
+
     def test__authUserPW_simple(self):
         user_id = 'user'
         password = 'password'
@@ -1086,6 +1201,72 @@ class HTTPRequestTests(unittest.TestCase, HTTPRequestFactoryMixin):
         self.assertEqual(req.getVirtualRoot(), '/foo/bar')
 
 
+class BodyFileTests(unittest.TestCase):
+
+    def _makeOne(self, data, *args):
+        from ZPublisher.HTTPRequest import BodyFile
+        self.fp = BytesIO(data)
+        return BodyFile(self.fp, *args)
+
+    def test_read_lazily(self):
+        f = self._makeOne(b'0123456789')
+        self.assertEqual(self.fp.tell(), 0)
+        self.assertEqual(f.read(3), b'012')
+        self.assertEqual(self.fp.tell(), 3)
+        self.assertEqual(f.tell(), 3)
+        self.assertEqual(f.read(), b'3456789')
+        self.assertEqual(f.read(), b'')
+
+    def test_read_bounded(self):
+        f = self._makeOne(b'0123456789', 4)
+        self.assertEqual(f.read(), b'0123')
+        self.assertEqual(self.fp.tell(), 4)
+
+    def test_seek(self):
+        f = self._makeOne(b'0123456789')
+        f.seek(5)
+        self.assertEqual(f.read(2), b'56')
+        f.seek(-3, 1)
+        self.assertEqual(f.read(2), b'45')
+        f.seek(0)
+        self.assertEqual(f.read(), b'0123456789')
+        f.seek(-2, 2)
+        self.assertEqual(f.tell(), 8)
+        self.assertEqual(f.read(), b'89')
+        self.assertRaises(IOError, f.seek, -1)
+
+    def test_readline(self):
+        f = self._makeOne(b'a\nbc\n\ndef')
+        f._blocksize = 2
+        self.assertEqual(f.readline(), b'a\n')
+        self.assertEqual(f.readline(1), b'b')
+        self.assertEqual(f.readline(), b'c\n')
+        self.assertEqual(f.readlines(), [b'\n', b'def'])
+        self.assertEqual(f.readline(), b'')
+
+    def test_unspooled(self):
+        f = self._makeOne(b'a\nbc\n\ndef', 8, 1 << 20, False)
+        self.assertEqual(f._spool, None)
+        self.assertEqual(f.readline(), b'a\n')
+        self.assertEqual(f.read(2), b'bc')
+        f.seek(4)
+        self.assertEqual(f.readlines(), [b'\n', b'\n', b'de'])
+        self.assertEqual(f.tell(), 8)
+        self.assertEqual(f.read(), b'')
+        self.assertRaises(IOError, f.seek, 0)
+        self.assertEqual(self.fp.tell(), 8)
+
+    def test_spill_to_disk(self):
+        f = self._makeOne(b'x' * 100, -1, 10)
+        f.read(5)
+        self.assertFalse(f._spool._rolled)
+        f.read()
+        self.assertTrue(f._spool._rolled)
+        f.seek(0)
+        self.assertEqual(f.read(), b'x' * 100)
+        f.close()
+
+
 class TestHTTPRequestZope3Views(TestRequestViewsBase):
 
     def _makeOne(self, root):
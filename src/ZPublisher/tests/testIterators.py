@@ -1,9 +1,41 @@
+import gzip
+import io
 import unittest
 from zope.interface.verify import verifyClass
 from ZPublisher.Iterators import IStreamIterator, filestream_iterator
+from ZPublisher.Iterators import IUnboundStreamIterator, gzip_iterator
+
+
+def _gunzip(data):
+    return gzip.GzipFile(fileobj=io.BytesIO(data)).read()
 
 
 class TestFileStreamIterator(unittest.TestCase):
 
     def testInterface(self):
         verifyClass(IStreamIterator, filestream_iterator)
+
+
+class TestGzipIterator(unittest.TestCase):
+
+    def testInterface(self):
+        verifyClass(IUnboundStreamIterator, gzip_iterator)
+
+    def test_iterable(self):
+        chunks = list(gzip_iterator(('foo' * 100, '', 'bar' * 100)))
+        self.assertEqual(_gunzip(''.join(chunks)), 'foo' * 100 + 'bar' * 100)
+
+    def test_large_string_is_sliced(self):
+        body = ''.join(chr(i % 251) for i in range(10000))
+        chunks = list(gzip_iterator((body,), streamsize=1000))
+        self.assertEqual(_gunzip(''.join(chunks)), body)
+
+    def test_file(self):
+        body = 'x' * 5000
+        chunks = list(gzip_iterator(io.BytesIO(body), streamsize=100))
+        self.assertEqual(_gunzip(''.join(chunks)), body)
+
+    def test_close_closes_source(self):
+        source = io.BytesIO('foo')
+        gzip_iterator(source).close()
+        self.assertTrue(source.closed)
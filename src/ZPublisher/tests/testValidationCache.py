@@ -0,0 +1,278 @@
+import unittest
+
+import transaction
+
+
+class DummyRequest(dict):
+
+    _auth = 'Basic Ym9iOnNlY3JldA=='
+
+    def __init__(self, published, **kw):
+        super(DummyRequest, self).__init__(kw)
+        self['PUBLISHED'] = published
+        self['PARENTS'] = [published]
+        self.steps = ['published']
+        self.cookies = {}
+
+
+class ValidationCacheTests(unittest.TestCase):
+
+    def _getTargetClass(self):
+        from ZPublisher.ValidationCache import ValidationCache
+        return ValidationCache
+
+    def _makeOne(self, *args, **kw):
+        return self._getTargetClass()(*args, **kw)
+
+    def _makeRoot(self):
+        from OFS.Folder import Folder
+        from OFS.userfolder import UserFolder
+        root = Folder('root')
+        root._setObject('acl_users', UserFolder())
+        root.acl_users._doAddUser('bob', 'secret', ['Manager'], [])
+        return root
+
+    def test_interfaces(self):
+        from zope.interface.verify import verifyClass
+        from ZPublisher.interfaces import IValidationCache
+        verifyClass(IValidationCache, self._getTargetClass())
+
+    def test_lookup_empty(self):
+        root = self._makeRoot()
+        cache = self._makeOne()
+        self.assertEqual(
+            cache.lookup(DummyRequest(root), root.acl_users, ['Manager']),
+            None)
+
+    def test_lookup_stored(self):
+        from Acquisition import aq_parent
+        root = self._makeRoot()
+        uf = root.acl_users
+        cache = self._makeOne()
+        request = DummyRequest(root)
+        cache.store(request, uf, ['Manager'], uf.getUserById('bob'))
+        user = cache.lookup(DummyRequest(root), uf, ['Manager'])
+        self.assertEqual(user.getId(), 'bob')
+        self.assertTrue(aq_parent(user) is uf)
+
+    def test_lookup_other_credentials(self):
+        root = self._makeRoot()
+        uf = root.acl_users
+        cache = self._makeOne()
+        cache.store(DummyRequest(root), uf, ['Manager'],
+                    uf.getUserById('bob'))
+        request = DummyRequest(root)
+        request._auth = 'Basic Ym9iOndyb25n'
+        self.assertEqual(cache.lookup(request, uf, ['Manager']), None)
+        request = DummyRequest(root, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(cache.lookup(request, uf, ['Manager']), None)
+
+    def test_lookup_cookie_credentials(self):
+        root = self._makeRoot()
+        uf = root.acl_users
+        cache = self._makeOne()
+        request = DummyRequest(root)
+        request._auth = None
+        request.cookies['__ac'] = 'token'
+        cache.store(request, uf, ['Manager'], uf.getUserById('bob'))
+        self.assertEqual(
+            cache.lookup(request, uf, ['Manager']).getId(), 'bob')
+        request.cookies['__ac'] = 'other'
+        self.assertEqual(cache.lookup(request, uf, ['Manager']), None)
+
+    def test_no_credentials(self):
+        root = self._makeRoot()
+        uf = root.acl_users
+        cache = self._makeOne()
+        request = DummyRequest(root)
+        request._auth = None
+        cache.store(request, uf, ['Manager'], uf.getUserById('bob'))
+        self.assertEqual(cache._entries, {})
+
+    def test_unspecified_roles(self):
+        from ZPublisher.BaseRequest import UNSPECIFIED_ROLES
+        root = self._makeRoot()
+        uf = root.acl_users
+        cache = self._makeOne()
+        request = DummyRequest(root)
+        cache.store(request, uf, UNSPECIFIED_ROLES, uf.getUserById('bob'))
+        self.assertEqual(cache._entries, {})
+
+    def test_unknown_user(self):
+        from AccessControl.SpecialUsers import nobody
+        root = self._makeRoot()
+        cache = self._makeOne()
+        cache.store(DummyRequest(root), root.acl_users, None, nobody)
+        self.assertEqual(cache._entries, {})
+
+    def test_lookup_not_allowed(self):
+        root = self._makeRoot()
+        uf = root.acl_users
+        cache = self._makeOne()
+        cache.store(DummyRequest(root), uf, ['Manager'],
+                    uf.getUserById('bob'))
+        uf.getUserById('bob').roles = ()
+        self.assertEqual(
+            cache.lookup(DummyRequest(root), uf, ['Manager']), None)
+
+    def test_lookup_not_authorized(self):
+        root = self._makeRoot()
+        uf = root.acl_users
+        cache = self._makeOne()
+        cache.store(DummyRequest(root), uf, ['Manager'],
+                    uf.getUserById('bob'))
+        calls = []
+
+        def authorize(user, accessed, container, name, value, roles):
+            calls.append((user.getId(), accessed, name, roles))
+            return 0
+        uf.authorize = authorize
+        self.assertEqual(
+            cache.lookup(DummyRequest(root), uf, ['Manager']), None)
+        self.assertEqual(calls, [('bob', root, 'published', ['Manager'])])
+
+    def test_credentials_not_kept(self):
+        root = self._makeRoot()
+        uf = root.acl_users
+        cache = self._makeOne()
+        request = DummyRequest(root)
+        cache.store(request, uf, None, uf.getUserById('bob'))
+        key, = cache._entries.keys()
+        self.assertFalse(request._auth in repr(key))
+
+    def test_lookup_expired(self):
+        root = self._makeRoot()
+        uf = root.acl_users
+        cache = self._makeOne(timeout=-1)
+        cache.store(DummyRequest(root), uf, None, uf.getUserById('bob'))
+        self.assertEqual(cache.lookup(DummyRequest(root), uf, None), None)
+        self.assertEqual(cache._entries, {})
+
+    def test_lookup_user_changed(self):
+        from ZODB.DB import DB
+        from ZODB.MappingStorage import MappingStorage
+        db = DB(MappingStorage())
+        conn = db.open()
+        try:
+            conn.root()['root'] = root = self._makeRoot()
+            transaction.commit()
+            uf = root.acl_users
+            cache = self._makeOne()
+            cache.store(DummyRequest(root), uf, None, uf.getUserById('bob'))
+            self.assertEqual(
+                cache.lookup(DummyRequest(root), uf, None).getId(), 'bob')
+            uf._changeUser('bob', 'changed', 'changed', ['Manager'], [])
+            transaction.commit()
+            self.assertEqual(
+                cache.lookup(DummyRequest(root), uf, None), None)
+        finally:
+            transaction.abort()
+            conn.close()
+            db.close()
+
+    def test_lookup_user_changed_by_other_connection(self):
+        from ZODB.DB import DB
+        from ZODB.MappingStorage import MappingStorage
+        db = DB(MappingStorage())
+        conn = db.open()
+        tm = transaction.TransactionManager()
+        other = None
+        try:
+            conn.root()['root'] = root = self._makeRoot()
+            transaction.commit()
+            uf = root.acl_users
+            cache = self._makeOne()
+            cache.store(DummyRequest(root), uf, None, uf.getUserById('bob'))
+            other = db.open(transaction_manager=tm)
+            other_uf = other.root()['root'].acl_users
+            other_uf._changeUser('bob', 'changed', 'changed', ['Manager'],
+                                 [])
+            tm.commit()
+            # The user is a ghost in this connection now.
+            transaction.begin()
+            self.assertEqual(
+                cache.lookup(DummyRequest(root), uf, None), None)
+        finally:
+            transaction.abort()
+            if other is not None:
+                tm.abort()
+                other.close()
+            conn.close()
+            db.close()
+
+    def test_max_entries(self):
+        root = self._makeRoot()
+        uf = root.acl_users
+        cache = self._makeOne(max_entries=2)
+        user = uf.getUserById('bob')
+        for roles in (['Manager'], ['Owner'], ['Member']):
+            cache.store(DummyRequest(root), uf, roles, user)
+        self.assertEqual(len(cache._entries), 1)
+
+    def test_invalidated_by_user_folder(self):
+        from zope.component import provideUtility
+        from zope.testing.cleanup import cleanUp
+        root = self._makeRoot()
+        uf = root.acl_users
+        cache = self._makeOne()
+        provideUtility(cache)
+        try:
+            for change in (
+                    lambda: uf._doChangeUser('bob', 'changed', (), []),
+                    lambda: uf._doAddUser('jim', 'secret', (), []),
+                    lambda: uf._doDelUsers(['jim'])):
+                cache.store(DummyRequest(root), uf, None,
+                            uf.getUserById('bob'))
+                change()
+                self.assertEqual(cache._entries, {})
+        finally:
+            cleanUp()
+
+    def test_invalidate(self):
+        root = self._makeRoot()
+        uf = root.acl_users
+        cache = self._makeOne()
+        cache.store(DummyRequest(root), uf, None, uf.getUserById('bob'))
+        cache.invalidate(uf)
+        self.assertEqual(cache.lookup(DummyRequest(root), uf, None), None)
+        cache.store(DummyRequest(root), uf, None, uf.getUserById('bob'))
+        cache.invalidate()
+        self.assertEqual(cache.lookup(DummyRequest(root), uf, None), None)
+
+
+class CachedValidationTests(unittest.TestCase):
+
+    def setUp(self):
+        from zope.component import provideUtility
+        from zope.testing.cleanup import cleanUp
+        from ZPublisher.ValidationCache import ValidationCache
+        cleanUp()
+        provideUtility(ValidationCache())
+
+    def tearDown(self):
+        from zope.testing.cleanup import cleanUp
+        cleanUp()
+
+    def _callFUT(self, *args):
+        from ZPublisher.BaseRequest import cached_validation
+        return cached_validation(*args)
+
+    def test_validates_once(self):
+        from OFS.Folder import Folder
+        from OFS.userfolder import UserFolder
+        root = Folder('root')
+        root._setObject('acl_users', UserFolder())
+        uf = root.acl_users
+        uf._doAddUser('bob', 'secret', ['Manager'], [])
+        calls = []
+
+        def validate(request, auth, roles):
+            calls.append(auth)
+            return uf.getUserById('bob').__of__(uf)
+
+        request = DummyRequest(root)
+        for i in range(3):
+            user = self._callFUT(
+                uf, validate, request, request._auth, ['Manager'])
+            self.assertEqual(user.getId(), 'bob')
+        self.assertEqual(len(calls), 1)
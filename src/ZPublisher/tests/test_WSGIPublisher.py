@@ -363,7 +363,24 @@ class TestPublishModule(unittest.TestCase, PlacelessSetup):
         _publish = DummyCallable()
         _publish._result = _response
         app_iter = self._callFUT(environ, start_response, _publish)
-        self.assertTrue(app_iter is body)
+        self.assertTrue(app_iter.filelike is body)
+        self.assertEqual(app_iter.blksize, 1 << 18)
+
+    def test_response_body_is_file_w_file_wrapper(self):
+        from io import BytesIO
+        _response = DummyResponse()
+        _response._status = '200 OK'
+        _response._headers = [('Content-Length', '4')]
+        body = _response.body = BytesIO('BODY')
+        wrapper = DummyCallable()
+        wrapper._result = wrapped = object()
+        environ = self._makeEnviron(**{'wsgi.file_wrapper': wrapper})
+        start_response = DummyCallable()
+        _publish = DummyCallable()
+        _publish._result = _response
+        app_iter = self._callFUT(environ, start_response, _publish)
+        self.assertTrue(app_iter is wrapped)
+        self.assertEqual(wrapper._called_with, ((body, 1 << 18), {}))
 
     def test_response_is_stream(self):
         from ZPublisher.Iterators import IStreamIterator
@@ -420,6 +437,216 @@ class TestPublishModule(unittest.TestCase, PlacelessSetup):
         app_iter = self._callFUT(environ, start_response, _publish)
         self.assertTrue(app_iter is body)
 
+    def test_response_compressed_while_streaming(self):
+        import gzip
+        from io import BytesIO
+        from ZPublisher.HTTPResponse import WSGIResponse
+        from ZPublisher.Iterators import gzip_iterator
+        _response = WSGIResponse()
+        _response.enableHTTPCompression({'HTTP_ACCEPT_ENCODING': 'gzip'})
+        _response.setBody('foo' * 100)
+        environ = self._makeEnviron()
+        start_response = DummyCallable()
+        _publish = DummyCallable()
+        _publish._result = _response
+        app_iter = self._callFUT(environ, start_response, _publish)
+        self.assertTrue(isinstance(app_iter, gzip_iterator))
+        data = gzip.GzipFile(fileobj=BytesIO(''.join(app_iter))).read()
+        self.assertEqual(data, 'foo' * 100)
+        (status, headers), kw = start_response._called_with
+        headers = dict(headers)
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertFalse('Content-Length' in headers)
+
+    def test_response_write_compressed_while_streaming(self):
+        import gzip
+        from io import BytesIO
+        from ZPublisher.HTTPResponse import WSGIResponse
+
+        def _publish(request, module_info):
+            response = request.response
+            response.enableHTTPCompression(force=True)
+            response.setHeader('Content-Type', 'text/csv')
+            response.write('foo,bar\n' * 50)
+            return response
+
+        from ZPublisher.WSGIPublisher import publish_module
+        environ = self._makeEnviron()
+        start_response = DummyCallable()
+        app_iter = publish_module(environ, start_response, _publish,
+                                  _response_factory=WSGIResponse)
+        data = gzip.GzipFile(fileobj=BytesIO(''.join(app_iter))).read()
+        self.assertEqual(data, 'foo,bar\n' * 50)
+        (status, headers), kw = start_response._called_with
+        headers = dict(headers)
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertFalse('Vary' in headers)
+
+    def test_response_not_compressed_below_min_size(self):
+        from ZPublisher.HTTPResponse import WSGIResponse
+        _response = WSGIResponse()
+        _response.enableHTTPCompression({'HTTP_ACCEPT_ENCODING': 'gzip'})
+        _response.setBody('foo')
+        environ = self._makeEnviron()
+        start_response = DummyCallable()
+        _publish = DummyCallable()
+        _publish._result = _response
+        app_iter = self._callFUT(environ, start_response, _publish)
+        self.assertEqual(app_iter, ('', 'foo'))
+        (status, headers), kw = start_response._called_with
+        self.assertFalse('Content-Encoding' in dict(headers))
+
+    def test_response_not_compressed_uncompressable_mimetype(self):
+        from ZPublisher.HTTPResponse import WSGIResponse
+        _response = WSGIResponse()
+        _response.setHeader('Content-Type', 'image/png')
+        _response.enableHTTPCompression({'HTTP_ACCEPT_ENCODING': 'gzip'})
+        _response.setBody('foo' * 100)
+        environ = self._makeEnviron()
+        start_response = DummyCallable()
+        _publish = DummyCallable()
+        _publish._result = _response
+        app_iter = self._callFUT(environ, start_response, _publish)
+        self.assertEqual(app_iter, ('', 'foo' * 100))
+
+    def _callStreaming(self, _publish, start_response):
+        from ZPublisher import WSGIPublisher
+        from ZPublisher.HTTPResponse import WSGIResponse
+        WSGIPublisher.set_default_streaming(True)
+        try:
+            return WSGIPublisher.publish_module(
+                self._makeEnviron(), start_response, _publish,
+                _response_factory=WSGIResponse)
+        finally:
+            WSGIPublisher.set_default_streaming(False)
+
+    def test_response_write_streaming(self):
+        written = []
+        started = []
+
+        def start_response(status, headers):
+            started.append((status, dict(headers)))
+            return written.append
+
+        def _publish(request, module_info):
+            response = request.response
+            response.setHeader('Content-Type', 'text/plain')
+            response.write('foo')
+            # The data went out before the object returned.
+            self.assertEqual(written, ['foo'])
+            response.write('bar')
+            response.setBody('baz')
+            return response
+
+        app_iter = self._callStreaming(_publish, start_response)
+        self.assertEqual(len(started), 1)
+        status, headers = started[0]
+        self.assertEqual(status, '200 OK')
+        self.assertFalse('Content-Length' in headers)
+        self.assertEqual(written, ['foo', 'bar'])
+        self.assertEqual(''.join(app_iter), 'baz')
+
+    def test_response_write_streaming_compressed(self):
+        import gzip
+        from io import BytesIO
+        written = []
+
+        def start_response(status, headers):
+            self.assertEqual(dict(headers)['Content-Encoding'], 'gzip')
+            return written.append
+
+        def _publish(request, module_info):
+            response = request.response
+            response.enableHTTPCompression(force=True)
+            response.setHeader('Content-Type', 'text/plain')
+            response.write('foo' * 100)
+            self.assertTrue(written)
+            return response
+
+        app_iter = self._callStreaming(_publish, start_response)
+        data = ''.join(written) + ''.join(app_iter)
+        self.assertEqual(gzip.GzipFile(fileobj=BytesIO(data)).read(),
+                         'foo' * 100)
+
+    def test_response_write_streaming_no_retry(self):
+        from ZODB.POSException import ConflictError
+        calls = []
+
+        def start_response(status, headers):
+            return lambda data: None
+
+        def _publish(request, module_info):
+            calls.append(request)
+            request.response.write('foo')
+            raise ConflictError()
+
+        with self.assertRaises(ConflictError):
+            self._callStreaming(_publish, start_response)
+        self.assertEqual(len(calls), 1)
+
+    def test_response_write_streaming_error_skips_exception_view(self):
+        from zExceptions import NotFound
+        registerExceptionView(INotFound)
+        started = []
+
+        def start_response(status, headers):
+            started.append(status)
+            return lambda data: None
+
+        def _publish(request, module_info):
+            request.response.write('foo')
+            raise NotFound('gone')
+
+        with self.assertRaises(NotFound):
+            self._callStreaming(_publish, start_response)
+        self.assertEqual(started, ['200 OK'])
+
+    def _callTimed(self, environ, _publish, server_timing=False):
+        from ZPublisher import WSGIPublisher
+        from ZPublisher.HTTPResponse import WSGIResponse
+        WSGIPublisher.set_default_timing(True)
+        WSGIPublisher.set_default_server_timing(server_timing)
+        start_response = DummyCallable()
+        try:
+            WSGIPublisher.publish_module(
+                environ, start_response, _publish,
+                _response_factory=WSGIResponse)
+        finally:
+            WSGIPublisher.set_default_timing(False)
+            WSGIPublisher.set_default_server_timing(False)
+        return dict(start_response._called_with[0][1])
+
+    def _publishPhase(self, request, module_info):
+        from ZPublisher.timing import phase
+        with phase(request, 'custom'):
+            request.response.setBody('foo')
+        return request.response
+
+    def test_timing(self):
+        environ = self._makeEnviron()
+        headers = self._callTimed(environ, self._publishPhase)
+        timer = environ['ZPublisher.timing']
+        self.assertEqual([name for name, wall, cpu in timer.phases],
+                         ['custom', 'commit', 'finalize', 'afterList'])
+        self.assertTrue(timer.duration >= 0)
+        self.assertFalse('Server-Timing' in headers)
+
+    def test_timing_server_timing_header(self):
+        environ = self._makeEnviron()
+        headers = self._callTimed(
+            environ, self._publishPhase, server_timing=True)
+        self.assertTrue(
+            headers['Server-Timing'].startswith('custom;dur='))
+        self.assertTrue(', commit;dur=' in headers['Server-Timing'])
+
+    def test_timing_off(self):
+        environ = self._makeEnviron()
+        _publish = DummyCallable()
+        _publish._result = DummyResponse()
+        self._callFUT(environ, DummyCallable(), _publish)
+        self.assertFalse('ZPublisher.timing' in environ)
+
     def test_request_closed(self):
         environ = self._makeEnviron()
         start_response = DummyCallable()
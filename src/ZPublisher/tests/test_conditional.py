@@ -0,0 +1,118 @@
+import unittest
+
+
+class DummyRequest(object):
+
+    def __init__(self, **headers):
+        self.headers = headers
+
+    def get_header(self, name, default=None):
+        return self.headers.get(name, default)
+
+
+class ParseHTTPDateTests(unittest.TestCase):
+
+    def _callFUT(self, value):
+        from ZPublisher.conditional import parseHTTPDate
+        return parseHTTPDate(value)
+
+    def test_formats(self):
+        # The examples of RFC 7231, section 7.1.1.1
+        for value in ('Sun, 06 Nov 1994 08:49:37 GMT',
+                      'Sunday, 06-Nov-94 08:49:37 GMT',
+                      'Sun Nov  6 08:49:37 1994'):
+            self.assertEqual(self._callFUT(value), 784111777)
+
+    def test_length(self):
+        self.assertEqual(
+            self._callFUT('Sun, 06 Nov 1994 08:49:37 GMT; length=123'),
+            784111777)
+
+    def test_timezone(self):
+        self.assertEqual(self._callFUT('Sun, 06 Nov 1994 09:49:37 +0100'),
+                         784111777)
+
+    def test_other_format(self):
+        self.assertEqual(self._callFUT('1994/11/06 08:49:37 GMT'), 784111777)
+
+    def test_invalid(self):
+        self.assertEqual(self._callFUT('garbage'), None)
+        self.assertEqual(self._callFUT(''), None)
+
+    def test_cached(self):
+        from ZPublisher import conditional
+        value = 'Mon, 07 Nov 1994 08:49:37 GMT'
+        self._callFUT(value)
+        self.assertEqual(conditional._dates[value], 784198177)
+
+
+class ContentETagTests(unittest.TestCase):
+
+    def test_contentETag(self):
+        from ZPublisher.conditional import contentETag
+        etag = contentETag([b'foo', b'bar'])
+        self.assertTrue(etag.startswith('md5-'))
+        self.assertEqual(etag, contentETag([b'foobar']))
+        self.assertNotEqual(etag, contentETag([b'foobaz']))
+
+    def test_contentETag_digest(self):
+        from hashlib import md5
+        from ZPublisher.conditional import contentETag
+        digest = md5()
+        digest.update(b'foo')
+        self.assertEqual(contentETag([b'bar'], digest),
+                         contentETag([b'foobar']))
+
+    def test_isETag(self):
+        from ZPublisher.conditional import isETag
+        self.assertTrue(isETag('"md5-abc"'))
+        self.assertTrue(isETag('md5-abc'))
+        self.assertTrue(isETag('W/"abc"'))
+        self.assertTrue(isETag('ts12345'))
+        self.assertFalse(isETag('Sun, 06 Nov 1994 08:49:37 GMT'))
+        self.assertFalse(isETag('garbage'))
+
+    def test_etagMatches(self):
+        from ZPublisher.conditional import etagMatches
+        self.assertTrue(etagMatches('abc', '"abc"'))
+        self.assertTrue(etagMatches('abc', '"xyz", W/"abc"'))
+        self.assertTrue(etagMatches('abc', '*'))
+        self.assertTrue(etagMatches(None, '*'))
+        self.assertFalse(etagMatches('abc', '"xyz"'))
+        self.assertFalse(etagMatches(None, '"xyz"'))
+
+
+class IsNotModifiedTests(unittest.TestCase):
+
+    def _callFUT(self, request, etag=None, last_modified=None):
+        from ZPublisher.conditional import isNotModified
+        return isNotModified(request, etag, last_modified)
+
+    def test_no_headers(self):
+        self.assertFalse(self._callFUT(DummyRequest(), 'abc', 784111777))
+
+    def test_if_modified_since(self):
+        request = DummyRequest(
+            **{'If-Modified-Since': 'Sun, 06 Nov 1994 08:49:37 GMT'})
+        self.assertTrue(self._callFUT(request, None, 784111777.5))
+        self.assertTrue(self._callFUT(request, None, 784111000))
+        self.assertFalse(self._callFUT(request, None, 784111778))
+        self.assertFalse(self._callFUT(request, None, None))
+        self.assertFalse(self._callFUT(request, None, 0))
+
+    def test_if_modified_since_invalid(self):
+        request = DummyRequest(**{'If-Modified-Since': 'garbage'})
+        self.assertFalse(self._callFUT(request, None, 784111777))
+
+    def test_if_none_match(self):
+        request = DummyRequest(**{'If-None-Match': '"abc"'})
+        self.assertTrue(self._callFUT(request, 'abc'))
+        self.assertFalse(self._callFUT(request, 'xyz'))
+        self.assertFalse(self._callFUT(request, None))
+
+    def test_if_none_match_takes_precedence(self):
+        request = DummyRequest(**{
+            'If-None-Match': '"abc"',
+            'If-Modified-Since': 'Sun, 06 Nov 1994 08:49:37 GMT',
+        })
+        self.assertFalse(self._callFUT(request, 'xyz', 784111777))
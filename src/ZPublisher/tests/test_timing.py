@@ -0,0 +1,165 @@
+import unittest
+
+
+class DummyJar(object):
+
+    def __init__(self, loads, stores):
+        self.counts = (loads, stores)
+
+    def getTransferCounts(self, clear=False):
+        counts = self.counts
+        if clear:
+            self.counts = (0, 0)
+        return counts
+
+
+class DummyPersistent(object):
+
+    def __init__(self, jar=None):
+        self._p_jar = jar
+
+
+class DummyRequest(object):
+
+    publish_timer = None
+
+    def __init__(self, **other):
+        self.other = other
+
+
+class RequestTimerTests(unittest.TestCase):
+
+    def _makeOne(self):
+        from ZPublisher.timing import RequestTimer
+        return RequestTimer()
+
+    def test_phase(self):
+        timer = self._makeOne()
+        with timer.phase('traverse'):
+            pass
+        with timer.phase('mapply'):
+            pass
+        self.assertEqual([name for name, wall, cpu in timer.phases],
+                         ['traverse', 'mapply'])
+        for name, wall, cpu in timer.phases:
+            self.assertTrue(wall >= 0)
+
+    def test_phase_cpu(self):
+        from ZPublisher import timing
+        timer = self._makeOne()
+        with timer.phase('mapply'):
+            pass
+        name, wall, cpu = timer.phases[0]
+        if timing.cpu_time is None:
+            self.assertEqual(cpu, None)
+        else:
+            self.assertTrue(cpu >= 0)
+
+    def test_phase_without_cpu_clock(self):
+        from ZPublisher import timing
+        cpu_time = timing.cpu_time
+        timing.cpu_time = None
+        try:
+            timer = self._makeOne()
+            with timer.phase('mapply'):
+                pass
+        finally:
+            timing.cpu_time = cpu_time
+        self.assertEqual(timer.phases[0][2], None)
+
+    def test_phase_w_exception(self):
+        timer = self._makeOne()
+        with self.assertRaises(ValueError):
+            with timer.phase('mapply'):
+                raise ValueError
+        self.assertEqual(len(timer.phases), 1)
+
+    def test_serverTiming(self):
+        timer = self._makeOne()
+        timer.phases = [('traverse', 0.0015, 0.001), ('mapply', 0.25, 0.2)]
+        self.assertEqual(timer.serverTiming(),
+                         'traverse;dur=1.500, mapply;dur=250.000')
+
+    def test_countTransfers(self):
+        timer = self._makeOne()
+        jar = DummyJar(10, 2)
+        request = DummyRequest(
+            PARENTS=[DummyPersistent(), DummyPersistent(jar)])
+        timer.countTransfers(request)
+        self.assertEqual((timer.loads, timer.stores), (10, 2))
+        self.assertEqual(jar.counts, (0, 0))
+
+    def test_countTransfers_without_parents(self):
+        timer = self._makeOne()
+        timer.countTransfers(DummyRequest())
+        self.assertEqual((timer.loads, timer.stores), (0, 0))
+
+
+class PhaseTests(unittest.TestCase):
+
+    def test_without_timer(self):
+        from ZPublisher.timing import phase
+        with phase(DummyRequest(), 'mapply'):
+            pass
+
+    def test_with_timer(self):
+        from ZPublisher.timing import phase
+        from ZPublisher.timing import RequestTimer
+        request = DummyRequest()
+        request.publish_timer = RequestTimer()
+        with phase(request, 'mapply'):
+            pass
+        self.assertEqual(request.publish_timer.phases[0][0], 'mapply')
+
+
+class StatisticsTests(unittest.TestCase):
+
+    def _makeOne(self):
+        from ZPublisher.timing import Statistics
+        return Statistics()
+
+    def _makeTimer(self, *phases):
+        from ZPublisher.timing import RequestTimer
+        timer = RequestTimer()
+        timer.phases = list(phases)
+        timer.duration = sum(wall for name, wall, cpu in phases)
+        return timer
+
+    def test_add(self):
+        from ZPublisher.timing import BUCKETS
+        stats = self._makeOne()
+        stats.add(self._makeTimer(('traverse', 0.0005, 0.0004),
+                                  ('mapply', 0.015, 0.01)))
+        stats.add(self._makeTimer(('traverse', 0.003, 0.002),
+                                  ('mapply', 60.0, 1.0)))
+        data = stats.get()
+        self.assertEqual(sorted(data.keys()), ['mapply', 'total', 'traverse'])
+        traverse = data['traverse']
+        self.assertEqual(traverse['count'], 2)
+        self.assertAlmostEqual(traverse['wall'], 0.0035)
+        self.assertAlmostEqual(traverse['cpu'], 0.0024)
+        self.assertEqual(traverse['histogram'][:3], [1, 0, 1])
+        self.assertEqual(sum(traverse['histogram']), 2)
+        mapply = data['mapply']['histogram']
+        self.assertEqual(mapply[BUCKETS.index(20)], 1)
+        self.assertEqual(mapply[-1], 1)
+
+    def test_add_without_cpu(self):
+        stats = self._makeOne()
+        stats.add(self._makeTimer(('traverse', 0.001, None)))
+        stats.add(self._makeTimer(('traverse', 0.001, 0.001)))
+        traverse = stats.get()['traverse']
+        self.assertEqual(traverse['count'], 2)
+        self.assertEqual(traverse['cpu'], None)
+
+    def test_get_returns_copy(self):
+        stats = self._makeOne()
+        stats.add(self._makeTimer(('traverse', 0.001, 0.001)))
+        stats.get()['traverse']['histogram'][0] = 42
+        self.assertEqual(stats.get()['traverse']['histogram'][0], 1)
+
+    def test_clear(self):
+        stats = self._makeOne()
+        stats.add(self._makeTimer(('traverse', 0.001, 0.001)))
+        stats.clear()
+        self.assertEqual(stats.get(), {})
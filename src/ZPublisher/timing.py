@@ -0,0 +1,180 @@
+##############################################################################
+#
+# Copyright (c) 2017 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+""" Timing of the phases of publishing a request.
+"""
+
+from bisect import bisect_left
+from threading import Lock
+from time import time
+
+from Acquisition import aq_base
+
+try:
+    from time import thread_time as cpu_time
+except ImportError:
+    # Python < 3.7. time.clock is the CPU time of the whole process,
+    # which includes the work of the other threads, so no CPU time is
+    # recorded without a clock of the current thread.
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if getattr(resource, 'RUSAGE_THREAD', None) is not None:
+        def cpu_time():
+            usage = resource.getrusage(resource.RUSAGE_THREAD)
+            return usage.ru_utime + usage.ru_stime
+    else:
+        cpu_time = None
+
+# Upper bounds of the histogram buckets, in milliseconds
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class _NullPhase(object):
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_null_phase = _NullPhase()
+
+
+class _Phase(object):
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time()
+        if cpu_time is not None:
+            self.cpu = cpu_time()
+
+    def __exit__(self, *exc_info):
+        cpu = None
+        if cpu_time is not None:
+            cpu = cpu_time() - self.cpu
+        self.timer.phases.append((self.name, time() - self.wall, cpu))
+
+
+class RequestTimer(object):
+    """Record the wall clock and CPU time spent in the publishing phases.
+
+    `phases` is a list of (name, wall seconds, cpu seconds) in the order
+    the phases were run, a phase shows up once per attempt if the
+    request was retried. The CPU time is that of the thread, it is None
+    if there is no clock for it (Python 2 on most platforms). `loads`
+    and `stores` count the objects the ZODB connection of the request
+    loaded and stored.
+    """
+
+    def __init__(self):
+        self.phases = []
+        self.loads = 0
+        self.stores = 0
+        self.retries = 0
+        self.start = time()
+        self.duration = None
+
+    def phase(self, name):
+        """Return a context manager timing the phase `name`."""
+        return _Phase(self, name)
+
+    def countTransfers(self, request):
+        """Add the ZODB loads and stores of the request's connection."""
+        for ob in getattr(request, 'other', {}).get('PARENTS', ()):
+            jar = getattr(aq_base(ob), '_p_jar', None)
+            if jar is not None and hasattr(jar, 'getTransferCounts'):
+                loads, stores = jar.getTransferCounts(True)
+                self.loads += loads
+                self.stores += stores
+                return
+
+    def finish(self):
+        """Stop the timer and add its phases to the statistics."""
+        self.duration = time() - self.start
+        statistics.add(self)
+
+    def serverTiming(self):
+        """Return the phases as value of a Server-Timing header."""
+        return ', '.join('%s;dur=%.3f' % (name, wall * 1000.0)
+                         for name, wall, cpu in self.phases)
+
+
+def phase(request, name):
+    """Return a context manager timing the phase `name` of `request`.
+
+    Nothing is recorded unless the request has a publish_timer.
+    """
+    timer = getattr(request, 'publish_timer', None)
+    if timer is None:
+        return _null_phase
+    return timer.phase(name)
+
+
+class Statistics(object):
+    """Histograms of the wall clock time of the phases of all requests.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._phases = {}
+
+    def _add(self, name, wall, cpu):
+        data = self._phases.get(name)
+        if data is None:
+            data = self._phases[name] = {
+                'count': 0,
+                'wall': 0.0,
+                'cpu': 0.0,
+                'histogram': [0] * (len(BUCKETS) + 1),
+            }
+        data['count'] += 1
+        data['wall'] += wall
+        if cpu is None or data['cpu'] is None:
+            data['cpu'] = None
+        else:
+            data['cpu'] += cpu
+        data['histogram'][bisect_left(BUCKETS, wall * 1000.0)] += 1
+
+    def add(self, timer):
+        with self._lock:
+            for name, wall, cpu in timer.phases:
+                self._add(name, wall, cpu)
+            self._add('total', timer.duration,
+                      None if cpu_time is None else 0.0)
+
+    def get(self):
+        """Return a copy of the statistics by phase name.
+
+        Each phase maps to a dictionary with the number of times the
+        phase was run (`count`), the total wall clock and CPU seconds
+        spent in it (`wall`, `cpu`, which is None without a clock of
+        the CPU time of threads) and the number of runs per bucket
+        (`histogram`, see BUCKETS, the last bucket holds the slower
+        runs).
+        """
+        with self._lock:
+            return dict(
+                (name, dict(data, histogram=list(data['histogram'])))
+                for name, data in self._phases.items())
+
+
+statistics = Statistics()
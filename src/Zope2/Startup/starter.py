@@ -33,6 +33,8 @@ class WSGIStarter(object):
         self.setupLocale()
         self.setupSecurityOptions()
         self.setupPublisher()
+        self.setupTemplateCache()
+        self.setupFileCache()
         self.setupInterpreter()
         self.startZope()
         from App.config import getConfiguration
@@ -81,11 +83,36 @@ class WSGIStarter(object):
         WSGIPublisher.set_default_debug_mode(self.cfg.debug_mode)
         WSGIPublisher.set_default_authentication_realm(
             self.cfg.http_realm)
+        WSGIPublisher.set_default_compression_level(
+            self.cfg.http_compression_level)
+        WSGIPublisher.set_default_compression_min_size(
+            self.cfg.http_compression_min_size)
+        WSGIPublisher.set_default_file_chunk_size(self.cfg.file_chunk_size)
+        WSGIPublisher.set_default_streaming(self.cfg.response_streaming)
+        WSGIPublisher.set_default_timing(self.cfg.publisher_timing)
+        WSGIPublisher.set_default_server_timing(
+            self.cfg.server_timing_header)
+        if self.cfg.validation_cache_timeout:
+            from zope.component import provideUtility
+            from ZPublisher.ValidationCache import ValidationCache
+            provideUtility(
+                ValidationCache(timeout=self.cfg.validation_cache_timeout))
         if self.cfg.trusted_proxies:
             mapped = []
             for name in self.cfg.trusted_proxies:
                 mapped.extend(_name_to_ips(name))
             ZPublisher.HTTPRequest.trusted_proxies = tuple(mapped)
+        ZPublisher.HTTPRequest.lazy_form_parsing = self.cfg.lazy_form_parsing
+        ZPublisher.HTTPRequest.body_memory_limit = self.cfg.body_memory_limit
+
+    def setupTemplateCache(self):
+        from Products.PageTemplates import programcache
+        programcache.configure(self.cfg.template_cache_directory,
+                               self.cfg.template_cache_size)
+
+    def setupFileCache(self):
+        from OFS import FileCache
+        FileCache.configure(self.cfg.file_cache_directory)
 
     def setupSecurityOptions(self):
         import AccessControl
@@ -103,6 +103,126 @@ class WSGIStartupTestCase(unittest.TestCase):
             """)
         self.assertEqual(conf.max_conflict_retries, 15)
 
+    def test_http_compression_defaults(self):
+        conf, handler = self.load_config_text("""\
+            instancehome <<INSTANCE_HOME>>
+            """)
+        self.assertEqual(conf.http_compression_level, 6)
+        self.assertEqual(conf.http_compression_min_size, 200)
+
+    def test_http_compression_explicit(self):
+        conf, handler = self.load_config_text("""\
+            instancehome <<INSTANCE_HOME>>
+            http-compression-level 9
+            http-compression-min-size 1KB
+            """)
+        self.assertEqual(conf.http_compression_level, 9)
+        self.assertEqual(conf.http_compression_min_size, 1024)
+
+    def test_file_chunk_size(self):
+        conf, handler = self.load_config_text("""\
+            instancehome <<INSTANCE_HOME>>
+            """)
+        self.assertEqual(conf.file_chunk_size, 1 << 18)
+
+        conf, handler = self.load_config_text("""\
+            instancehome <<INSTANCE_HOME>>
+            file-chunk-size 1MB
+            """)
+        self.assertEqual(conf.file_chunk_size, 1 << 20)
+
+    def test_response_streaming(self):
+        conf, handler = self.load_config_text("""\
+            instancehome <<INSTANCE_HOME>>
+            """)
+        self.assertFalse(conf.response_streaming)
+
+        conf, handler = self.load_config_text("""\
+            instancehome <<INSTANCE_HOME>>
+            response-streaming on
+            """)
+        self.assertTrue(conf.response_streaming)
+
+    def test_lazy_form_parsing(self):
+        conf, handler = self.load_config_text("""\
+            instancehome <<INSTANCE_HOME>>
+            """)
+        self.assertFalse(conf.lazy_form_parsing)
+
+        conf, handler = self.load_config_text("""\
+            instancehome <<INSTANCE_HOME>>
+            lazy-form-parsing on
+            """)
+        self.assertTrue(conf.lazy_form_parsing)
+
+    def test_body_memory_limit(self):
+        conf, handler = self.load_config_text("""\
+            instancehome <<INSTANCE_HOME>>
+            """)
+        self.assertEqual(conf.body_memory_limit, 1 << 20)
+
+        conf, handler = self.load_config_text("""\
+            instancehome <<INSTANCE_HOME>>
+            body-memory-limit 64KB
+            """)
+        self.assertEqual(conf.body_memory_limit, 1 << 16)
+
+    def test_publisher_timing(self):
+        conf, handler = self.load_config_text("""\
+            instancehome <<INSTANCE_HOME>>
+            """)
+        self.assertFalse(conf.publisher_timing)
+        self.assertFalse(conf.server_timing_header)
+
+        conf, handler = self.load_config_text("""\
+            instancehome <<INSTANCE_HOME>>
+            publisher-timing on
+            server-timing-header on
+            """)
+        self.assertTrue(conf.publisher_timing)
+        self.assertTrue(conf.server_timing_header)
+
+    def test_validation_cache_timeout(self):
+        conf, handler = self.load_config_text("""\
+            instancehome <<INSTANCE_HOME>>
+            """)
+        self.assertEqual(conf.validation_cache_timeout, 0)
+
+        conf, handler = self.load_config_text("""\
+            instancehome <<INSTANCE_HOME>>
+            validation-cache-timeout 30
+            """)
+        self.assertEqual(conf.validation_cache_timeout, 30)
+
+    def test_template_cache(self):
+        conf, handler = self.load_config_text("""\
+            instancehome <<INSTANCE_HOME>>
+            """)
+        self.assertEqual(conf.template_cache_directory, None)
+        self.assertEqual(conf.template_cache_size, 64 << 20)
+
+        conf, handler = self.load_config_text("""\
+            instancehome <<INSTANCE_HOME>>
+            template-cache-directory <<INSTANCE_HOME>>/template-cache
+            template-cache-size 1MB
+            """)
+        self.assertEqual(conf.template_cache_directory,
+                         os.path.join(TEMPNAME, 'template-cache'))
+        self.assertEqual(conf.template_cache_size, 1 << 20)
+
+    def test_file_cache(self):
+        conf, handler = self.load_config_text("""\
+            instancehome <<INSTANCE_HOME>>
+            """)
+        self.assertEqual(conf.file_cache_directory, None)
+
+        conf, handler = self.load_config_text("""\
+            instancehome <<INSTANCE_HOME>>
+            file-cache-directory <<INSTANCE_HOME>>/file-cache
+            """)
+        self.assertEqual(conf.file_cache_directory,
+                         os.path.join(TEMPNAME, 'file-cache'))
+
     def test_default_zpublisher_encoding(self):
         conf, dummy = self.load_config_text("""\
             instancehome <<INSTANCE_HOME>>
@@ -99,3 +99,36 @@ class WSGIStarterTestCase(unittest.TestCase):
             self.assertEqual(sys.getcheckinterval(), newcheckinterval)
         finally:
             sys.setcheckinterval(oldcheckinterval)
+
+    def testSetupTemplateCache(self):
+        from Products.PageTemplates import programcache
+        conf = self.load_config_text("""
+                    instancehome <<INSTANCE_HOME>>
+                    template-cache-directory <<INSTANCE_HOME>>/templates
+                    template-cache-size 1MB
+                    """)
+        try:
+            starter = self.get_starter(conf)
+            starter.setupTemplateCache()
+            cache = programcache._cache
+            self.assertEqual(cache.directory,
+                             os.path.join(self.TEMPNAME, 'templates'))
+            self.assertEqual(cache.max_size, 1 << 20)
+            self.assertTrue(os.path.isdir(cache.directory))
+        finally:
+            programcache.configure(None)
+
+    def testSetupFileCache(self):
+        from OFS import FileCache
+        conf = self.load_config_text("""
+                    instancehome <<INSTANCE_HOME>>
+                    file-cache-directory <<INSTANCE_HOME>>/file-cache
+                    """)
+        try:
+            starter = self.get_starter(conf)
+            starter.setupFileCache()
+            directory = os.path.join(self.TEMPNAME, 'file-cache')
+            self.assertEqual(FileCache._directory, directory)
+            self.assertTrue(os.path.isdir(directory))
+        finally:
+            FileCache.configure(None)
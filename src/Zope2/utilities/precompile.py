@@ -0,0 +1,189 @@
+##############################################################################
+#
+# Copyright (c) 2017 Zope Foundation and Contributors.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE
+#
+##############################################################################
+""" Compile the page templates of a Zope instance into the template cache
+(see the template-cache-directory option), so the processes serving
+requests do not have to compile them.
+"""
+
+import multiprocessing
+import optparse
+import os
+import sys
+import time
+
+from Zope2.utilities.finder import ZopeFinder
+
+
+def _templateClasses():
+    from Products.PageTemplates.PageTemplateFile import PageTemplateFile
+    from zope.pagetemplate.pagetemplatefile import \
+        PageTemplateFile as BasePageTemplateFile
+    return (PageTemplateFile, BasePageTemplateFile)
+
+
+def findTemplateFiles():
+    """Return the (filename, template class) tuples of the page template
+    files of the loaded modules (including the products) and of the
+    registered views (including the Five browser pages).
+    """
+    from zope.component import getGlobalSiteManager
+    classes = _templateClasses()
+    found = {}
+
+    def add(namespace):
+        for value in list(namespace.values()):
+            try:
+                if isinstance(value, classes) and value.filename:
+                    found[(value.filename, value.__class__)] = None
+            except Exception:
+                # e.g. broken lazy imports
+                continue
+
+    for name, module in list(sys.modules.items()):
+        if module is None:
+            continue
+        namespace = getattr(module, '__dict__', {})
+        add(namespace)
+        for value in list(namespace.values()):
+            if (isinstance(value, type) and
+                    getattr(value, '__module__', None) == name):
+                add(vars(value))
+
+    for registration in getGlobalSiteManager().registeredAdapters():
+        factory = registration.factory
+        if isinstance(factory, type):
+            for klass in factory.__mro__:
+                add(vars(klass))
+
+    return sorted(found, key=lambda item: (item[0], item[1].__name__))
+
+
+def findTemplates(app):
+    """Return the (path, source file, text, content type) tuples of the
+    page templates stored in the database.
+    """
+    templates = []
+    for path, ob in app.ZopeFindIter(
+            app, obj_metatypes=('Page Template',), search_sub=1):
+        templates.append((path, ob.pt_source_file(), ob._text,
+                          ob.content_type))
+    return templates
+
+
+def compileFile(klass, filename):
+    template = klass(os.path.basename(filename), os.path.dirname(filename))
+    template._cook_check()
+    return template._v_errors
+
+
+def compileText(source_file, text, content_type):
+    from Products.PageTemplates.engine import Program
+    from Products.PageTemplates.Expressions import getEngine
+    try:
+        Program.cook(source_file, text, getEngine(), content_type)
+    except Exception:
+        etype, e = sys.exc_info()[:2]
+        return ['Compilation failed',
+                '%s.%s: %s' % (etype.__module__, etype.__name__, e)]
+    return ()
+
+
+def _compile(job):
+    # Runs in the worker processes.
+    label, func, args = job
+    start = time.time()
+    try:
+        errors = func(*args)
+    except Exception:
+        etype, e = sys.exc_info()[:2]
+        errors = ['%s.%s: %s' % (etype.__module__, etype.__name__, e)]
+    return label, time.time() - start, list(errors or ())
+
+
+def precompile(jobs, processes=1, out=sys.stdout):
+    """Compile the templates of the (label, function, arguments) jobs in
+    parallel processes, report the compile time of every template and
+    return the number of templates which could not be compiled.
+    """
+    if processes > 1:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap_unordered(_compile, jobs)
+    else:
+        pool = None
+        results = (_compile(job) for job in jobs)
+    failed = 0
+    try:
+        for label, seconds, errors in results:
+            out.write('%8.3fs  %s\n' % (seconds, label))
+            if errors:
+                failed += 1
+                for error in errors:
+                    out.write('           Error: %s\n' %
+                              error.replace('\n', '\n' + ' ' * 18))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return failed
+
+
+def main(argv=sys.argv):
+    parser = optparse.OptionParser(
+        usage='%prog [options]', description=__doc__.strip())
+    parser.add_option(
+        '-c', '--config', dest='config',
+        help='The Zope configuration file (default: etc/wsgi.conf of the '
+             'instance, or $ZOPE_CONF).')
+    parser.add_option(
+        '-j', '--jobs', dest='jobs', type='int',
+        default=multiprocessing.cpu_count(),
+        help='The number of worker processes (default: %default).')
+    parser.add_option(
+        '--no-database', dest='database', action='store_false',
+        default=True,
+        help='Do not compile the page templates stored in the database.')
+    options, args = parser.parse_args(argv[1:])
+
+    finder = ZopeFinder(argv)
+    finder.filter_warnings()
+    app = finder.get_app(options.config)
+
+    from App.config import getConfiguration
+    from Products.PageTemplates import programcache
+    config = getConfiguration()
+    if not config.template_cache_directory:
+        print('No template-cache-directory is configured.')
+        sys.exit(1)
+    programcache.configure(config.template_cache_directory,
+                           config.template_cache_size)
+
+    jobs = [(filename, compileFile, (klass, filename))
+            for filename, klass in findTemplateFiles()]
+    if options.database:
+        for path, source_file, text, content_type in findTemplates(app):
+            jobs.append(('/' + path, compileText,
+                         (source_file, text, content_type)))
+    # The workers do not use the database.
+    import transaction
+    transaction.abort()
+    app._p_jar.close()
+
+    start = time.time()
+    failed = precompile(jobs, options.jobs)
+    print('Compiled %d templates in %.1f seconds, %d failed.' % (
+        len(jobs), time.time() - start, failed))
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from six import StringIO
+
+
+class PrecompileTests(unittest.TestCase):
+
+    def setUp(self):
+        from Products.PageTemplates import programcache
+        from Products.PageTemplates.engine import Program
+        from zope.component import provideUtility
+        provideUtility(Program)
+        self.directory = tempfile.mkdtemp()
+        programcache.configure(self.directory)
+
+    def tearDown(self):
+        from Products.PageTemplates import programcache
+        from zope.testing.cleanup import cleanUp
+        programcache.configure(None)
+        shutil.rmtree(self.directory)
+        cleanUp()
+
+    def test_findTemplateFiles(self):
+        from Products.PageTemplates.PageTemplateFile import PageTemplateFile
+        from Products.PageTemplates.ZopePageTemplate import \
+            manage_addPageTemplateForm
+        from Zope2.utilities.precompile import findTemplateFiles
+        self.assertIn((manage_addPageTemplateForm.filename, PageTemplateFile),
+                      findTemplateFiles())
+
+    def test_findTemplateFiles_views(self):
+        import Products.Five.browser.tests
+        from Products.Five.browser.metaconfigure import SimpleViewClass
+        from Products.Five.browser.pagetemplatefile import \
+            ViewPageTemplateFile
+        from zope.component import provideAdapter
+        from zope.interface import Interface
+        from Zope2.utilities.precompile import findTemplateFiles
+        filename = os.path.join(
+            os.path.dirname(Products.Five.browser.tests.__file__),
+            'cockatiel.pt')
+        provideAdapter(SimpleViewClass(filename), (Interface, Interface),
+                       Interface, name='cockatiel')
+        self.assertIn((filename, ViewPageTemplateFile), findTemplateFiles())
+
+    def test_precompile(self):
+        from Products.PageTemplates.ZopePageTemplate import \
+            manage_addPageTemplateForm
+        from Zope2.utilities.precompile import compileFile
+        from Zope2.utilities.precompile import compileText
+        from Zope2.utilities.precompile import precompile
+        out = StringIO()
+        jobs = [
+            ('form', compileFile, (manage_addPageTemplateForm.__class__,
+                                   manage_addPageTemplateForm.filename)),
+            ('/good', compileText, ('/good', u'<p>Good</p>', 'text/html')),
+            ('/bad', compileText,
+             ('/bad', u'<p tal:bogus="x">Bad</p>', 'text/html')),
+        ]
+        self.assertEqual(precompile(jobs, out=out), 1)
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[0].endswith('s  form'))
+        self.assertTrue(lines[1].endswith('s  /good'))
+        self.assertTrue(lines[2].endswith('s  /bad'))
+        self.assertEqual(lines[3].strip(), 'Error: Compilation failed')
+
+    def test_precompile_processes(self):
+        from Zope2.utilities.precompile import compileText
+        from Zope2.utilities.precompile import precompile
+        jobs = [('/%d' % i, compileText,
+                 ('/%d' % i, u'<p>%d</p>' % i, 'text/html'))
+                for i in range(4)]
+        out = StringIO()
+        self.assertEqual(precompile(jobs, processes=2, out=out), 0)
+        self.assertEqual(len(os.listdir(self.directory)), 4)
+        self.assertEqual(len(out.getvalue().splitlines()), 4)